@@ -0,0 +1,98 @@
+import os, sys, argparse
+import numpy as np
+
+# Synthetic captures in the DAQ text format: a timestamp followed by the three channel
+# values, separated by one or two spaces. Peaks are short pulses on top of Gaussian
+# noise; a fraction of them is followed by a second pulse (double peaks) and a few
+# lines are damaged the way the acquisition sometimes writes them.
+
+BLOCK_ROWS = 1 << 18
+
+
+def pulse(width):
+    # Peak shape: a Gaussian pulse of about width samples
+    t = np.arange(-3 * width, 3 * width + 1)
+    return np.exp(-0.5 * (t / (width / 2.355)) ** 2)
+
+
+def syntheticChannels(rows, rate=10000, peakRate=50.0, inverted=(True, True, True), noise=0.01, amplitude=1.0,
+                      width=4, doublePeakFraction=0.1, doublePeakDelay=(5, 20), seed=0):
+    """Timestamps and three float channels of a capture with peaks at peakRate per second.
+
+    Returns (timeIndex, channels, peaks), peaks holding the sample numbers of the
+    pulses (including the second pulses of double peaks) per channel.
+    """
+    rng = np.random.default_rng(seed)
+    timeIndex = 1700000000.0 + np.arange(rows) / rate
+    channels = rng.normal(0, noise, size=(3, rows))
+    shape = pulse(width)
+    allPeaks = []
+    for channel, invert in zip(channels, inverted):
+        count = rng.poisson(peakRate * rows / rate)
+        peaks = np.sort(rng.integers(0, rows, count))
+        double = peaks[rng.random(count) < doublePeakFraction]
+        peaks = np.sort(np.concatenate((peaks, double + rng.integers(doublePeakDelay[0], doublePeakDelay[1] + 1, len(double)))))
+        peaks = peaks[peaks < rows]
+        # Adding all pulses at once: every pulse sample is a (peak + offset) position
+        positions = peaks[:, None] + np.arange(len(shape)) - len(shape) // 2
+        heights = amplitude * rng.uniform(0.7, 1.3, len(peaks))[:, None] * shape
+        valid = (positions >= 0) & (positions < rows)
+        np.add.at(channel, positions[valid], (-heights if invert else heights)[valid])
+        allPeaks.append(peaks)
+    return timeIndex, channels, allPeaks
+
+
+def formatLines(timeIndex, channels, rng, malformedFraction=0.0):
+    # One text line per row with the mixed single/double spacing of real captures
+    lines = [f"{timeIndex[i]:.6f}  {channels[0, i]:.5f} {channels[1, i]:.5f}  {channels[2, i]:.5f}" for i in range(len(timeIndex))]
+    if malformedFraction > 0:
+        for i in np.flatnonzero(rng.random(len(lines)) < malformedFraction):
+            kind = rng.integers(0, 3)
+            if kind == 0:
+                # Empty line
+                lines[i] = ""
+            elif kind == 1:
+                # Truncated line
+                lines[i] = " ".join(lines[i].split()[:int(rng.integers(1, 4))])
+            elif i + 1 < len(lines):
+                # Two records written on one line
+                lines[i] = lines[i] + "  " + lines[i+1]
+    return "\n".join(lines) + "\n"
+
+
+def writeSyntheticCapture(outputFile, rows, rate=10000, malformedFraction=1e-4, seed=0, **kwargs):
+    """Writes a capture of rows lines to outputFile; kwargs go to syntheticChannels.
+
+    Returns the peak sample numbers per channel.
+    """
+    rng = np.random.default_rng(seed + 1)
+    timeIndex, channels, peaks = syntheticChannels(rows, rate, seed=seed, **kwargs)
+    with open(outputFile, "w") as f_out:
+        for start in range(0, rows, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, rows)
+            f_out.write(formatLines(timeIndex[start:stop], channels[:, start:stop], rng, malformedFraction))
+    return peaks
+
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description="Writes a synthetic DAQ capture.")
+    parser.add_argument("output", help="output file")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--rate", type=float, default=10000, help="samples per second")
+    parser.add_argument("--peak-rate", type=float, default=50.0, help="peaks per second and channel")
+    parser.add_argument("--not-inverted", action="store_true", help="positive instead of negative peaks")
+    parser.add_argument("--noise", type=float, default=0.01, help="standard deviation of the noise")
+    parser.add_argument("--double-peaks", type=float, default=0.1, help="fraction of peaks followed by a second one")
+    parser.add_argument("--malformed", type=float, default=1e-4, help="fraction of damaged lines")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parseArguments(sys.argv[1:])
+    inverted = (not arguments.not_inverted,) * 3
+    peaks = writeSyntheticCapture(arguments.output, arguments.rows, arguments.rate, arguments.malformed, arguments.seed,
+                                  peakRate=arguments.peak_rate, inverted=inverted, noise=arguments.noise,
+                                  doublePeakFraction=arguments.double_peaks)
+    print(f"[generateDAQ] Wrote {arguments.rows} rows to {arguments.output} "
+          f"({os.path.getsize(arguments.output) / 1e6:0.1f} MB, {sum(len(p) for p in peaks)} peaks).")
@@ -0,0 +1,217 @@
+import os, sys, json, time, platform, argparse, subprocess, tempfile, shutil, statistics
+
+# The GUI is driven on Qt's offscreen platform, no display is needed
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import scipy
+import pywt
+from PyQt6.QtWidgets import QApplication
+
+from generateDAQ import writeSyntheticCapture
+
+# Times the GUI pipeline stages on synthetic captures of several sizes:
+#   parse        loadingBarThread.run() without the sidecar cache (text parsing)
+#   load cached  loadingBarThread.run() from the sidecar cache
+#   wavelet      applyWaveletFilter (db4) on the whole dataset
+#   peaks        findPeaks, including collapseDoublePeaks and the redraw that follows
+#   retune       re-selecting the peaks from the candidate index after a threshold change
+#   collapse     collapseDoublePeaks alone
+#   redraw       updateRawPlot plus painting, for several window sizes and downsampling modes
+# and the startup of the application in a fresh interpreter (rows 0):
+#   startup window shown   from the interpreter start to the shown main window
+#   startup analysis ready until pywt and scipy are imported in the background as well
+DEFAULT_SIZES = [100000, 1000000, 5000000]
+REDRAW_WINDOWS = [10000, 1000000]
+REDRAW_MODES = ["Min/max envelope", "No downsampling"]
+
+# Run by a new interpreter for every startup measurement; time.perf_counter() of the
+# child cannot be compared with the parent, so the child reports its own import time
+# and the parent times the whole process
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from PyQt6.QtWidgets import QApplication
+import daqDataAnalyzer
+app = QApplication(sys.argv)
+window = daqDataAnalyzer.MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+window.analysisImports.wait()
+print(shown - start, time.perf_counter() - start)
+"""
+
+
+def measure(function, repeats, app, window):
+    # Seconds of every repeat; pending Qt events and requested redraws are processed inside the timing
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        app.processEvents()
+        window.redraw.flush()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def benchmarkStartup(repeats):
+    shown, ready = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True)
+        # Interpreter startup (before the script runs) is added to both times
+        before = time.perf_counter() - start - float(result.stdout.split()[-1])
+        shown.append(before + float(result.stdout.split()[-2]))
+        ready.append(before + float(result.stdout.split()[-1]))
+    return [{"rows": 0, "stage": stage, "seconds": statistics.median(seconds), "min": min(seconds), "repeats": len(seconds)}
+            for stage, seconds in [("startup window shown", shown), ("startup analysis ready", ready)]]
+
+
+def benchmarkSize(app, rows, dataDirectory, repeats, seed=0):
+    import daqDataAnalyzer
+    from daqCache import cacheSettings
+
+    inputFile = os.path.join(dataDirectory, f"synthetic-{rows}-{seed}.txt")
+    if not os.path.exists(inputFile):
+        print(f"[runBenchmarks] Generating {inputFile}.")
+        writeSyntheticCapture(inputFile, rows, seed=seed)
+
+    cacheDirectory = tempfile.mkdtemp(prefix="daqBenchmarkCache-")
+    window = daqDataAnalyzer.MainWindow()
+    window.cacheSettings = cacheSettings(cacheDirectory)
+    window.inputFile = inputFile
+    window.show()
+    app.processEvents()
+    window.analysisImports.wait()
+    app.processEvents()
+    results = {}
+
+    def load():
+        if window.store is not None:
+            window.store.close()
+        daqDataAnalyzer.loadingBarThread(inputFile, window).run()
+
+    try:
+        window.cacheSettings.enabled = False
+        results["parse"] = measure(load, repeats, app, window)
+        window.cacheSettings.enabled = True
+        load()
+        results["load cached"] = measure(load, repeats, app, window)
+
+        window.waveletFamilyCBox.setCurrentText("db")
+        window.selectWaveletCBox.setCurrentText("db4")
+
+        def wavelet():
+            window.applyWaveletFilter()
+            window.waveletFilter.wait()
+        results["wavelet"] = measure(wavelet, repeats, app, window)
+
+        # The synthetic peaks are negative pulses of amplitude about 1
+        for threshold, inverted in [(window.rawPlotThreshold1, window.invertedCh1Box), (window.rawPlotThreshold2, window.invertedCh2Box),
+                                    (window.rawPlotThreshold3, window.invertedCh3Box)]:
+            threshold.setValue(0.5)
+            inverted.setChecked(True)
+        window.doublePeakDistanceSpinBox.setValue(1.0)
+        window.showFilteredPeaksCheckBox.setChecked(True)
+        window.showRemovedPeaksCheckBox.setChecked(True)
+
+        def peaks():
+            window.findPeaks()
+            window.peakFinder.wait()
+        results["peaks"] = measure(peaks, repeats, app, window)
+
+        def retune():
+            window.rawPlotThreshold1.setValue(0.6 if window.rawPlotThreshold1.value() == 0.5 else 0.5)
+        results["retune"] = measure(retune, repeats, app, window)
+        results["collapse"] = measure(window.collapseDoublePeaks, repeats, app, window)
+
+        for mode in REDRAW_MODES:
+            window.downsamplingComboBox.setCurrentText(mode)
+            for size in REDRAW_WINDOWS:
+                size = min(size, rows)
+                window.rawWindowStartSpinBox.setValue(0)
+                window.rawWindowSizeSpinBox.setValue(size)
+                app.processEvents()
+                results[f"redraw {size} {mode}"] = measure(window.updateRawPlot, repeats, app, window)
+    finally:
+        window.close()
+        if window.store is not None:
+            window.store.close()
+        shutil.rmtree(cacheDirectory, ignore_errors=True)
+
+    return [{"rows": rows, "stage": stage, "seconds": statistics.median(seconds), "min": min(seconds), "repeats": len(seconds)}
+            for stage, seconds in results.items()]
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {"commit": commit, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "scipy": scipy.__version__, "pywt": pywt.__version__}
+
+
+def compare(results, baseline, tolerance):
+    """Prints the results next to a baseline and returns the stages slower than (1 + tolerance) times the baseline."""
+    reference = {(entry["rows"], entry["stage"]): entry["seconds"] for entry in baseline["results"]}
+    regressions = []
+    print(f"[runBenchmarks] Compared with {baseline['environment'].get('commit')} ({baseline['environment'].get('date')}):")
+    for entry in results:
+        key = (entry["rows"], entry["stage"])
+        if key not in reference:
+            continue
+        ratio = entry["seconds"] / reference[key] if reference[key] > 0 else float("inf")
+        slower = ratio > 1 + tolerance
+        if slower:
+            regressions.append(entry)
+        print(f"  {entry['rows']:>10} {entry['stage']:<32} {reference[key]:9.4f} s -> {entry['seconds']:9.4f} s  x{ratio:0.2f}"
+              + ("  SLOWER" if slower else ""))
+    return regressions
+
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description="Benchmarks of the daqDataAnalyzer pipeline on synthetic captures.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="number of rows of the captures")
+    parser.add_argument("--repeats", type=int, default=3, help="repeats per stage, the median is reported")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "daqBenchmarkData"),
+                        help="directory of the generated captures, which are reused between runs")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file the results are written to")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parseArguments(sys.argv[1:])
+    output = os.path.abspath(arguments.output)
+    baseline = os.path.abspath(arguments.baseline) if arguments.baseline else None
+    dataDirectory = os.path.abspath(arguments.data_dir)
+    os.makedirs(dataDirectory, exist_ok=True)
+    # MainWindow loads the .ui file relative to the working directory
+    os.chdir(ROOT)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    results = benchmarkStartup(arguments.repeats)
+    for entry in results:
+        print(f"[runBenchmarks] {'startup':>10} {entry['stage']:<32} {entry['seconds']:9.4f} s")
+    for rows in arguments.sizes:
+        entries = benchmarkSize(app, rows, dataDirectory, arguments.repeats)
+        for entry in entries:
+            print(f"[runBenchmarks] {entry['rows']:>10} {entry['stage']:<32} {entry['seconds']:9.4f} s")
+        results.extend(entries)
+
+    with open(output, "w") as f_out:
+        json.dump({"environment": environment(), "results": results}, f_out, indent=1)
+    print(f"[runBenchmarks] Results written to {output}.")
+
+    if baseline:
+        with open(baseline) as f_in:
+            baseline = json.load(f_in)
+        if compare(results, baseline, arguments.tolerance):
+            sys.exit(1)
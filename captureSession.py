@@ -0,0 +1,281 @@
+import os, threading
+from collections import OrderedDict
+import numpy as np
+
+from channelStore import ChannelStore, CHANNELS, loadStore
+from daqCache import mapSidecar, sidecarPath, protectedSidecars
+from instrumentation import stage
+
+# Mapped bytes of the open segments a session keeps, least recently used segments
+# beyond it are closed and memory mapped again when they are read
+DEFAULT_MEMORY_BUDGET = 2 * 1024**3
+# Bytes per row of a segment: float64 time and three float32 channels
+ROW_BYTES = 8 + 4 * len(CHANNELS)
+READ_BLOCK = 1 << 22
+
+
+class captureSegment:
+    """One capture file of a session: its place on the timeline and its arrays when open."""
+    def __init__(self, inputFile, start, rows, timeOrigin, timeOffset, reordered, arrays=None, pinned=False, sidecar=None):
+        self.inputFile = inputFile
+        self.start = start
+        self.rows = rows
+        self.timeOrigin = timeOrigin
+        # Added to the segment's own time index to get session time
+        self.timeOffset = timeOffset
+        self.reordered = reordered
+        self.arrays = arrays
+        # Without a sidecar the parsed arrays cannot be reopened and stay loaded
+        self.pinned = pinned
+        # Path of the validated sidecar, mapped again without re-reading its header
+        self.sidecar = sidecar
+
+    @property
+    def stop(self):
+        return self.start + self.rows
+
+
+class captureSession:
+    """Several capture files on one virtual timeline, without concatenating them.
+
+    The files are placed one after the other in the order of their first timestamp.
+    A file whose clock starts before the end of the previous one (e.g. every file
+    starts at zero) is placed right after it. starts holds the first sample and
+    firstTimes the first session time of every segment, so a sample or time is found
+    with one searchsorted over the segments and one inside the segment. Segments are
+    memory mapped from their sidecars when read and closed again, least recently used
+    first, once the open segments exceed memoryBudget bytes. The sidecars are protected
+    from the cache eviction of this process until close().
+    """
+    def __init__(self, inputFiles, settings, memoryBudget=DEFAULT_MEMORY_BUDGET, progressCallback=None):
+        self.settings = settings
+        self.memoryBudget = memoryBudget
+        self.lock = threading.RLock()
+        self.open = OrderedDict()
+        self.loads = 0
+        self.protected = True
+
+        entries = []
+        for number, inputFile in enumerate(inputFiles):
+            callback = None
+            if progressCallback is not None:
+                callback = lambda percent, number=number: progressCallback((number + percent / 100) / len(inputFiles) * 100)
+            with stage("segment index", file=inputFile) as record:
+                store = loadStore(inputFile, settings, progressCallback=callback)
+                record.rows = len(store)
+            timeIndex = store.timeIndex
+            tail = np.diff(np.asarray(timeIndex[-1000:], dtype=np.float64))
+            period = float(np.median(tail[tail > 0])) if (tail > 0).any() else 0.0
+            # loadStore returns the arrays mapped from the sidecar whenever there is one
+            sidecar = sidecarPath(inputFile, settings) if isinstance(timeIndex, np.memmap) else None
+            if sidecar is not None:
+                protectedSidecars[sidecar] += 1
+            pinned = sidecar is None
+            arrays = (timeIndex, *(store.channel(channel, layer="original") for channel in CHANNELS)) if pinned else None
+            entries.append({"inputFile": inputFile, "rows": len(store), "timeOrigin": store.timeOrigin,
+                            "duration": float(timeIndex[-1]) if len(store) > 0 else 0.0, "period": period,
+                            "reordered": store.reordered or [], "arrays": arrays, "pinned": pinned, "sidecar": sidecar})
+        # Stable, so files with the same clock origin keep the given order
+        entries.sort(key=lambda entry: entry["timeOrigin"])
+
+        self.segments = []
+        self.timeOrigin = entries[0]["timeOrigin"] if entries else 0.0
+        start, end = 0, None
+        for entry in entries:
+            offset = entry["timeOrigin"] - self.timeOrigin
+            if end is not None and offset <= end:
+                offset = end + (entry["period"] or previousPeriod)
+            self.segments.append(captureSegment(entry["inputFile"], start, entry["rows"], entry["timeOrigin"], offset,
+                                                entry["reordered"], entry["arrays"], entry["pinned"], entry["sidecar"]))
+            start += entry["rows"]
+            end = offset + entry["duration"]
+            previousPeriod = entry["period"] or 1.0
+        self.rows = start
+        self.starts = np.array([segment.start for segment in self.segments], dtype=np.int64)
+        self.firstTimes = np.array([segment.timeOffset for segment in self.segments], dtype=np.float64)
+
+    def __len__(self):
+        return self.rows
+
+    def arrays(self, number):
+        """(timeIndex, ch1, ch2, ch3) of segment number, memory mapped if it is not open."""
+        segment = self.segments[number]
+        with self.lock:
+            if segment.arrays is not None:
+                if number in self.open:
+                    self.open.move_to_end(number)
+                return segment.arrays
+            if segment.sidecar is not None and os.path.exists(segment.sidecar):
+                segment.arrays = mapSidecar(segment.sidecar, segment.rows)
+            else:
+                # The sidecar was evicted by another process, the file is loaded again
+                store = loadStore(segment.inputFile, self.settings)
+                segment.arrays = (store.timeIndex, *(store.channel(channel, layer="original") for channel in CHANNELS))
+            self.loads += 1
+            self.open[number] = segment
+            self._evict(keep=number)
+            return segment.arrays
+
+    def _evict(self, keep):
+        # Closes the least recently read segments until the open ones fit the budget
+        while sum(segment.rows for segment in self.open.values()) * ROW_BYTES > self.memoryBudget and len(self.open) > 1:
+            number, segment = next(iter(self.open.items()))
+            if number == keep:
+                self.open.move_to_end(number)
+                continue
+            del self.open[number]
+            segment.arrays = None
+
+    def close(self):
+        # The sidecars can be evicted again; evicted segments are loaded from the files
+        if self.protected:
+            for segment in self.segments:
+                if segment.sidecar is not None:
+                    protectedSidecars[segment.sidecar] -= 1
+                    if protectedSidecars[segment.sidecar] <= 0:
+                        del protectedSidecars[segment.sidecar]
+            self.protected = False
+
+    def segmentOf(self, samples):
+        return np.clip(np.searchsorted(self.starts, samples, side="right") - 1, 0, max(len(self.segments) - 1, 0))
+
+    def boundaries(self):
+        # (first sample, file name) of every segment after the first
+        return [(segment.start, os.path.basename(segment.inputFile)) for segment in self.segments[1:]]
+
+    def reordered(self):
+        # Out of order runs of all segments in session samples
+        return [[segment.start + start, segment.start + stop] for segment in self.segments for start, stop in segment.reordered]
+
+    def describe(self):
+        # Segment table stored with saved peaks
+        return [{"file": os.path.abspath(segment.inputFile), "start": segment.start, "rows": segment.rows,
+                 "timeOrigin": segment.timeOrigin, "timeOffset": segment.timeOffset} for segment in self.segments]
+
+    def __str__(self):
+        with self.lock:
+            mapped = sum(segment.rows for segment in self.open.values()) * ROW_BYTES
+        return (f"{len(self.segments)} files, {self.rows} samples, {len(self.open)} segments open "
+                f"({mapped / 1024**2:0.0f}/{self.memoryBudget / 1024**2:0.0f} MB), {self.loads} segment loads")
+
+
+class segmentedArray:
+    """Read-only array over one column of all segments of a captureSession.
+
+    Supports len, slicing, integer and integer array indexing, np.searchsorted (for the
+    time column), np.take and np.mean, so the rest of the program can use it like the
+    memory mapped array of a single file. A slice within one segment is a view of that
+    segment, a slice across segments is the concatenation of the pieces; nothing reads
+    more than the requested samples. Copies larger than the memory budget of the session
+    raise MemoryError.
+    """
+    def __init__(self, session, column):
+        self.session = session
+        self.column = column
+        self.dtype = np.dtype(np.float64 if column == 0 else np.float32)
+        self.ndim = 1
+
+    def __len__(self):
+        return len(self.session)
+
+    @property
+    def shape(self):
+        return (len(self.session),)
+
+    def _checkBudget(self, count):
+        # A copy of more of the column than the session may keep open is refused instead of
+        # made silently; whole session reads go per file (see channelView.pieces) or in blocks
+        if count * self.dtype.itemsize > self.session.memoryBudget:
+            raise MemoryError(f"Copying {count} samples of a session column exceeds the memory budget "
+                              f"({self.session.memoryBudget / 1024**2:0.0f} MB), read it per file or in blocks")
+
+    def _piece(self, number, start, stop):
+        # Samples [start, stop) of segment number, in segment samples
+        values = self.session.arrays(number)[self.column][start:stop]
+        if self.column == 0:
+            values = values + self.session.segments[number].timeOffset
+        return values
+
+    def __getitem__(self, key):
+        n = len(self)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(n)
+            if step != 1:
+                return self[np.arange(start, stop, step)]
+            if stop <= start:
+                return np.empty(0, dtype=self.dtype)
+            first, last = self.session.segmentOf([start, stop - 1])
+            if last > first:
+                self._checkBudget(stop - start)
+            pieces = [self._piece(number, max(start - self.session.starts[number], 0),
+                                  min(stop, self.session.segments[number].stop) - self.session.starts[number])
+                      for number in range(first, last + 1)]
+            return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+        if np.isscalar(key):
+            index = int(key)
+            if index < 0:
+                index += n
+            if not 0 <= index < n:
+                raise IndexError(f"index {key} is out of bounds for axis 0 with size {n}")
+            number = int(self.session.segmentOf(index))
+            return self._piece(number, index - self.session.starts[number], index - self.session.starts[number] + 1)[0]
+        indexes = np.asarray(key)
+        if indexes.dtype == bool:
+            indexes = np.flatnonzero(indexes)
+        indexes = np.where(indexes < 0, indexes + n, indexes).astype(np.int64)
+        if len(indexes) > 0 and (indexes.min() < 0 or indexes.max() >= n):
+            raise IndexError(f"index out of bounds for axis 0 with size {n}")
+        self._checkBudget(indexes.size)
+        out = np.empty(indexes.shape, dtype=self.dtype)
+        segments = self.session.segmentOf(indexes)
+        for number in np.unique(segments):
+            mask = segments == number
+            local = indexes[mask] - self.session.starts[number]
+            values = np.asarray(self.session.arrays(number)[self.column][local])
+            out[mask] = values + self.session.segments[number].timeOffset if self.column == 0 else values
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        # Copies the whole column, only for code that needs one contiguous array and only
+        # within the memory budget
+        values = self[:]
+        return values.astype(dtype) if dtype is not None else np.asarray(values)
+
+    def searchsorted(self, values, side="left", sorter=None):
+        """Positions in the time column, one search over the segments and one per segment."""
+        if self.column != 0:
+            raise ValueError("Only the time column of a session is sorted")
+        scalar = np.isscalar(values)
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        out = np.empty(values.shape, dtype=np.int64)
+        segments = np.clip(np.searchsorted(self.session.firstTimes, values, side="right") - 1, 0, None)
+        for number in np.unique(segments):
+            mask = segments == number
+            segment = self.session.segments[number]
+            timeIndex = self.session.arrays(number)[0]
+            out[mask] = segment.start + np.searchsorted(timeIndex, values[mask] - segment.timeOffset, side=side)
+        return int(out[0]) if scalar else out
+
+    def take(self, indices, axis=None, out=None, mode="raise"):
+        indices = np.asarray(indices)
+        if mode == "wrap":
+            indices = indices % len(self)
+        elif mode == "clip":
+            indices = np.clip(indices, 0, len(self) - 1)
+        return self[indices]
+
+    def mean(self, axis=None, dtype=None, out=None, **kwargs):
+        # Read in blocks, np.mean(array) ends up here
+        total = 0.0
+        for start in range(0, len(self), READ_BLOCK):
+            total += float(np.sum(self[start:start+READ_BLOCK], dtype=np.float64))
+        return total / len(self) if len(self) > 0 else np.nan
+
+
+def loadSession(inputFiles, settings, memoryBudget=DEFAULT_MEMORY_BUDGET, progressCallback=None):
+    """ChannelStore over the virtual timeline of several capture files (see captureSession)."""
+    session = captureSession(inputFiles, settings, memoryBudget, progressCallback)
+    print(f"[loadSession] {session}")
+    return ChannelStore(segmentedArray(session, 0), [segmentedArray(session, column) for column in range(1, len(CHANNELS) + 1)],
+                        session.timeOrigin, reordered=session.reordered(), session=session)
+
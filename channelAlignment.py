@@ -0,0 +1,147 @@
+import numpy as np
+from scipy import fft
+
+# Lags are estimated on the activity of the channels (absolute deviation from the mean),
+# so channels with opposite peak directions still line up. The coarse search runs on a
+# copy decimated to at most COARSE_SAMPLES points, the refinement on at most
+# REFINE_SAMPLES samples at full resolution.
+COARSE_SAMPLES = 1 << 20
+REFINE_SAMPLES = 1 << 23
+READ_BLOCK = 1 << 22
+
+
+def activity(data, factor=1, start=0, stop=None):
+    """|data - mean| of data[start:stop] averaged over blocks of factor samples, read in blocks.
+
+    Works on memory mapped channels and sessions without converting them as a whole.
+    """
+    if stop is None:
+        stop = len(data)
+    total = 0.0
+    for first in range(start, stop, READ_BLOCK):
+        total += float(np.sum(data[first:min(first + READ_BLOCK, stop)], dtype=np.float64))
+    mean = total / (stop - start) if stop > start else 0.0
+    blocks = max(stop - start, 0) // factor
+    out = np.empty(blocks, dtype=np.float32)
+    step = max(READ_BLOCK // factor, 1)
+    for first in range(0, blocks, step):
+        last = min(first + step, blocks)
+        chunk = np.abs(np.asarray(data[start+first*factor:start+last*factor], dtype=np.float32) - mean)
+        out[first:last] = chunk.reshape(last - first, factor).mean(axis=1)
+    return out
+
+
+def _standardize(values):
+    values = values - values.mean()
+    deviation = values.std()
+    return values / deviation if deviation > 0 else values
+
+
+def coarseLag(reference, signal, maxLag):
+    """Lag (signal[t + lag] matches reference[t]) maximizing the FFT cross-correlation.
+
+    Returns (lag, correlation); the correlation is normalized per overlapping sample.
+    """
+    a = _standardize(reference.astype(np.float64))
+    b = _standardize(signal.astype(np.float64))
+    n = min(len(a), len(b))
+    a, b = a[:n], b[:n]
+    size = fft.next_fast_len(2 * n - 1, real=True)
+    correlation = fft.irfft(np.conj(fft.rfft(a, size)) * fft.rfft(b, size), size)
+    maxLag = min(int(maxLag), n - 1)
+    lags = np.arange(-maxLag, maxLag + 1)
+    values = correlation[lags % size] / (n - np.abs(lags))
+    best = int(np.argmax(values))
+    return int(lags[best]), float(values[best])
+
+
+def refineLag(reference, signal, guess, radius, start, stop):
+    """Best lag in [guess - radius, guess + radius] at full resolution over reference[start:stop]."""
+    low, high = guess - radius, guess + radius
+    # The window is shrunk so that every candidate lag stays inside signal
+    start = max(start, -low, 0)
+    stop = min(stop, len(signal) - high, len(reference))
+    if stop - start < 2:
+        return guess, 0.0
+    if stop - start > REFINE_SAMPLES:
+        middle = (start + stop) // 2
+        start, stop = middle - REFINE_SAMPLES // 2, middle + REFINE_SAMPLES // 2
+    a = _standardize(activity(reference[start:stop]))
+    b = activity(signal[start+low:stop+high])
+    b = (b - b.mean()) / (b.std() or 1.0)
+    values = np.array([np.dot(a, b[lag-low:lag-low+len(a)]) / len(a) for lag in range(low, high + 1)])
+    best = int(np.argmax(values))
+    return low + best, float(values[best])
+
+
+def estimateLag(reference, signal, start=0, stop=None, maxLag=None):
+    """Lag of signal against reference over reference[start:stop], coarse then refined.
+
+    Returns (lag, correlation); the channel view shift that aligns signal is lag.
+    """
+    if stop is None:
+        stop = len(reference)
+    length = stop - start
+    if maxLag is None:
+        maxLag = length // 4
+    factor = max(-(-length // COARSE_SAMPLES), 1)
+    lag, correlation = coarseLag(activity(reference, factor, start, stop), activity(signal, factor, start, min(stop, len(signal))),
+                                 max(maxLag // factor, 1))
+    # The decimated lag is only known to within a block, and the noise of the coarse
+    # correlation peak can move it by one more
+    return refineLag(reference, signal, lag * factor, factor + 1, start, stop)
+
+
+class lagModel:
+    """Piecewise constant lag of one channel: lags[i] holds from sample starts[i] on."""
+    def __init__(self, starts, lags, correlations):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.lags = np.asarray(lags, dtype=np.int64)
+        self.correlations = np.asarray(correlations, dtype=np.float64)
+
+    def lagAt(self, samples):
+        segment = np.searchsorted(self.starts, samples, side="right") - 1
+        return self.lags[np.clip(segment, 0, len(self.lags) - 1)]
+
+    @property
+    def drift(self):
+        return int(self.lags.max() - self.lags.min()) if len(self.lags) > 0 else 0
+
+    def __str__(self):
+        if len(self.lags) == 1:
+            return f"lag {self.lags[0]} (correlation {self.correlations[0]:0.2f})"
+        return (f"lag {self.lags.min()}..{self.lags.max()} over {len(self.lags)} segments "
+                f"(correlation {self.correlations.min():0.2f}..{self.correlations.max():0.2f})")
+
+
+def alignChannels(channels, reference=0, segmentSamples=None, maxLag=None, progressCallback=None):
+    """One lagModel per channel against channels[reference] (whose lag is 0).
+
+    With segmentSamples the lag is estimated per segment of that length to follow a
+    drift, otherwise once over the whole recording.
+    """
+    n = min(len(channel) for channel in channels)
+    if segmentSamples is None or segmentSamples >= n:
+        starts = [0]
+    else:
+        starts = list(range(0, n - segmentSamples // 2, segmentSamples))
+    ends = starts[1:] + [n]
+    models = []
+    tasks = (len(channels) - 1) * len(starts)
+    done = 0
+    for number, channel in enumerate(channels):
+        if number == reference:
+            models.append(lagModel([0], [0], [1.0]))
+            continue
+        lags, correlations = [], []
+        for start, stop in zip(starts, ends):
+            lag, correlation = estimateLag(channels[reference], channel, start, stop,
+                                           maxLag if maxLag is not None else (stop - start) // 4)
+            lags.append(lag)
+            correlations.append(correlation)
+            done += 1
+            if progressCallback is not None:
+                progressCallback(int(done / tasks * 100))
+        models.append(lagModel(starts, lags, correlations))
+    return models
+
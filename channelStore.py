@@ -0,0 +1,235 @@
+import tempfile
+import numpy as np
+
+from envelopePyramid import EnvelopePyramid
+from daqParser import parseDAQFile, parseStats
+from daqCache import loadSidecar, writeSidecar
+from instrumentation import stage
+from timeAxis import timeAxis, sortRuns
+
+CHANNELS = ["Channel 1", "Channel 2", "Channel 3"]
+
+
+class channelView:
+    """Window over one channel of a ChannelStore.
+
+    Slicing is zero-copy. The sample shift only moves the window over the channel
+    (the time axis follows the shifted samples, as the raw plot always did) and the
+    inversion is only applied when values are read.
+    """
+    def __init__(self, timeIndex, data, start, stop, inverted=False):
+        start = min(max(start, 0), len(data))
+        stop = min(max(stop, start), len(data))
+        self.start = start
+        self.stop = stop
+        self.inverted = inverted
+        self.timeIndex = timeIndex
+        self.data = data
+
+    def __len__(self):
+        return self.stop - self.start
+
+    # Read on access, a view of a session (see captureSession.py) only reads its samples when used
+    @property
+    def index(self):
+        return self.timeIndex[self.start:self.stop]
+
+    @property
+    def raw(self):
+        return self.data[self.start:self.stop]
+
+    @property
+    def values(self):
+        if self.inverted:
+            return np.negative(self.raw)
+        return self.raw
+
+    def sample(self, count):
+        # About count evenly spaced values of the window, without reading the rest
+        step = max(len(self) // count, 1)
+        values = [piece.data[piece.start:piece.stop:step] for piece in self.pieces()]
+        values = values[0] if len(values) == 1 else np.concatenate(values)
+        return np.negative(values) if self.inverted else values
+
+    def pieces(self):
+        """The window split at the file boundaries of a session (see captureSession.py).
+
+        Reading a piece reads a single file; a window of a single file is one piece.
+        """
+        session = getattr(self.timeIndex, "session", None)
+        if session is None or len(self) == 0:
+            return [self]
+        first, last = session.segmentOf([self.start, self.stop - 1])
+        bounds = [self.start] + [int(start) for start in session.starts[first+1:last+1]] + [self.stop]
+        return [channelView(self.timeIndex, self.data, start, stop, self.inverted) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+class ChannelStore:
+    """Time index plus named layers of channel arrays.
+
+    The arrays are normally memory mapped (from the sidecar cache), so opening a
+    capture does not read it into memory. The "filtered" layer starts as an alias of
+    the "original" layer and only gets its own (memory mapped scratch) array for a
+    channel once something writes to it.
+    """
+    def __init__(self, timeIndex, channels, timeOrigin=0.0, sourceBytes=0, reordered=None, session=None):
+        self.timeIndex = timeIndex
+        self.layers = {"original": dict(zip(CHANNELS, channels)),
+                       "filtered": dict(zip(CHANNELS, channels))}
+        self.scratchFiles = []
+        self.pyramids = []
+        # Absolute time of the first sample and number of source file bytes loaded,
+        # needed to continue reading a file that is still being written.
+        self.timeOrigin = timeOrigin
+        self.sourceBytes = sourceBytes
+        self.buffers = None
+        # Sample ranges which were out of order in the source file (see timeAxis.sortRuns)
+        self.reordered = reordered
+        # captureSession of a store spanning several files, whose arrays are segmentedArrays
+        self.session = session
+        self._timeAxis = None
+
+    def __len__(self):
+        return len(self.timeIndex)
+
+    def channel(self, name, layer="filtered"):
+        return self.layers[layer][name]
+
+    def allocate(self, name, layer="filtered", dtype=np.float32, install=True):
+        # Writable memory mapped array for name in layer. With install=False the array
+        # only replaces the layer's channel once it is passed to setChannel.
+        scratch = tempfile.TemporaryFile(prefix="daqDataAnalyzer-")
+        self.scratchFiles.append(scratch)
+        array = np.memmap(scratch, dtype=dtype, mode="w+", shape=(len(self),))
+        if install:
+            self.layers[layer][name] = array
+        return array
+
+    def setChannel(self, name, values, layer="filtered"):
+        if isinstance(values, np.memmap) and len(values) == len(self):
+            # Already a scratch array from allocate(install=False)
+            self.layers[layer][name] = values
+            return values
+        array = self.allocate(name, layer)
+        # Wavelet reconstructions of odd length signals are one sample longer
+        array[:] = values[:len(self)]
+        return array
+
+    def pyramid(self, name, layer="filtered"):
+        # Envelope pyramids follow the arrays, so replacing a channel (wavelet filter)
+        # automatically leads to a rebuild on the next request.
+        data = self.layers[layer][name]
+        for pyramid in self.pyramids:
+            if pyramid.data is data:
+                return pyramid
+        inUse = [array for channels in self.layers.values() for array in channels.values()]
+        self.pyramids = [pyramid for pyramid in self.pyramids if any(pyramid.data is array for array in inUse)]
+        pyramid = EnvelopePyramid(data)
+        self.pyramids.append(pyramid)
+        return pyramid
+
+    def envelope(self, name, start, stop, pixels, layer="filtered", shift=0):
+        # (x, y) for drawing a window with at most a few points per pixel
+        return self.pyramid(name, layer).window(self.timeIndex, start + shift, stop + shift, pixels)
+
+    def append(self, timeIndex, channels):
+        """Appends rows to the original layer in amortized O(new rows).
+
+        The first append moves the data into growable in-memory buffers whose capacity
+        doubles when full. Filtered channels are reset to the original data, as a filter
+        applied to the old data does not cover the new rows. Envelope pyramids are
+        extended in place.
+        """
+        n = len(self)
+        rows = len(timeIndex)
+        if rows == 0:
+            return
+        if self.buffers is None or len(self.buffers[0]) < n + rows:
+            capacity = max(2 * (n + rows), 65536)
+            buffers = [np.empty(capacity, dtype=np.float64)] + [np.empty(capacity, dtype=np.float32) for _ in CHANNELS]
+            buffers[0][:n] = self.timeIndex
+            for buffer, name in zip(buffers[1:], CHANNELS):
+                buffer[:n] = self.layers["original"][name]
+            self.buffers = buffers
+
+        self.buffers[0][n:n+rows] = timeIndex
+        self.timeIndex = self.buffers[0][:n+rows]
+        for buffer, name, values in zip(self.buffers[1:], CHANNELS, channels):
+            buffer[n:n+rows] = values
+            old = self.layers["original"][name]
+            new = buffer[:n+rows]
+            for pyramid in self.pyramids:
+                if pyramid.data is old:
+                    pyramid.extend(new)
+            self.layers["original"][name] = new
+            self.layers["filtered"][name] = new
+
+    def timeAxis(self):
+        # Built on first use and again when rows were appended
+        if self._timeAxis is None or len(self._timeAxis) != len(self) or self._timeAxis.timeIndex is not self.timeIndex:
+            self._timeAxis = timeAxis(self.timeIndex, self.reordered, self.session.boundaries() if self.session else None)
+        return self._timeAxis
+
+    def resetLayer(self, layer="filtered"):
+        self.layers[layer] = dict(self.layers["original"])
+
+    def view(self, name, start=0, stop=None, layer="filtered", shift=0, inverted=False):
+        if stop is None:
+            stop = len(self)
+        return channelView(self.timeIndex, self.layers[layer][name], start + shift, stop + shift, inverted)
+
+    def close(self):
+        for scratch in self.scratchFiles:
+            scratch.close()
+        self.scratchFiles = []
+
+
+def loadStore(inputFile, settings, progressCallback=None, stats=None):
+    """Loads a DAQ file into a ChannelStore.
+
+    A previously opened file is memory mapped from its binary sidecar. Otherwise the
+    file is parsed, rows without a timestamp are removed, the rows which are out of
+    order are sorted by time and the time index starts at zero; the result is written
+    to the sidecar cache.
+    """
+    with stage("sidecar load") as record:
+        cached = loadSidecar(inputFile, settings)
+        record.rows = len(cached[0][0]) if cached is not None else 0
+    if cached is not None:
+        (timeIndex, ch1, ch2, ch3), header = cached
+        print(f"[loadStore] Loaded {len(timeIndex)} rows from the sidecar cache.")
+        if progressCallback is not None:
+            progressCallback(100)
+        return ChannelStore(timeIndex, [ch1, ch2, ch3], header["timeOrigin"], header["sourceBytes"], header.get("reordered"))
+
+    # Parsing the file in fixed size blocks, progress is reported once per block.
+    if stats is None:
+        stats = parseStats()
+    with stage("parse") as record:
+        timeIndex, ch1, ch2, ch3 = parseDAQFile(inputFile, progressCallback=progressCallback, stats=stats)
+        record.rows = stats.rows
+        record.details["malformedLines"] = stats.malformedLines
+    print(f"\n[loadStore] Parsed {stats}")
+
+    # Removing empty rows and sorting by time. Captures are almost sorted, only the runs
+    # which are out of order are sorted.
+    with stage("sort", rows=len(timeIndex)) as record:
+        valid = timeIndex != 0
+        if not valid.all():
+            timeIndex, ch1, ch2, ch3 = timeIndex[valid], ch1[valid], ch2[valid], ch3[valid]
+        order, reordered = sortRuns(timeIndex)
+        if order is not None:
+            timeIndex, ch1, ch2, ch3 = timeIndex[order], ch1[order], ch2[order], ch3[order]
+        record.details["reorderedRuns"] = len(reordered)
+        timeOrigin = float(timeIndex[0]) if len(timeIndex) > 0 else 0.0
+        timeIndex -= timeOrigin
+    sourceBytes = stats.bytesRead
+    reordered = reordered.tolist()
+
+    with stage("cache write", rows=len(timeIndex)):
+        mapped = writeSidecar(inputFile, settings, timeIndex, ch1, ch2, ch3, timeOrigin, sourceBytes, reordered)
+        if mapped is not None:
+            # Continuing from the memory mapped sidecar so that the parsed arrays can be released
+            timeIndex, ch1, ch2, ch3 = mapped
+
+    return ChannelStore(timeIndex, [ch1, ch2, ch3], timeOrigin, sourceBytes, reordered)
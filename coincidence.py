@@ -0,0 +1,90 @@
+import numpy as np
+
+# Coincidence groups of findCoincidences, the code of a group is its position in the list
+COINCIDENCE_GROUPS = ["singleton", "ch1+ch2", "ch1+ch3", "ch2+ch3", "all"]
+
+
+def nearestMatches(a, b, tolerance):
+    """Pairs (i, j) of sorted a and b which are each other's nearest neighbour and at most
+    tolerance apart, in O((n + m) log m). Returns the index arrays (i, j).
+    """
+    a, b = np.asarray(a), np.asarray(b)
+    if len(a) == 0 or len(b) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    def nearest(x, y):
+        # Index of the nearest y of every x (the lower one on ties) and its distance
+        right = np.searchsorted(y, x, side="left")
+        left = np.clip(right - 1, 0, len(y) - 1)
+        right = np.clip(right, 0, len(y) - 1)
+        leftDistance = np.abs(x - y[left]).astype(np.float64)
+        rightDistance = np.abs(y[right] - x).astype(np.float64)
+        useLeft = leftDistance <= rightDistance
+        return np.where(useLeft, left, right), np.where(useLeft, leftDistance, rightDistance)
+
+    nearestB, distance = nearest(a, b)
+    nearestA, _ = nearest(b, a)
+    mutual = (distance <= tolerance) & (nearestA[nearestB] == np.arange(len(a)))
+    return np.flatnonzero(mutual), nearestB[mutual]
+
+
+def findCoincidences(peaks, shifts, tolerance):
+    """Groups the peaks of the three channels which belong to the same event.
+
+    peaks are the sorted peak samples of the channels, shifts their sample shifts as
+    used by the channel views (numbers, or objects with lagAt(samples) such as
+    channelAlignment.lagModel), so that raw sample p of a channel lies at p - shift on
+    the common axis. Channel 1 peaks are matched to their nearest channel 2 and channel
+    3 peaks within tolerance samples (mutual nearest neighbours), the remaining channel
+    2 and 3 peaks with each other. Everything is searchsorted based, O(n log n).
+
+    Returns (codes, members, memberCodes): the COINCIDENCE_GROUPS code of every peak
+    per channel, the (events, 3) peak indices of the multi-channel events (-1 where a
+    channel is missing) ordered by time, and the group code of every event.
+    """
+    aligned, orders = [], []
+    for channelPeaks, shift in zip(peaks, shifts):
+        channelPeaks = np.asarray(channelPeaks, dtype=np.int64)
+        position = channelPeaks - (shift.lagAt(channelPeaks) if hasattr(shift, "lagAt") else int(shift))
+        # Piecewise shifts can reorder peaks around the segment boundaries
+        order = np.argsort(position, kind="stable")
+        aligned.append(position[order])
+        orders.append(order)
+
+    n1, n2, n3 = (len(channelPeaks) for channelPeaks in aligned)
+    partner2 = np.full(n1, -1, dtype=np.int64)
+    partner3 = np.full(n1, -1, dtype=np.int64)
+    i, j = nearestMatches(aligned[0], aligned[1], tolerance)
+    partner2[i] = j
+    i, k = nearestMatches(aligned[0], aligned[2], tolerance)
+    partner3[i] = k
+    # Channel 2 and 3 peaks without a channel 1 partner can still coincide with each other
+    free2 = np.setdiff1d(np.arange(n2), partner2[partner2 >= 0], assume_unique=True)
+    free3 = np.setdiff1d(np.arange(n3), partner3[partner3 >= 0], assume_unique=True)
+    j, k = nearestMatches(aligned[1][free2], aligned[2][free3], tolerance)
+
+    first = np.flatnonzero((partner2 >= 0) | (partner3 >= 0))
+    members = np.concatenate((np.column_stack((first, partner2[first], partner3[first])),
+                              np.column_stack((np.full(len(j), -1), free2[j], free3[k])))).astype(np.int64)
+    memberCodes = np.select([(members[:, 1] >= 0) & (members[:, 2] >= 0) & (members[:, 0] >= 0),
+                             members[:, 2] < 0, members[:, 1] < 0],
+                            [COINCIDENCE_GROUPS.index("all"), COINCIDENCE_GROUPS.index("ch1+ch2"),
+                             COINCIDENCE_GROUPS.index("ch1+ch3")], COINCIDENCE_GROUPS.index("ch2+ch3")).astype(np.int8)
+
+    # Events ordered by the position of their first member on the common axis
+    times = np.where(members[:, 0] >= 0, aligned[0][np.maximum(members[:, 0], 0)], aligned[1][np.maximum(members[:, 1], 0)])
+    order = np.argsort(times, kind="stable")
+    members, memberCodes = members[order], memberCodes[order]
+
+    codes = []
+    for channel, (channelOrder, count) in enumerate(zip(orders, (n1, n2, n3))):
+        channelCodes = np.zeros(count, dtype=np.int8)
+        present = members[:, channel] >= 0
+        channelCodes[members[present, channel]] = memberCodes[present]
+        # Back from the sorted aligned positions to the order of the given peaks
+        members[present, channel] = channelOrder[members[present, channel]]
+        original = np.empty(count, dtype=np.int8)
+        original[channelOrder] = channelCodes
+        codes.append(original)
+    return codes, members, memberCodes
+
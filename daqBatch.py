@@ -0,0 +1,179 @@
+import os, sys, csv, glob, time, hashlib, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from channelStore import CHANNELS, loadStore
+from daqCache import cacheSettings
+from daqParser import parseStats
+from peakDetection import detectPeaks, collapseLeadingPeaks
+from waveletEngine import filterChannels
+
+# Headless version of the GUI pipeline: parse, optional wavelet filter, find_peaks and
+# double peak collapsing, for many DAQ files at once. No Qt is imported.
+
+STAGES = ["load", "wavelet", "peaks", "collapse", "write"]
+
+
+class batchSettings:
+    def __init__(self, thresholds=(0.0, 0.0, 0.0), inverted=(False, False, False), width=0.0, distance=1.0,
+                 doublePeakDistance=0.0, wavelet=None, outputDirectory=".", cache=None):
+        self.thresholds = list(thresholds)
+        self.inverted = list(inverted)
+        self.width = width
+        self.distance = distance
+        # In ms, like the GUI spin box (x10 gives samples)
+        self.doublePeakDistance = doublePeakDistance
+        self.wavelet = wavelet
+        self.outputDirectory = outputDirectory
+        self.cache = cache if cache is not None else cacheSettings()
+
+
+def processFile(inputFile, settings, name=None):
+    """Runs the pipeline on one file, writes its peak table and returns its summary."""
+    timings = {}
+    start = time.perf_counter()
+    stats = parseStats()
+    store = loadStore(inputFile, settings.cache, stats=stats)
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if settings.wavelet:
+        # Files are already spread over processes, so every file filters on one thread
+        outputs = [store.allocate(channel, install=False) for channel in CHANNELS]
+        filterChannels([store.channel(channel, layer="original") for channel in CHANNELS], outputs,
+                       settings.wavelet, workers=1)
+        for channel, output in zip(CHANNELS, outputs):
+            store.setChannel(channel, output)
+    timings["wavelet"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    peaks = {}
+    for channel, threshold, invert in zip(CHANNELS, settings.thresholds, settings.inverted):
+        # For inverted peaks the data and the threshold are negated
+        view = store.view(channel, inverted=invert)
+        peaks[channel] = detectPeaks(view.values, -threshold if invert else threshold, settings.width, settings.distance)
+    timings["peaks"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    collapsed = {}
+    for channel in CHANNELS:
+        filtered, removed, _ = collapseLeadingPeaks(peaks[channel], settings.doublePeakDistance * 10)
+        collapsed[channel] = (filtered, removed)
+    timings["collapse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    peakFile = writePeakTable(inputFile, store, collapsed, settings.outputDirectory, name)
+    timings["write"] = time.perf_counter() - start
+
+    duration = float(store.timeIndex[-1]) if len(store) > 0 else 0.0
+    summary = {"file": inputFile, "peakFile": peakFile, "rows": len(store), "duration": duration}
+    for channel in CHANNELS:
+        filtered, removed = collapsed[channel]
+        key = channel.replace(" ", "").lower()
+        summary[f"{key}Peaks"] = len(filtered) + len(removed)
+        summary[f"{key}Filtered"] = len(filtered)
+        summary[f"{key}Removed"] = len(removed)
+        summary[f"{key}Rate"] = len(filtered) / duration if duration > 0 else 0.0
+    for stage in STAGES:
+        summary[f"{stage}Seconds"] = timings[stage]
+    store.close()
+    return summary
+
+
+def peakTableNames(files):
+    # Output name of every file: its name without extension, followed by a short hash of
+    # its path when files from different directories share that name
+    stems = [os.path.splitext(os.path.basename(inputFile))[0] for inputFile in files]
+    names = {}
+    for inputFile, stem in zip(files, stems):
+        if stems.count(stem) > 1:
+            stem += "." + hashlib.blake2b(os.path.abspath(inputFile).encode(), digest_size=4).hexdigest()
+        names[inputFile] = stem
+    return names
+
+
+def writePeakTable(inputFile, store, collapsed, outputDirectory, name=None):
+    # One row per peak: channel, sample number, time [s] and whether it survived the double peak filter
+    os.makedirs(outputDirectory, exist_ok=True)
+    if name is None:
+        name = os.path.splitext(os.path.basename(inputFile))[0]
+    peakFile = os.path.join(outputDirectory, name + ".peaks.csv")
+    with open(peakFile, "w") as f_out:
+        f_out.write("channel,sample,time,filtered\n")
+        for number, channel in enumerate(CHANNELS, 1):
+            filtered, removed = collapsed[channel]
+            samples = np.concatenate((filtered, removed))
+            kept = np.concatenate((np.ones(len(filtered), dtype=int), np.zeros(len(removed), dtype=int)))
+            order = np.argsort(samples, kind="stable")
+            samples, kept = samples[order], kept[order]
+            table = np.column_stack((np.full(len(samples), number), samples, store.timeIndex[samples], kept))
+            np.savetxt(f_out, table, fmt=["%d", "%d", "%.6f", "%d"], delimiter=",")
+    return peakFile
+
+
+def collectFiles(inputs, pattern="*.txt"):
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    return files
+
+
+def runBatch(files, settings, workers=None):
+    """Processes files on a process pool and writes summary.csv. Returns the summaries."""
+    summaries = []
+    names = peakTableNames(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(processFile, inputFile, settings, names[inputFile]): inputFile for inputFile in files}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as error:
+                print(f"[daqBatch] Error: {futures[future]} failed ({error}).")
+                continue
+            timings = ", ".join(f"{stage} {summary[stage + 'Seconds']:0.2f} s" for stage in STAGES)
+            print(f"[daqBatch] {summary['file']}: {summary['rows']} rows ({timings})")
+            summaries.append(summary)
+
+    summaries.sort(key=lambda summary: summary["file"])
+    if summaries:
+        os.makedirs(settings.outputDirectory, exist_ok=True)
+        with open(os.path.join(settings.outputDirectory, "summary.csv"), "w", newline="") as f_out:
+            writer = csv.DictWriter(f_out, fieldnames=list(summaries[0].keys()))
+            writer.writeheader()
+            writer.writerows(summaries)
+        totals = {stage: sum(summary[stage + "Seconds"] for summary in summaries) for stage in STAGES}
+        print("[daqBatch] Total time per stage: " + ", ".join(f"{stage} {seconds:0.2f} s" for stage, seconds in totals.items()))
+    return summaries
+
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description="Headless peak detection on DAQ files.")
+    parser.add_argument("inputs", nargs="+", help="DAQ files or directories containing them")
+    parser.add_argument("--pattern", default="*.txt", help="file pattern used inside directories")
+    parser.add_argument("--output", default="peaks", help="output directory for peak tables and summary.csv")
+    parser.add_argument("--threshold", type=float, nargs=3, default=[0.0, 0.0, 0.0], metavar=("CH1", "CH2", "CH3"))
+    parser.add_argument("--inverted", type=int, nargs="*", default=[], metavar="CHANNEL", help="channels (1-3) with inverted peaks")
+    parser.add_argument("--width", type=float, default=0.0, help="find_peaks width")
+    parser.add_argument("--distance", type=float, default=1.0, help="find_peaks distance")
+    parser.add_argument("--double-peak-distance", type=float, default=0.0, help="double peak distance [ms]")
+    parser.add_argument("--wavelet", default=None, help="apply the wavelet filter with this wavelet (e.g. db4)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--cache-dir", default=None, help="sidecar cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write sidecar files")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parseArguments(sys.argv[1:])
+    cache = cacheSettings(arguments.cache_dir, enabled=not arguments.no_cache)
+    settings = batchSettings(arguments.threshold, [channel in arguments.inverted for channel in (1, 2, 3)],
+                             arguments.width, arguments.distance, arguments.double_peak_distance,
+                             arguments.wavelet, arguments.output, cache)
+    files = collectFiles(arguments.inputs, arguments.pattern)
+    if not files:
+        print("[daqBatch] Error: no input files found.")
+        sys.exit(1)
+    runBatch(files, settings, arguments.workers)
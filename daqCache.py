@@ -0,0 +1,175 @@
+import os, json, hashlib, time
+from collections import Counter
+import numpy as np
+
+# Sidecar layout: a 4 KiB JSON header padded with spaces, followed by the float64 time
+# index, the three float32 channels and the (start, stop) int64 pairs of the out of
+# order runs, each stored contiguously.
+MAGIC = "daqDataAnalyzer sidecar"
+VERSION = 3
+HEADER_SIZE = 4096
+SUFFIX = ".daqcache"
+
+# Sidecars of the open sessions (see captureSession.py), never evicted by this process
+protectedSidecars = Counter()
+
+# Content hash samples: head and tail of the file plus evenly spaced blocks in between.
+# Hashing the whole file would cost as much as parsing it.
+HASH_BLOCK = 1024 * 1024
+HASH_SAMPLES = 16
+
+
+class cacheSettings:
+    def __init__(self, directory=None, maxBytes=10 * 1024**3, enabled=True):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".cache", "daqDataAnalyzer")
+        self.directory = directory
+        self.maxBytes = int(maxBytes)
+        self.enabled = enabled
+
+
+def contentHash(inputFile, size=None):
+    if size is None:
+        size = os.path.getsize(inputFile)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+    with open(inputFile, "rb") as f_in:
+        if size <= HASH_BLOCK * (HASH_SAMPLES + 2):
+            digest.update(f_in.read())
+        else:
+            offsets = np.linspace(0, size - HASH_BLOCK, HASH_SAMPLES + 2).astype(np.int64)
+            for offset in offsets:
+                f_in.seek(int(offset))
+                digest.update(f_in.read(HASH_BLOCK))
+    return digest.hexdigest()
+
+
+def sourceSignature(inputFile):
+    status = os.stat(inputFile)
+    return {"size": status.st_size, "mtime": status.st_mtime_ns, "hash": contentHash(inputFile, status.st_size)}
+
+
+def sidecarPath(inputFile, settings):
+    key = hashlib.blake2b(os.path.abspath(inputFile).encode(), digest_size=12).hexdigest()
+    name = os.path.basename(inputFile)
+    return os.path.join(settings.directory, f"{name}.{key}{SUFFIX}")
+
+
+def _readHeader(path):
+    with open(path, "rb") as f_in:
+        header = json.loads(f_in.read(HEADER_SIZE).decode())
+    if header.get("magic") != MAGIC or header.get("version") != VERSION:
+        return None
+    return header
+
+
+def loadSidecar(inputFile, settings):
+    """Memory maps the sidecar of inputFile.
+
+    Returns ((timeIndex, ch1, ch2, ch3), header) or None when there is no valid sidecar.
+    A sidecar is stale when the size, mtime or sampled content hash of the source changed,
+    or when it holds only a prefix of the source (parsed while the file was growing).
+    """
+    if not settings.enabled:
+        return None
+    path = sidecarPath(inputFile, settings)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        header = _readHeader(path)
+    except (OSError, ValueError):
+        header = None
+    if header is None or header["source"] != sourceSignature(inputFile) or header["sourceBytes"] != header["source"]["size"]:
+        print(f"[daqCache] Stale sidecar removed ({path}).")
+        os.remove(path)
+        return None
+
+    rows = header["rows"]
+    runs = np.fromfile(path, dtype=np.int64, count=2 * header["reorderedRuns"], offset=HEADER_SIZE + rows * 20)
+    header["reordered"] = runs.reshape(-1, 2).tolist()
+    header["path"] = path
+    # Marking the sidecar as recently used for the oldest-first eviction
+    os.utime(path)
+    return mapSidecar(path, rows), header
+
+
+def mapSidecar(path, rows):
+    """(timeIndex, ch1, ch2, ch3) of a sidecar already validated by loadSidecar."""
+    # Copy-on-write mapping: the arrays are writable (some pywt routines refuse read-only
+    # buffers) but nothing is ever written back to the sidecar.
+    timeIndex = np.memmap(path, dtype=np.float64, mode="c", offset=HEADER_SIZE, shape=(rows,))
+    channels = np.memmap(path, dtype=np.float32, mode="c", offset=HEADER_SIZE + rows * 8, shape=(3, rows))
+    return timeIndex, channels[0], channels[1], channels[2]
+
+
+def writeSidecar(inputFile, settings, timeIndex, ch1, ch2, ch3, timeOrigin=0.0, sourceBytes=None, reordered=None):
+    """Writes the sidecar of inputFile.
+
+    Returns the memory mapped (timeIndex, ch1, ch2, ch3) of the new sidecar, or None when
+    nothing was written. The arrays are mapped straight from the written file, the source
+    is not validated again (it may already have grown).
+    """
+    if not settings.enabled:
+        return None
+    os.makedirs(settings.directory, exist_ok=True)
+    path = sidecarPath(inputFile, settings)
+    rows = len(timeIndex)
+    header = {"magic": MAGIC, "version": VERSION, "rows": rows,
+              "sourceFile": os.path.abspath(inputFile), "source": sourceSignature(inputFile),
+              "timeOrigin": timeOrigin, "sourceBytes": sourceBytes, "created": time.time()}
+    if sourceBytes is None:
+        header["sourceBytes"] = header["source"]["size"]
+    if header["sourceBytes"] != header["source"]["size"]:
+        print(f"[daqCache] The file grew while it was parsed, cache not written.")
+        return None
+    # Sample ranges which were out of order in the file, stored after the channels
+    reordered = np.asarray(reordered if reordered is not None else [], dtype=np.int64).reshape(-1, 2)
+    header["reorderedRuns"] = len(reordered)
+    header = json.dumps(header).encode()
+    if len(header) > HEADER_SIZE:
+        print(f"[daqCache] Error: sidecar header too large, cache not written.")
+        return None
+
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "wb") as f_out:
+        f_out.write(header.ljust(HEADER_SIZE, b" "))
+        np.ascontiguousarray(timeIndex, dtype=np.float64).tofile(f_out)
+        for channel in (ch1, ch2, ch3):
+            np.ascontiguousarray(channel, dtype=np.float32).tofile(f_out)
+        reordered.tofile(f_out)
+    os.replace(tmpPath, path)
+
+    evict(settings, keep=path)
+    return mapSidecar(path, rows)
+
+
+def evict(settings, keep=None):
+    # Removing the least recently used sidecars until the cache fits in settings.maxBytes.
+    if not os.path.isdir(settings.directory):
+        return
+    entries = []
+    for name in os.listdir(settings.directory):
+        if not name.endswith(SUFFIX):
+            continue
+        path = os.path.join(settings.directory, name)
+        # Another instance may evict the same sidecars concurrently
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((status.st_mtime, status.st_size, path))
+    entries.sort()
+
+    total = sum(entry[1] for entry in entries)
+    for _, size, path in entries:
+        if total <= settings.maxBytes:
+            break
+        if path == keep or protectedSidecars[path] > 0:
+            continue
+        print(f"[daqCache] Evicting {path}.")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -1,15 +1,51 @@
-import sys, datetime, time, pickle
+import os, sys, datetime, time, threading, logging
 import numpy as np
-import pandas as pd
-import pywt
 
-from PyQt6.QtWidgets import QApplication, QMainWindow, QFileDialog, QProgressDialog, QWidget
+from PyQt6.QtWidgets import QApplication, QMainWindow, QFileDialog, QProgressDialog, QWidget, QInputDialog
 from PyQt6.QtGui import QPalette, QColor
-from PyQt6.QtCore import QThread, pyqtSignal, Qt
-from PyQt6.uic import loadUi
+from PyQt6.QtCore import QThread, pyqtSignal, Qt, QSettings, QTimer
 import pyqtgraph as pg
 
-from scipy.signal import find_peaks
+# pywt and scipy (waveletEngine, peakDetection, channelAlignment) take longer to import
+# than Qt itself. They are imported where they are used, and by analysisImportThread in
+# the background once the window is shown, so they are usually ready by the first use.
+from daqParser import parseStats
+from daqCache import cacheSettings
+from channelStore import CHANNELS, loadStore
+from captureSession import loadSession, DEFAULT_MEMORY_BUDGET
+from daqTail import daqTail
+from peakMarkers import peakMarkerLayer
+from peakStore import appendRun
+from coincidence import findCoincidences, COINCIDENCE_GROUPS
+from eventFeatures import FEATURES, eventFeatures, slidingRate
+from instrumentation import INSTRUMENTS, stage, instrumented, configureLogging, logger
+from diagnosticsPanel import diagnosticsDock
+from timeIndexPanel import timeIndexDock
+from sweepPanel import parameterSweepDock
+from renderScheduler import renderScheduler, DEFAULT_FRAME_BUDGET_MS
+
+# The window is built by the module generated from daqDataAnalyzer.ui, which stays the
+# source of the layout. After editing the .ui file, regenerate it with
+#   python -m PyQt6.uic.pyuic daqDataAnalyzer.ui -o daqDataAnalyzerUi.py
+UI_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "daqDataAnalyzer.ui")
+try:
+    from daqDataAnalyzerUi import Ui_MainWindow
+except ImportError:
+    class Ui_MainWindow:
+        # Without the generated module the .ui file is parsed at runtime
+        def setupUi(self, window):
+            print("[MainWindow] daqDataAnalyzerUi.py not found, loading daqDataAnalyzer.ui.")
+            from PyQt6.uic import loadUi
+            loadUi(UI_FILE, window)
+
+# Refresh period of the follow mode (new rows, live peaks and auto-scroll)
+FOLLOW_REFRESH_MS = 250
+# Modules imported in the background after startup
+ANALYSIS_MODULES = ["pywt", "waveletEngine", "scalogram", "peakDetection", "channelAlignment"]
+# Marker colours of the coincidence groups in the raw plot
+COINCIDENCE_COLORS = {"ch1+ch2": "#17becf", "ch1+ch3": "#bcbd22", "ch2+ch3": "#e377c2", "all": "#9467bd"}
+# Segment length of the auto-alignment when the drift of the shifts is tracked
+ALIGN_SEGMENT_SAMPLES = 1 << 22
 
 class loadingBarThread(QThread):
     progress = pyqtSignal(int)
@@ -20,47 +56,149 @@ class loadingBarThread(QThread):
         print("[loadingBarThread] Loading bar initialized.")   
     
     def run(self):
-        with open(self.inputFile, "rb") as f_in:
-            fileLines = f_in.readlines()
-            count = len(fileLines) + 10000   # 10k padding extra for those malformed double lines.
-            timeIndex = np.array(np.zeros(count), dtype=np.float64)
-            ch1 = np.array(np.zeros(count), dtype=np.float32)
-            ch2 = np.array(np.zeros(count), dtype=np.float32)
-            ch3 = np.array(np.zeros(count), dtype=np.float32)
-            n = 0
-            for line in fileLines:
-                line = line.decode().rstrip()
-                if len(line) == 0:
-                    continue
-                # Splitting using one white space (there are either 1 or 2 white places)
-                # This will normally generate multiple empty strings, which are removed in the loop
-                line = [i for i in line.split(" ") if i]
-                # This splits also the date, which needs to be stitched back together
-                
-                timeIndex[n] = line[0]
-                ch1[n] = float(line[1])
-                ch2[n] = float(line[2])
-                ch3[n] = float(line[3])
-                        
-                n += 1
-                if n%1000 == 0:
-                    print(f"Progress : {(n/count)*100:0.2f}%", end="\r")
-                    self.progress.emit(int((n/count)*100))
-    
-            # Constructing the final data frame
-            df1 = pd.DataFrame({"Channel 1": ch1, "Channel 2": ch2, "Channel 3": ch3}, index=timeIndex)
-            #df1 = df1.iloc[:-6548]
-            df1 = df1[df1.index != 0]
-            df1 = df1.sort_index()
-
-            df1.index = df1.index - min(df1.index)
+        self.stats = parseStats()
+        with stage("load", file=self.inputFile, operation=True) as record:
+            if isinstance(self.inputFile, list):
+                # Several files on one timeline (see captureSession.py)
+                memoryBudget = int(self.parent.settings.value("session/memoryBudget", DEFAULT_MEMORY_BUDGET))
+                store = loadSession(self.inputFile, self.parent.cacheSettings, memoryBudget, progressCallback=self.reportProgress)
+            else:
+                store = loadStore(self.inputFile, self.parent.cacheSettings, progressCallback=self.reportProgress, stats=self.stats)
+            # Building the envelope pyramids here keeps the first redraw fast
+            with stage("envelope pyramids", rows=len(store)):
+                for channel in CHANNELS:
+                    store.pyramid(channel)
+            # Gaps, sample rate changes and duplicate timestamps, listed in the time index dock
+            with stage("time index", rows=len(store)):
+                store.timeAxis()
+            record.rows = len(store)
+        # The sidecars of a replaced session may be evicted again
+        if self.parent.store is not None and self.parent.store.session is not None:
+            self.parent.store.session.close()
+        self.parent.store = store
+
+    def reportProgress(self, percent):
+        self.progress.emit(int(percent))
 
-            self.parent.data = df1.copy(deep=True)
-            self.parent.dataOriginal = df1.copy(deep=True)
-    
     def exit(self):
         exit()
         
+class waveletFilterThread(QThread):
+    progress = pyqtSignal(int)
+    def __init__(self, store, wavelet):
+        self.store = store
+        self.wavelet = wavelet
+        self.cancelEvent = threading.Event()
+        self.completed = False
+        super().__init__()
+
+    def run(self):
+        from waveletEngine import filterChannels, filterCancelled
+        # Results are written into scratch arrays which replace the filtered layer only
+        # once every channel is done, so a cancelled run leaves the data untouched.
+        channels = [self.store.channel(channel, layer="original") for channel in CHANNELS]
+        outputs = [self.store.allocate(channel, layer="filtered", install=False) for channel in CHANNELS]
+        start = time.perf_counter()
+        try:
+            filterChannels(channels, outputs, self.wavelet, progressCallback=self.progress.emit, cancelEvent=self.cancelEvent)
+        except filterCancelled:
+            print("[waveletFilterThread] Wavelet filter cancelled.")
+            return
+        for channel, output in zip(CHANNELS, outputs):
+            self.store.setChannel(channel, output, layer="filtered")
+            # The envelope of the replaced channel is rebuilt right away
+            self.store.pyramid(channel)
+        self.completed = True
+        print(f"[waveletFilterThread] Filtered {len(self.store)} rows with {self.wavelet} in {time.perf_counter() - start:0.2f} s.")
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+class peakFinderThread(QThread):
+    progress = pyqtSignal(int)
+    def __init__(self, views, thresholds, finders=None):
+        self.views = views
+        self.thresholds = thresholds
+        self.finders = finders
+        self.cancelEvent = threading.Event()
+        self.indexes = None
+        super().__init__()
+
+    def run(self):
+        # One candidate index per channel, the channels are searched together in chunks
+        # spread over all cores. The peaks for the current settings are then a query.
+        from peakDetection import buildViewIndexes, peakSearchCancelled
+        start = time.perf_counter()
+        if self.finders is not None:
+            # Follow mode: the incremental finders catch up with the data loaded so far
+            with stage("follow peak search", rows=sum(len(view) for view in self.views), operation=True):
+                for finder, view in zip(self.finders, self.views):
+                    finder.update(view)
+            print(f"[peakFinderThread] Searched the loaded data for live peaks in {time.perf_counter() - start:0.2f} s.")
+            return
+        try:
+            # A session is searched one file at a time
+            self.indexes = buildViewIndexes(self.views, self.thresholds, progressCallback=self.progress.emit, cancelEvent=self.cancelEvent)
+        except peakSearchCancelled:
+            print("[peakFinderThread] Peak search cancelled.")
+            return
+        print(f"[peakFinderThread] Indexed {sum(len(index) for index in self.indexes)} peak candidates in {time.perf_counter() - start:0.2f} s.")
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+class autoAlignThread(QThread):
+    progress = pyqtSignal(int)
+    def __init__(self, channels, segmentSamples=None):
+        self.channels = channels
+        self.segmentSamples = segmentSamples
+        self.models = None
+        super().__init__()
+
+    def run(self):
+        from channelAlignment import alignChannels
+        # Lags of channels 2 and 3 against channel 1 (see channelAlignment.py)
+        with stage("auto-align", rows=len(self.channels[0]), segmentSamples=self.segmentSamples, operation=True):
+            self.models = alignChannels(self.channels, segmentSamples=self.segmentSamples, progressCallback=self.progress.emit)
+        for channel, model in zip(CHANNELS[1:], self.models[1:]):
+            print(f"[autoAlignThread] {channel}: {model}")
+
+class parameterSweepThread(QThread):
+    progress = pyqtSignal(int)
+    def __init__(self, views, timeIndex, grids, indexes=None, window=None):
+        self.views = views
+        self.timeIndex = timeIndex
+        self.grids = grids
+        self.indexes = indexes
+        self.window = window
+        self.cancelEvent = threading.Event()
+        self.results = None
+        self.seconds = 0.0
+        super().__init__()
+
+    def run(self):
+        # The grid is evaluated on a process pool (see parameterSweep.py)
+        from parameterSweep import runSweep
+        from peakDetection import peakSearchCancelled
+        start = time.perf_counter()
+        try:
+            self.results = runSweep(self.views, self.timeIndex, self.grids, progressCallback=self.progress.emit,
+                                    cancelEvent=self.cancelEvent, indexes=self.indexes, window=self.window)
+        except peakSearchCancelled:
+            print("[parameterSweepThread] Parameter sweep cancelled.")
+            return
+        self.seconds = time.perf_counter() - start
+        print(f"[parameterSweepThread] Evaluated {sum(len(grid) for grid in self.grids if grid is not None)} settings in {self.seconds:0.2f} s.")
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+class analysisImportThread(QThread):
+    def run(self):
+        with stage("analysis imports", level=logging.DEBUG):
+            for module in ANALYSIS_MODULES:
+                __import__(module)
+
 class rawPlot(QWidget):
     def __init__(self):
         super().__init__()
@@ -71,11 +209,13 @@ class waveletPlot(QWidget):
         super().__init__()
         self.waveletCanvas = pg.GraphicsLayoutWidget()
 
-class MainWindow(QMainWindow):
+class MainWindow(QMainWindow, Ui_MainWindow):
+    # Emitted from the scalogram workers whenever a tile is ready
+    scalogramTileReady = pyqtSignal()
 
     def __init__(self):
         super().__init__()
-        loadUi("daqDataAnalyzer.ui", self)
+        self.setupUi(self)
 
         self.setWindowTitle("My App")
 
@@ -83,26 +223,68 @@ class MainWindow(QMainWindow):
         #Loading menu actions
         """
         self.actionOpen.triggered.connect(self.loadFile)
+        self.actionOpenSession.triggered.connect(self.openSession)
         self.actionExit.triggered.connect(self.exitProgram)
+        self.actionCacheSettings.triggered.connect(self.editCacheSettings)
         self.inputFile = ""
 
-        self.data = None
+        # Sidecar cache location and disk budget are persisted between sessions
+        self.settings = QSettings("daqDataAnalyzer", "daqDataAnalyzer")
+        self.cacheSettings = cacheSettings()
+        self.cacheSettings.directory = self.settings.value("cache/directory", self.cacheSettings.directory)
+        self.cacheSettings.maxBytes = int(self.settings.value("cache/maxBytes", self.cacheSettings.maxBytes))
+        self.cacheSettings.enabled = self.cacheSettings.maxBytes > 0
+
+        self.store = None
+
+        # Timing, rows and memory of every stage, listed in a dock opened from the View menu
+        self.diagnosticsDock = diagnosticsDock(INSTRUMENTS, self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.diagnosticsDock)
+        self.diagnosticsDock.hide()
+        self.menuView.addAction(self.diagnosticsDock.toggleViewAction())
+        self.timeIndexDock = timeIndexDock(self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.timeIndexDock)
+        self.timeIndexDock.hide()
+        self.menuView.addAction(self.timeIndexDock.toggleViewAction())
+        self.timeIndexDock.jump.connect(self.jumpToSample)
+        self.sweepDock = parameterSweepDock(self)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.sweepDock)
+        self.sweepDock.hide()
+        self.menuView.addAction(self.sweepDock.toggleViewAction())
+        self.sweepDock.fillRequested.connect(self.fillSweepRanges)
+        self.sweepDock.runRequested.connect(self.runParameterSweep)
+        self.sweepDock.applyRequested.connect(self.applySweepSettings)
+        self.sweep = None
+
+        # Redraw requests are collected and drawn at most once per frame, only for the
+        # plots (and raw plot channels) whose visible content changed
+        self.redraw = renderScheduler(self, int(self.settings.value("render/frameBudgetMs", DEFAULT_FRAME_BUDGET_MS)))
+        self.actionFrameBudget.triggered.connect(self.editFrameBudget)
 
         """
         #Raw plot tab
         """
-        self.rawPlotUpdateBtn.clicked.connect(self.updateRawPlot)
+        self.rawPlotUpdateBtn.clicked.connect(lambda: self.redraw.request("raw", force=True))
         self.rawPlotBackBtn.setToolTip("Move window a step back")
         self.rawPlotBackBtn.clicked.connect(self.backButtonCallback)
         self.rawPlotForwardBtn.setToolTip("Move window a step forward")
         self.rawPlotForwardBtn.clicked.connect(self.forwardButtonCallback)
         self.rawWindowSizeSpinBox.setToolTip("Window size")
-        self.rawWindowSizeSpinBox.valueChanged.connect(self.updateRawPlot)
+        self.rawWindowSizeSpinBox.valueChanged.connect(lambda: self.redraw.request("raw"))
         self.rawStepSizeSpinBox.setToolTip("Step size")
         self.rawWindowStartSpinBox.setToolTip("Window start position")
-        self.rawWindowStartSpinBox.valueChanged.connect(self.updateRawPlot)
+        self.rawWindowStartSpinBox.valueChanged.connect(lambda: self.redraw.request("raw"))
         self.downsamplingComboBox.setToolTip("Downsampling options")
         self.downsamplingComboBox.currentTextChanged.connect(self.downsamplingUpdate)
+        self.useEnvelope = True
+        self.followCheckBox.setToolTip("Keep reading rows appended to the file while the acquisition is running")
+        self.followCheckBox.toggled.connect(self.toggleFollow)
+        self.autoScrollCheckBox.setToolTip("Show the newest window while following the file")
+        self.jumpTimeBtn.clicked.connect(self.jumpToTime)
+        self.followTimer = QTimer(self)
+        self.followTimer.setInterval(FOLLOW_REFRESH_MS)
+        self.followTimer.timeout.connect(self.followUpdate)
+        self.tail = None
         ####
         self.rawPlotThreshold1.setToolTip("Threshold plot 1")
         self.rawPlotThreshold1.valueChanged.connect(lambda: self.updateTheshold(1))
@@ -110,24 +292,45 @@ class MainWindow(QMainWindow):
         self.rawPlotThreshold2.valueChanged.connect(lambda: self.updateTheshold(2))
         self.rawPlotThreshold3.setToolTip("Threshold plot 3")
         self.rawPlotThreshold3.valueChanged.connect(lambda: self.updateTheshold(3))
-        self.axisCh1ShiftSpinBox.valueChanged.connect(self.shiftChannelTime)
-        self.axisCh2ShiftSpinBox.valueChanged.connect(self.shiftChannelTime)
-        self.axisCh3ShiftSpinBox.valueChanged.connect(self.shiftChannelTime)
+        # Once peaks were found, changing the peak settings re-selects them from the candidate index
+        self.peakIndexes = {}
+        self.peakProperties = {}
+        for spinBox in [self.rawPlotThreshold1, self.rawPlotThreshold2, self.rawPlotThreshold3, self.peakWidthCBox,
+                        self.peakDistanceCBox, self.doublePeakDistanceSpinBox]:
+            spinBox.valueChanged.connect(self.retunePeaks)
+        self.axisCh1ShiftSpinBox.valueChanged.connect(lambda: self.shiftChannelTime("Channel 1"))
+        self.axisCh2ShiftSpinBox.valueChanged.connect(lambda: self.shiftChannelTime("Channel 2"))
+        self.axisCh3ShiftSpinBox.valueChanged.connect(lambda: self.shiftChannelTime("Channel 3"))
+        self.autoAlignBtn.clicked.connect(self.autoAlign)
+        self.alignDriftCheckBox.toggled.connect(self.applyAlignment)
+        self.rawWindowStartSpinBox.valueChanged.connect(self.followDrift)
+        self.alignment = None
         ####
         self.selectChannelCBox.setToolTip("Select channel to analyze")
-        self.selectChannelCBox.currentTextChanged.connect(self.updateWaveletPlot)
-        self.waveletBackBtn.clicked.connect(self.backButtonCallback)
-        self.waveletForwardBtn.clicked.connect(self.forwardButtonCallback)
+        self.selectChannelCBox.currentTextChanged.connect(lambda: self.redraw.request("wavelet"))
+        self.waveletBackBtn.clicked.connect(self.backWaveletButtonCallback)
+        self.waveletForwardBtn.clicked.connect(self.forwardWaveletButtonCallback)
+        # Created with the first wavelet plot, see updateWaveletPlot
+        self.waveletCache = None
         self.applyWaveletBtn.clicked.connect(self.applyWaveletFilter)
-        self.refreshWaveletPlotBtn.clicked.connect(self.updateWaveletPlot)
-        self.selectWaveletCBox.currentTextChanged.connect(self.updateWaveletPlot)
+        self.refreshWaveletPlotBtn.clicked.connect(lambda: self.redraw.request("wavelet", force=True))
+        self.selectWaveletCBox.currentTextChanged.connect(lambda: self.redraw.request("wavelet"))
         self.waveletFamilyCBox.currentTextChanged.connect(self.updateWaveletCBox)
-        for family in pywt.families():
-            self.waveletFamilyCBox.addItem(family)
+        # The wavelet families are listed once pywt is imported
+        self.analysisImports = analysisImportThread()
+        self.analysisImports.finished.connect(self.analysisModulesLoaded)
+        QTimer.singleShot(0, self.analysisImports.start)
         """
         # Finding peaks tab
         """
         self.findPeaksBtn.clicked.connect(self.findPeaks)
+        self.showFilteredPeaksCheckBox.toggled.connect(lambda: self.redraw.request("raw"))
+        self.showRemovedPeaksCheckBox.toggled.connect(lambda: self.redraw.request("raw"))
+        self.showCoincidencesCheckBox.toggled.connect(lambda: self.redraw.request("raw"))
+        self.coincidenceWindowSpinBox.valueChanged.connect(self.coincidenceSettingsChanged)
+        for spinBox in [self.axisCh1ShiftSpinBox, self.axisCh2ShiftSpinBox, self.axisCh3ShiftSpinBox]:
+            spinBox.valueChanged.connect(self.coincidenceSettingsChanged)
+        self.coincidences = None
         self.savePeaksBtn.clicked.connect(self.savePeaks)
 
         """
@@ -175,6 +378,16 @@ class MainWindow(QMainWindow):
         self.rawDataHandle2 = self.rawDataPlot2.plot(pen=self.rawDataPen2)
         self.rawDataHandle3 = self.rawDataPlot3.plot(pen=self.rawDataPen3)
 
+        # Peak markers, final peaks in green and peaks removed by the double peak filter in grey
+        self.peakMarkers = {}
+        for channel, plot in zip(CHANNELS, [self.rawDataPlot1, self.rawDataPlot2, self.rawDataPlot3]):
+            self.peakMarkers[(channel, "filtered")] = peakMarkerLayer(plot, "#2ca02c")
+            self.peakMarkers[(channel, "removed")] = peakMarkerLayer(plot, "#7f7f7f")
+            # Peaks which coincide with peaks of other channels, drawn over the final peaks
+            for group, color in COINCIDENCE_COLORS.items():
+                self.peakMarkers[(channel, group)] = peakMarkerLayer(plot, color)
+                self.peakMarkers[(channel, group)].item.setZValue(-0.5)
+
         """
         # Wavelet data plotting
         """
@@ -200,6 +413,26 @@ class MainWindow(QMainWindow):
 
         self.waveletCanvas2.setBackground(self.backgroundColor)
 
+        # Scalogram of the selected channel, shown with the "Scalogram" box (see scalogram.py)
+        self.scalogramCanvas = pg.GraphicsLayoutWidget()
+        self.waveletLayout.addWidget(self.scalogramCanvas)
+        self.scalogramCanvas.setBackground(self.backgroundColor)
+        self.scalogramPlot = self.scalogramCanvas.addPlot(row=0, col=0)
+        self.scalogramPlot.setLabel("left", "log2 scale [samples]")
+        self.scalogramPlot.setLabel("bottom", "Time [s]")
+        self.scalogramImage = pg.ImageItem()
+        self.scalogramImage.setLookupTable(pg.colormap.get("viridis").getLookupTable())
+        self.scalogramPlot.addItem(self.scalogramImage)
+        self.scalogramCanvas.hide()
+        # Created with the first scalogram, see updateScalogram
+        self.scalogramTiles = None
+        self.scalogramCheckBox.toggled.connect(self.toggleScalogram)
+        self.scalogramPlot.sigXRangeChanged.connect(lambda: self.redraw.request("scalogram"))
+        self.scalogramTileReady.connect(lambda: self.redraw.request("scalogram"))
+        self.selectChannelCBox.currentTextChanged.connect(lambda: self.redraw.request("scalogram"))
+        self.rawWindowStartSpinBox.valueChanged.connect(self.scalogramFollowWindow)
+        self.rawWindowSizeSpinBox.valueChanged.connect(self.scalogramFollowWindow)
+
         # Getting axis items
         self.wvAx1 = self.waveletPlot1.getAxis("right")
         self.wvAx2 = self.waveletPlot2.getAxis("right")
@@ -262,10 +495,140 @@ class MainWindow(QMainWindow):
         self.waveletHandle7 = self.waveletPlot7.plot(pen=self.waveletPen7)
         self.waveletHandle8 = self.waveletPlot8.plot(pen=self.waveletPen8)
 
-    def shiftChannelTime(self):
-        self.updateRawPlot()
+        """
+        # Statistics tab
+        """
+        # Histogram of a per event feature and the event rate over time of the final peaks
+        self.statisticsCanvas = pg.GraphicsLayoutWidget()
+        self.statisticsLayout.addWidget(self.statisticsCanvas)
+        self.histogramPlot = self.statisticsCanvas.addPlot(row=0, col=0)
+        self.histogramPlot.setLabel("left", "Events")
+        self.histogramHandle = self.histogramPlot.plot(stepMode="center", fillLevel=0, brush=(31, 119, 180, 120), pen="#1f77b4")
+        self.ratePlot = self.statisticsCanvas.addPlot(row=1, col=0)
+        self.ratePlot.setLabel("left", "Event rate [1/s]")
+        self.ratePlot.setLabel("bottom", "Time [s]")
+        self.rateHandle = self.ratePlot.plot(pen="#1f77b4")
+        self.statisticsChannelCBox.addItems(CHANNELS)
+        for feature, label in FEATURES.items():
+            self.statisticsFeatureCBox.addItem(label, feature)
+        self.featureCache = {}
+        for signal in [self.statisticsChannelCBox.currentIndexChanged, self.statisticsFeatureCBox.currentIndexChanged,
+                       self.histogramBinsSpinBox.valueChanged, self.rateBinSpinBox.valueChanged, self.tabWidget.currentChanged]:
+            signal.connect(lambda: self.redraw.request("statistics"))
+
+        self.redraw.register("raw", self.updateRawPlot, self.rawPlotState, CHANNELS)
+        self.redraw.register("wavelet", lambda parts: self.updateWaveletPlot(), self.waveletPlotState)
+        self.redraw.register("statistics", lambda parts: self.updateStatistics(), self.statisticsState)
+        self.redraw.register("scalogram", lambda parts: self.updateScalogram(), self.scalogramState)
+
+    def rawPlotState(self, channel):
+        # Everything one channel of the raw plot depends on (see renderScheduler)
+        if self.store is None:
+            return None
+        number = CHANNELS.index(channel)
+        plot = [self.rawDataPlot1, self.rawDataPlot2, self.rawDataPlot3][number]
+        shift = [self.axisCh1ShiftSpinBox, self.axisCh2ShiftSpinBox, self.axisCh3ShiftSpinBox][number].value()
+        peakDict = getattr(self, "peakDict", {})
+        return (self.store, self.store.channel(channel), self.rawWindowStartSpinBox.value(), self.rawWindowSizeSpinBox.value(),
+                int(shift), self.downsamplingComboBox.currentText(), int(plot.getViewBox().width()),
+                self.showFilteredPeaksCheckBox.isChecked(), self.showRemovedPeaksCheckBox.isChecked(),
+                self.showCoincidencesCheckBox.isChecked(), peakDict.get(f"{channel} filtered"), peakDict.get(f"{channel} removed"),
+                *(peakDict.get(f"{channel} {group}") for group in COINCIDENCE_COLORS))
+
+    def waveletPlotState(self, part):
+        if self.store is None:
+            return None
+        channel = self.selectChannelCBox.currentText()
+        return (self.store, self.store.channel(channel, layer="original") if channel in CHANNELS else None, channel,
+                self.selectWaveletCBox.currentText(), self.rawWindowStartSpinBox.value(), self.rawWindowSizeSpinBox.value())
+
+    def statisticsState(self, part):
+        # Only drawn while the statistics tab is shown
+        if self.store is None or self.tabWidget.currentWidget() is not self.statisticsTab:
+            return None
+        channel = self.statisticsChannelCBox.currentText()
+        properties = self.peakProperties.get(channel)
+        return (properties["sample"] if properties else None, getattr(self, "peakDict", {}).get(channel + " filtered"), channel,
+                self.statisticsFeatureCBox.currentData(), self.histogramBinsSpinBox.value(), self.rateBinSpinBox.value())
+
+    def scalogramState(self, part):
+        channel = self.selectChannelCBox.currentText()
+        if self.store is None or not self.scalogramCheckBox.isChecked() or channel not in CHANNELS:
+            return None
+        (xMin, xMax), _ = self.scalogramPlot.viewRange()
+        return (self.store, self.store.channel(channel, layer="original"), channel, xMin, xMax,
+                int(self.scalogramPlot.getViewBox().width()), self.scalogramTiles.version if self.scalogramTiles else 0)
+
+    def editFrameBudget(self):
+        milliseconds, ok = QInputDialog.getInt(self, "Redraw", "Minimum time between redraws [ms]", self.redraw.frameBudget, 0, 1000)
+        if ok:
+            self.redraw.setFrameBudget(milliseconds)
+            self.settings.setValue("render/frameBudgetMs", self.redraw.frameBudget)
+
+    def shiftChannelTime(self, channel):
+        # Only the shifted channel is redrawn
+        self.redraw.request("raw", [channel])
+
+    def shiftSpinBoxes(self):
+        return [self.axisCh1ShiftSpinBox, self.axisCh2ShiftSpinBox, self.axisCh3ShiftSpinBox]
+
+    def autoAlign(self):
+        if self.store is None:
+            print("[MainWindow/autoAlign] Error: load a file before aligning the channels.")
+            return
+        segmentSamples = ALIGN_SEGMENT_SAMPLES if self.alignDriftCheckBox.isChecked() else None
+
+        self.alignProgressDialog = QProgressDialog("Aligning channels...", None, 0, 100, self)
+        self.alignProgressDialog.setWindowTitle("Progress")
+        self.alignProgressDialog.setWindowModality(Qt.WindowModality.WindowModal)
+
+        self.aligner = autoAlignThread([self.store.channel(channel) for channel in CHANNELS], segmentSamples)
+        self.aligner.progress.connect(self.alignProgressDialog.setValue)
+        self.aligner.finished.connect(self.autoAlignFinished)
+        self.aligner.start()
+
+    def autoAlignFinished(self):
+        self.alignProgressDialog.close()
+        if self.aligner.models is None:
+            return
+        self.alignment = self.aligner.models
+        if self.coincidences is not None:
+            self.updateCoincidences()
+        self.statusbar.showMessage("Alignment: " + ", ".join(f"{channel} {model}" for channel, model in zip(CHANNELS[1:], self.alignment[1:])))
+        self.applyAlignment()
+
+    def applyAlignment(self):
+        # Without drift tracking the shifts are plain settings again, set once from the
+        # whole recording lags; with it they follow the lag of the segment at the window start
+        drift = self.alignDriftCheckBox.isChecked()
+        for spinBox in self.shiftSpinBoxes():
+            spinBox.setEnabled(not drift)
+        if self.alignment is None:
+            return
+        if drift:
+            self.followDrift()
+        else:
+            for spinBox, model in zip(self.shiftSpinBoxes(), self.alignment):
+                spinBox.setValue(int(np.round(np.median(model.lags))))
+        if self.coincidences is not None:
+            self.updateCoincidences()
+            self.redraw.request("raw")
+
+    def followDrift(self):
+        if self.alignment is None or not self.alignDriftCheckBox.isChecked():
+            return
+        dataStart = self.rawWindowStartSpinBox.value()
+        for spinBox, model in zip(self.shiftSpinBoxes(), self.alignment):
+            spinBox.setValue(int(model.lagAt(dataStart)))
+
+    def analysisModulesLoaded(self):
+        import pywt
+        if self.waveletFamilyCBox.count() == 0:
+            for family in pywt.families():
+                self.waveletFamilyCBox.addItem(family)
 
     def updateWaveletCBox(self):
+        import pywt
         currentFamily = self.waveletFamilyCBox.currentText()
         waveletList = pywt.wavelist(currentFamily)
         # Removing previous items in a combo box
@@ -275,16 +638,67 @@ class MainWindow(QMainWindow):
             self.selectWaveletCBox.addItem(wavelet)
 
     def savePeaks(self):
-        filename = self.filenameLineEdit.displayText()
-        self.peakDict["index"] = self.data.index
-        print(filename)
-        with open(filename, "wb") as f:
-            pickle.dump(self.peakDict, f)
+        # Appends the current peaks as a new run to the peak store at the given path (see peakStore.py)
+        path = self.filenameLineEdit.displayText()
+        if self.store is None or not path or not getattr(self, "peakDict", None):
+            print("[MainWindow/savePeaks] Error: find peaks and enter a path before saving.")
+            return
+        thresholds = [self.rawPlotThreshold1.value(), self.rawPlotThreshold2.value(), self.rawPlotThreshold3.value()]
+        _, inverted = self.peakThresholds()
+        doublePeakDistance = self.doublePeakDistanceSpinBox.value()
+
+        channels = {}
+        for number, channel in enumerate(CHANNELS):
+            table = {"sample": self.peakDict[channel]}
+            # Properties and features are only known for peaks selected from the candidate index
+            features = self.channelFeatures(channel)
+            if features is not None:
+                table = dict(self.peakProperties[channel])
+                # Heights of the data, not of the inverted data the peaks were searched in
+                table["height"] = features["amplitude"]
+                table["area"], table["interArrival"] = features["area"], features["interArrival"]
+            from peakDetection import leadingPeakMask
+            table["filtered"], _ = leadingPeakMask(table["sample"], doublePeakDistance*10)
+            if self.coincidences is not None and self.coincidences["peaks"][number] is self.peakDict[channel + " filtered"]:
+                # Group code and event number of the final peaks, -1 for the removed ones
+                members = self.coincidences["members"][:, number]
+                table["coincidence"] = np.full(len(table["sample"]), -1, dtype=np.int8)
+                table["coincidence"][table["filtered"]] = self.coincidences["codes"][number]
+                events = np.full(int(table["filtered"].sum()), -1, dtype=np.int64)
+                events[members[members >= 0]] = np.flatnonzero(members >= 0)
+                table["event"] = np.full(len(table["sample"]), -1, dtype=np.int64)
+                table["event"][table["filtered"]] = events
+            channels[channel] = table
+
+        parameters = {"thresholds": thresholds, "inverted": inverted, "width": self.peakWidthCBox.value(),
+                      "distance": self.peakDistanceCBox.value(), "doublePeakDistance": doublePeakDistance,
+                      "currentViewOnly": self.currentViewCheckBox.isChecked(),
+                      "waveletFiltered": any(self.store.channel(channel) is not self.store.channel(channel, layer="original")
+                                             for channel in CHANNELS),
+                      "shifts": [int(spinBox.value()) for spinBox in self.shiftSpinBoxes()],
+                      "coincidenceWindow": self.coincidenceWindowSpinBox.value(), "coincidenceGroups": COINCIDENCE_GROUPS}
+        if self.alignment is not None and self.alignDriftCheckBox.isChecked():
+            # Samples are raw, the piecewise shifts map them onto channel 1
+            parameters["alignment"] = {channel: {"starts": model.starts.tolist(), "lags": model.lags.tolist()}
+                                       for channel, model in zip(CHANNELS, self.alignment)}
+        inputFile = self.inputFile
+        if self.store.session is not None:
+            # Samples and times are on the session timeline, the segment table maps them to the files
+            parameters["session"] = self.store.session.describe()
+            inputFile = None
+        run = appendRun(path, channels, self.store.timeIndex, parameters, inputFile, self.store.timeOrigin)
+        print(f"[MainWindow/savePeaks] Saved peaks as run {run} of {path}.")
 
     def downsamplingUpdate(self):
         currentValue = self.downsamplingComboBox.currentText()
+        self.useEnvelope = currentValue == "Min/max envelope"
 
-        if currentValue == "No downsampling":
+        if currentValue == "Min/max envelope":
+            # Precomputed min/max pyramid, pyqtgraph only receives a few points per pixel
+            self.rawDataPlot1.setDownsampling(ds=False)
+            self.rawDataPlot2.setDownsampling(ds=False)
+            self.rawDataPlot3.setDownsampling(ds=False)
+        elif currentValue == "No downsampling":
             # Downsampling is turned off
             self.rawDataPlot1.setDownsampling(ds=False)
             self.rawDataPlot2.setDownsampling(ds=False)
@@ -307,6 +721,9 @@ class MainWindow(QMainWindow):
         else:
             print(f"[MainWindow/downsamplingUpate] Error: unrecognized downsampling option ({currentValue}).")
 
+        if self.store is not None:
+            self.redraw.request("raw")
+
     def updateTheshold(self, label):
         if label == 1:
             thresholdVal = self.rawPlotThreshold1.value()
@@ -328,8 +745,8 @@ class MainWindow(QMainWindow):
 
         # Checking if start value is not lower than zero.
         if newStart > 0:
+            # valueChanged requests the raw plot redraw
             self.rawWindowStartSpinBox.setValue(newStart)
-            self.updateRawPlot()
         else:
             print("[MainWindow/backButtonCallback] Error: Plot start cannot be lower than zero!")
 
@@ -340,8 +757,7 @@ class MainWindow(QMainWindow):
         # Checking if start value is not lower than zero.
         if newStart > 0:
             self.rawWindowStartSpinBox.setValue(newStart)
-            self.updateRawPlot()
-            self.updateWaveletPlot()
+            self.redraw.request("wavelet")
         else:
             print("[MainWindow/backButtonCallback] Error: Plot start cannot be lower than zero!")
 
@@ -350,9 +766,9 @@ class MainWindow(QMainWindow):
         newStart = currentStart + self.rawStepSizeSpinBox.value()
 
         # Checking if the end value (start + window) is not larger than the dataset size
-        if (newStart + self.rawWindowSizeSpinBox.value()) < len(self.data):
+        if (newStart + self.rawWindowSizeSpinBox.value()) < len(self.store):
+            # valueChanged requests the raw plot redraw
             self.rawWindowStartSpinBox.setValue(newStart)
-            self.updateRawPlot()
         else:
             print("[MainWindow/backButtonCallback] Error: Attempting to plot values out of the range of the available data!")
     
@@ -361,14 +777,14 @@ class MainWindow(QMainWindow):
         newStart = currentStart + self.rawStepSizeSpinBox.value()
 
         # Checking if the end value (start + window) is not larger than the dataset size
-        if (newStart + self.rawWindowSizeSpinBox.value()) < len(self.data):
+        if (newStart + self.rawWindowSizeSpinBox.value()) < len(self.store):
             self.rawWindowStartSpinBox.setValue(newStart)
-            self.updateRawPlot()
-            self.updateWaveletPlot()
+            self.redraw.request("wavelet")
         else:
             print("[MainWindow/backButtonCallback] Error: Attempting to plot values out of the range of the available data!")
  
 
+    @instrumented("wavelet redraw", level=logging.DEBUG)
     def updateWaveletPlot(self):
         # User selected channel to analyze
         channel = self.selectChannelCBox.currentText()
@@ -389,114 +805,157 @@ class MainWindow(QMainWindow):
         dataStart = self.rawWindowStartSpinBox.value()
         windowSize = self.rawWindowSizeSpinBox.value()
 
-        df1 = self.dataOriginal.iloc[dataStart:dataStart+windowSize, :]
+        view = self.store.view(channel, dataStart, dataStart+windowSize, layer="original")
 
         # Updating line plot
-        self.waveletPlot1.clear()
-        self.waveletHandle1.setData(df1.index, df1[channel].values)
-        self.waveletPlot1.addItem(self.waveletHandle1)
-
-        # Calculating wavelets
-        coefs = pywt.wavedec(df1[channel].values, wavelet=wavelet, level=5, mode="periodic")
+        self.waveletHandle1.setData(view.index, view.values)
+
+        # Calculating wavelets, windows seen before or prefetched come from the cache
+        from waveletEngine import decompositionCache, WAVELET_LEVEL, WAVELET_MODE
+        if self.waveletCache is None:
+            self.waveletCache = decompositionCache()
+        key = (channel, wavelet, WAVELET_LEVEL, WAVELET_MODE, view.start, len(view))
+        coefs, filteredData = self.waveletCache.get(key, view.values)
         
         (cA5, cD5, cD4, cD3, cD2, cD1) = coefs
 
-        filteredData = pywt.waverec((cA5, 0*cD5, 0*cD4, 0*cD3, 0*cD2, 0*cD1), wavelet=wavelet, mode='periodic')
-
-        self.waveletPlot2.clear()
-        self.waveletHandle2.setData(df1.index, filteredData)
-        self.waveletPlot2.addItem(self.waveletHandle2)
-
-        self.waveletPlot3.clear()
+        self.waveletHandle2.setData(view.index, filteredData[:len(view)])
         self.waveletHandle3.setData(cA5)
-        self.waveletPlot3.addItem(self.waveletHandle3)
-
-        self.waveletPlot4.clear()
         self.waveletHandle4.setData(cD1)
-        self.waveletPlot4.addItem(self.waveletHandle4)
-
-        self.waveletPlot5.clear()
         self.waveletHandle5.setData(cD2)
-        self.waveletPlot5.addItem(self.waveletHandle5)
-
-        self.waveletPlot6.clear()
         self.waveletHandle6.setData(cD3)
-        self.waveletPlot6.addItem(self.waveletHandle6)
-
-        self.waveletPlot7.clear()
         self.waveletHandle7.setData(cD4)
-        self.waveletPlot7.addItem(self.waveletHandle7)
-
-        self.waveletPlot8.clear()
         self.waveletHandle8.setData(cD5)
-        self.waveletPlot8.addItem(self.waveletHandle8)
 
-    def updateRawPlot(self):
+        # Prefetching the previous and the next window in the background
+        stepSize = self.rawStepSizeSpinBox.value()
+        for start in (dataStart - stepSize, dataStart + stepSize):
+            neighbour = self.store.view(channel, start, start+windowSize, layer="original")
+            if start >= 0 and len(neighbour) > 0:
+                self.waveletCache.prefetch((channel, wavelet, WAVELET_LEVEL, WAVELET_MODE, neighbour.start, len(neighbour)), neighbour.values)
+
+        self.statusbar.showMessage(f"Wavelet cache: {self.waveletCache}")
+
+    def toggleScalogram(self, checked):
+        self.scalogramCanvas.setVisible(checked)
+        self.scalogramFollowWindow()
+        self.redraw.request("scalogram")
+
+    def scalogramFollowWindow(self):
+        # The scalogram shows the raw window until it is panned or zoomed with the mouse
+        if self.store is None or not self.scalogramCheckBox.isChecked() or len(self.store) == 0:
+            return
+        start = min(self.rawWindowStartSpinBox.value(), len(self.store) - 1)
+        stop = min(start + self.rawWindowSizeSpinBox.value(), len(self.store))
+        self.scalogramPlot.setXRange(self.store.timeIndex[start], self.store.timeIndex[stop - 1], padding=0)
+
+    @instrumented("scalogram redraw", level=logging.DEBUG)
+    def updateScalogram(self):
+        # Tiles of the decimation level matching the zoom; missing tiles are computed in
+        # the background and drawn once ready
+        from scalogram import tileCache, tileLevel, TILE_SAMPLES, SCALES
+        if self.scalogramTiles is None:
+            self.scalogramTiles = tileCache(callback=self.scalogramTileReady.emit)
+        channel = self.selectChannelCBox.currentText()
+        data = self.store.channel(channel, layer="original")
+        timeIndex = self.store.timeIndex
+        n = len(data)
+        if n == 0:
+            return
+        (xMin, xMax), _ = self.scalogramPlot.viewRange()
+        first = min(int(np.searchsorted(timeIndex, xMin, side="left")), n - 1)
+        last = min(max(int(np.searchsorted(timeIndex, xMax, side="right")), first + 1), n)
+        level = tileLevel(last - first, self.scalogramPlot.getViewBox().width())
+        factor = 1 << level
+        span = TILE_SAMPLES * factor
+        tiles = range(first // span, (last - 1) // span + 1)
+        keys = [(channel, level, tile) for tile in tiles]
+        neighbours = [(channel, level, tile) for tile in (tiles[0] - 1, tiles[-1] + 1) if 0 <= tile * span < n]
+        found = self.scalogramTiles.request(keys, data, neighbours)
+
+        image = np.zeros((len(SCALES), len(keys) * TILE_SAMPLES), dtype=np.float32)
+        for number, key in enumerate(keys):
+            if key in found:
+                image[:, number*TILE_SAMPLES:(number+1)*TILE_SAMPLES] = found[key]
+        # Columns past the end of the channel are cut
+        start = tiles[0] * span
+        image = np.nan_to_num(image[:, :-(-(n - start) // factor)])
+        stop = min(start + image.shape[1] * factor, n) - 1
+        ready = image[image > 0]
+        levels = np.percentile(ready, [1, 99.5]) if len(ready) > 0 else (0, 1)
+        self.scalogramImage.setImage(image.T, levels=levels, autoLevels=False)
+        # Rows are evenly spaced in log2 of the scale in samples of the channel
+        step = np.log2(SCALES[-1] / SCALES[0]) / (len(SCALES) - 1)
+        self.scalogramImage.setRect(timeIndex[start], np.log2(SCALES[0] * factor) - step / 2,
+                                    max(timeIndex[stop] - timeIndex[start], 1e-12), step * len(SCALES))
+        self.statusbar.showMessage(f"Scalogram: decimation 1:{factor}, {len(found)}/{len(keys)} tiles ready, cache {self.scalogramTiles}")
+
+    @instrumented("raw redraw", level=logging.DEBUG)
+    def updateRawPlot(self, channels=CHANNELS):
+        # Draws the given channels right away, redraws are normally requested through self.redraw
+        if self.store is None:
+            print("[MainWindow/updateRawPlot] No data loaded. Updating deactivated.")
+            return
 
         dataStart = self.rawWindowStartSpinBox.value()
         windowSize = self.rawWindowSizeSpinBox.value()
+        INSTRUMENTS.current().rows = windowSize * len(channels)
 
         self.deltaXChannel1 = int(self.axisCh1ShiftSpinBox.value())
         self.deltaXChannel2 = int(self.axisCh2ShiftSpinBox.value())
         self.deltaXChannel3 = int(self.axisCh3ShiftSpinBox.value())
 
-        seriesCh1 = self.data.iloc[dataStart+self.deltaXChannel1:dataStart+windowSize+self.deltaXChannel1, 0]
-        seriesCh2 = self.data.iloc[dataStart+self.deltaXChannel2:dataStart+windowSize+self.deltaXChannel2, 1]
-        seriesCh3 = self.data.iloc[dataStart+self.deltaXChannel3:dataStart+windowSize+self.deltaXChannel3, 2]
-        #df1 = self.data.iloc[dataStart:dataStart+windowSize, :]
-        
-
-        # Updating line plot
-        self.rawDataPlot1.clear()
-        #self.rawDataHandle1.setData(df1Ch1.index, df1Ch1["Channel 1"].values)
-        self.rawDataHandle1.setData(seriesCh1.index, seriesCh1.values)
-        self.rawDataPlot1.addItem(self.rawDataHandle1)
-
-        self.rawDataPlot2.clear()
-        #self.rawDataHandle2.setData(df1.index, df1["Channel 2"].values)
-        self.rawDataHandle2.setData(seriesCh2.index, seriesCh2.values)
-        self.rawDataPlot2.addItem(self.rawDataHandle2)
-
-        self.rawDataPlot3.clear()
-        #self.rawDataHandle3.setData(df1.index, df1["Channel 3"].values)
-        self.rawDataHandle3.setData(seriesCh3.index, seriesCh3.values)
-        self.rawDataPlot3.addItem(self.rawDataHandle3)
-
-        # Updating peaks if available
-        if self.showFilteredPeaksCheckBox.isChecked():
-            for channel, plot in zip(["Channel 1 filtered", "Channel 2 filtered", "Channel 3 filtered"], [self.rawDataPlot1, self.rawDataPlot2, self.rawDataPlot3]):
-                selectedPeaks = np.where(np.logical_and(self.peakDict[channel]>=dataStart, self.peakDict[channel]<=dataStart+windowSize))
-                peakValues = self.peakDict[channel][selectedPeaks]
-                for value in peakValues:
-                    Xposition = self.data.index[value]
-                    line = pg.InfiniteLine(pos=Xposition, angle=90, pen='#2ca02c')
-                    plot.addItem(line)
-                
-        if self.showRemovedPeaksCheckBox.isChecked():
-            for channel, plot in zip(["Channel 1 removed", "Channel 2 removed", "Channel 3 removed"], [self.rawDataPlot1, self.rawDataPlot2, self.rawDataPlot3]):
-                selectedPeaks = np.where(np.logical_and(self.peakDict[channel]>=dataStart, self.peakDict[channel]<=dataStart+windowSize))
-                peakValues = self.peakDict[channel][selectedPeaks]
-                for value in peakValues:
-                    Xposition = self.data.index[value]
-                    line = pg.InfiniteLine(pos=Xposition, angle=90, pen='#7f7f7f')
-                    plot.addItem(line)
-            #print() 
+        peakDict = getattr(self, "peakDict", {})
+        for channel, plot, handle, shift in zip(CHANNELS, [self.rawDataPlot1, self.rawDataPlot2, self.rawDataPlot3],
+                                                [self.rawDataHandle1, self.rawDataHandle2, self.rawDataHandle3],
+                                                [self.deltaXChannel1, self.deltaXChannel2, self.deltaXChannel3]):
+            if channel not in channels:
+                continue
+            if self.useEnvelope:
+                # Drawing cost depends on the plot width rather than on the window size
+                pixels = plot.getViewBox().width() or 2000
+                x, y = self.store.envelope(channel, dataStart, dataStart+windowSize, pixels, shift=shift)
+            else:
+                series = self.store.view(channel, dataStart, dataStart+windowSize, shift=shift)
+                x, y = series.index, series.values
+
+            # Updating line plot
+            handle.setData(x, y)
+
+            # Updating peaks if available. Each channel has one reusable marker item per kind.
+            kinds = [("filtered", self.showFilteredPeaksCheckBox), ("removed", self.showRemovedPeaksCheckBox)]
+            kinds += [(group, self.showCoincidencesCheckBox) for group in COINCIDENCE_COLORS]
+            for kind, checkBox in kinds:
+                markers = self.peakMarkers[(channel, kind)]
+                if not checkBox.isChecked() or f"{channel} {kind}" not in peakDict:
+                    markers.clear()
+                    continue
+                yRange = (float(np.min(y)), float(np.max(y))) if len(y) > 0 else (0.0, 1.0)
+                pixels = plot.getViewBox().width() or 2000
+                # Peaks are raw sample numbers, the window of a shifted channel is shifted too
+                markers.update(peakDict[f"{channel} {kind}"], self.store.timeIndex, dataStart+shift, dataStart+windowSize+shift, yRange, pixels)
 
     def applyWaveletFilter(self):
         wavelet = self.selectWaveletCBox.currentText()
         if wavelet == '':
             print(f"[applyWaveletFilter] No wavelet selected. Applying filter aborted.")
-        
-        for channel in self.dataOriginal:
-            
-            data = self.dataOriginal[channel]
-            # Calculating wavelets
-            coefs = pywt.wavedec(data, wavelet, level=5, mode="periodic")
-        
-            (cA5, cD5, cD4, cD3, cD2, cD1) = coefs
-            filteredData = pywt.waverec((cA5, 0*cD5, 0*cD4, 0*cD3, 0*cD2, 0*cD1), wavelet, mode='periodic')
+            return
+
+        self.filterProgressDialog = QProgressDialog("Applying wavelet filter...", "Cancel", 0, 100, self)
+        self.filterProgressDialog.setWindowTitle("Progress")
+        self.filterProgressDialog.setWindowModality(Qt.WindowModality.WindowModal)
+
+        self.waveletFilter = waveletFilterThread(self.store, wavelet)
+        self.waveletFilter.progress.connect(self.filterProgressDialog.setValue)
+        self.waveletFilter.finished.connect(self.waveletFilterFinished)
+        self.filterProgressDialog.canceled.connect(self.waveletFilter.cancel)
 
-            self.data[channel] = filteredData
+        self.waveletFilter.start()
+
+    def waveletFilterFinished(self):
+        self.filterProgressDialog.close()
+        if self.waveletFilter.completed:
+            self.redraw.request("raw")
 
     def loadFile(self):
         print("[MainWindow/loadFile] Load file clicked.")
@@ -507,7 +966,127 @@ class MainWindow(QMainWindow):
         
         self.loadDAQData()
 
+    def openSession(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Open session")
+        if not files:
+            return
+        self.inputFile = files
+        print(f"[MainWindow/openSession] {len(files)} files.")
+        self.loadDAQData()
+
+    def dataLoaded(self):
+        if self.store is None:
+            return
+        axis = self.store.timeAxis()
+        self.timeIndexDock.setAxis(axis)
+        self.jumpTimeSpinBox.setMaximum(float(self.store.timeIndex[-1]) if len(self.store) > 0 else 0.0)
+        self.statusbar.showMessage(f"Time index: {axis} (View > Time index lists them)")
+        self.redraw.request("raw")
+        self.scalogramFollowWindow()
+
+    def jumpToTime(self):
+        if self.store is None:
+            return
+        self.jumpToSample(int(self.store.timeAxis().sampleAt(self.jumpTimeSpinBox.value())))
+
+    def jumpToSample(self, sample):
+        # The sample is placed in the middle of the window
+        self.rawWindowStartSpinBox.setValue(max(sample - self.rawWindowSizeSpinBox.value() // 2, 0))
+
+    def toggleFollow(self, checked):
+        if not checked:
+            self.followTimer.stop()
+            if self.tail is not None:
+                self.tail.close()
+                self.tail = None
+            return
+        if self.store is None:
+            print("[MainWindow/toggleFollow] Error: load a file before following it.")
+            self.followCheckBox.setChecked(False)
+            return
+        if self.store.session is not None:
+            print("[MainWindow/toggleFollow] Error: a session of several files cannot be followed.")
+            self.followCheckBox.setChecked(False)
+            return
+
+        if getattr(self, "followPeakFinder", None) is not None and self.followPeakFinder.isRunning():
+            # Following was switched off and on again during the first search
+            self.followPeakFinder.wait()
+        self.tail = daqTail(self.inputFile, self.store.sourceBytes, self.store.timeOrigin)
+        # Live peak detection with the current peak finding settings
+        thresholds = [self.rawPlotThreshold1.value(), self.rawPlotThreshold2.value(), self.rawPlotThreshold3.value()]
+        inverted = [self.invertedCh1Box.isChecked(), self.invertedCh2Box.isChecked(), self.invertedCh3Box.isChecked()]
+        from peakDetection import incrementalPeakFinder
+        self.livePeaks = {}
+        self.peakDict = {}
+        self.coincidences = None
+        for channel, threshold, invert in zip(CHANNELS, thresholds, inverted):
+            finder = incrementalPeakFinder(threshold, self.peakWidthCBox.value(), self.peakDistanceCBox.value(),
+                                           self.doublePeakDistanceSpinBox.value()*10, invert)
+            self.livePeaks[channel] = finder
+        # Peaks already present in the loaded data are searched off the GUI thread, the
+        # file is polled once that is done
+        self.statusbar.showMessage("Following: searching the loaded data for peaks...")
+        self.followPeakFinder = peakFinderThread([self.store.channel(channel, layer="original") for channel in CHANNELS],
+                                                 thresholds, finders=list(self.livePeaks.values()))
+        self.followPeakFinder.finished.connect(self.followPeaksReady)
+        self.followPeakFinder.start()
+
+    def followPeaksReady(self):
+        if self.sender() is not self.followPeakFinder or self.tail is None or not self.followCheckBox.isChecked():
+            return
+        for channel, finder in self.livePeaks.items():
+            self.peakDict[channel], self.peakDict[channel + " filtered"], self.peakDict[channel + " removed"] = finder.result()
+        self.redraw.request("raw")
+        self.followTimer.start()
+
+    def followUpdate(self):
+        timeIndex, ch1, ch2, ch3 = self.tail.poll()
+        if len(timeIndex) == 0:
+            return
+        self.store.append(timeIndex, [ch1, ch2, ch3])
+        self.store.sourceBytes = self.tail.offset - len(self.tail.remainder)
+
+        for channel, finder in self.livePeaks.items():
+            finder.update(self.store.channel(channel, layer="original"))
+            self.peakDict[channel], self.peakDict[channel + " filtered"], self.peakDict[channel + " removed"] = finder.result()
+        self.statusbar.showMessage(f"Following: {len(self.store)} rows, live events "
+                                   + ", ".join(f"{channel}: {finder.count()}" for channel, finder in self.livePeaks.items()))
+
+        if self.autoScrollCheckBox.isChecked():
+            newStart = max(len(self.store) - self.rawWindowSizeSpinBox.value(), 0)
+            self.rawWindowStartSpinBox.setMaximum(max(self.rawWindowStartSpinBox.maximum(), newStart))
+            # Block the valueChanged redraw, the plot is updated once below
+            self.rawWindowStartSpinBox.blockSignals(True)
+            self.rawWindowStartSpinBox.setValue(newStart)
+            self.rawWindowStartSpinBox.blockSignals(False)
+            self.redraw.request("raw")
+
+    def editCacheSettings(self):
+        directory = QFileDialog.getExistingDirectory(self, "Sidecar cache directory", self.cacheSettings.directory)
+        if directory:
+            self.cacheSettings.directory = directory
+        maxGigabytes, ok = QInputDialog.getInt(self, "Sidecar cache", "Maximum cache size [GB] (0 disables the cache)",
+                                               self.cacheSettings.maxBytes // 1024**3, 0, 100000)
+        if ok:
+            self.cacheSettings.maxBytes = maxGigabytes * 1024**3
+        self.cacheSettings.enabled = self.cacheSettings.maxBytes > 0
+
+        self.settings.setValue("cache/directory", self.cacheSettings.directory)
+        self.settings.setValue("cache/maxBytes", self.cacheSettings.maxBytes)
+        print(f"[MainWindow/editCacheSettings] Cache directory: {self.cacheSettings.directory}, limit: {self.cacheSettings.maxBytes // 1024**3} GB")
+
     def loadDAQData(self):
+        self.followCheckBox.setChecked(False)
+        self.peakIndexes = {}
+        self.peakProperties = {}
+        self.featureCache = {}
+        self.alignment = None
+        self.coincidences = None
+        if self.waveletCache is not None:
+            self.waveletCache.clear()
+        if self.scalogramTiles is not None:
+            self.scalogramTiles.clear()
 
         self.progress_dialog = QProgressDialog("Task in progress...", "Cancel", 0, 100, self)
         self.progress_dialog.setWindowTitle("Progress")
@@ -518,6 +1097,7 @@ class MainWindow(QMainWindow):
         self.loadingBar = loadingBarThread(self.inputFile, self)
         self.loadingBar.progress.connect(self.progress_dialog.setValue)
         self.loadingBar.finished.connect(self.progress_dialog.close)
+        self.loadingBar.finished.connect(self.dataLoaded)
         self.progress_dialog.canceled.connect(self.loadingBar.terminate)
 
         self.loadingBar.start()
@@ -538,72 +1118,239 @@ class MainWindow(QMainWindow):
                     "Channel 2 removed": np.array([], dtype=int), 
                     "Channel 3 removed": np.array([], dtype=int)}
 
-        localData = self.data.copy(deep=True)
-        peakList = []
-        propertiesList = []
-
-        thresholds = [self.rawPlotThreshold1.value(), self.rawPlotThreshold2.value(), self.rawPlotThreshold3.value()]
-        
-        doublePeakDistance = self.doublePeakDistanceSpinBox.value()
-
-        # For inverget peaks data is just inverted (-data)
-        if self.invertedCh1Box.isChecked():
-            localData["Channel 1"] = -localData["Channel 1"]
-            thresholds[0] = -thresholds[0]
-        
-        if self.invertedCh2Box.isChecked():
-            localData["Channel 2"] = -localData["Channel 2"]
-            thresholds[1] = -thresholds[1]
-
-        if self.invertedCh3Box.isChecked():
-            localData["Channel 3"] = -localData["Channel 3"]
-            thresholds[2] = -thresholds[2]
+        thresholds, inverted = self.peakThresholds()
 
+        currentMin, currentMax = 0, len(self.store)
         if self.currentViewCheckBox.isChecked():
             currentMin = self.rawWindowStartSpinBox.value()
             currentMax = currentMin + self.rawWindowSizeSpinBox.value()
-            localData = localData.iloc[currentMin:currentMax, :]
 
-        width = self.peakWidthCBox.value()
-        distance = self.peakDistanceCBox.value()
+        # For inverget peaks data is just inverted (-data). The inversion is applied by the
+        # channel view, so only the channel currently searched is negated.
+        # The current view of a shifted channel covers its shifted samples.
+        shifts = [int(spinBox.value()) if self.currentViewCheckBox.isChecked() else 0 for spinBox in self.shiftSpinBoxes()]
+        views = [self.store.view(channel, currentMin, currentMax, shift=shift, inverted=invert)
+                 for channel, invert, shift in zip(CHANNELS, inverted, shifts)]
+        # An index stays valid as long as the data and the inversion are the same; the
+        # searched window is kept for the parameter sweep
+        self.peakIndexKeys = {channel: (self.store.channel(channel), invert, (currentMin, currentMax, shift))
+                              for channel, invert, shift in zip(CHANNELS, inverted, shifts)}
+        self.peakIndexes = {}
+
+        self.peakProgressDialog = QProgressDialog("Finding peaks...", "Cancel", 0, 100, self)
+        self.peakProgressDialog.setWindowTitle("Progress")
+        self.peakProgressDialog.setWindowModality(Qt.WindowModality.WindowModal)
+
+        self.peakFinder = peakFinderThread(views, thresholds)
+        self.peakFinder.progress.connect(self.peakProgressDialog.setValue)
+        self.peakFinder.finished.connect(self.peakFinderFinished)
+        self.peakProgressDialog.canceled.connect(self.peakFinder.cancel)
+
+        self.peakFinder.start()
+
+    def peakFinderFinished(self):
+        self.peakProgressDialog.close()
+        if self.peakFinder.indexes is None:
+            return
+        self.peakIndexes = dict(zip(CHANNELS, self.peakFinder.indexes))
+        self.retunePeaks()
 
-        # Only checking for channel 1 and channel 2. 
-        # No peaks are retrieved for channel 3.
-        # TODO: What is exactly peak width?
-        for channel, threshold in zip(localData[0:3], thresholds):
-            peaks, properties = find_peaks(localData[channel], height=threshold, width=width, distance=distance)
+    def peakThresholds(self):
+        # Thresholds as used for peak finding, negated for inverted channels, and the inversion states
+        thresholds = [self.rawPlotThreshold1.value(), self.rawPlotThreshold2.value(), self.rawPlotThreshold3.value()]
+        inverted = [self.invertedCh1Box.isChecked(), self.invertedCh2Box.isChecked(), self.invertedCh3Box.isChecked()]
+        return [-threshold if invert else threshold for threshold, invert in zip(thresholds, inverted)], inverted
 
-            # If we have more than one peak, let's see if we can merge some.
+    @instrumented("peak retune", level=logging.DEBUG, operation=True)
+    def retunePeaks(self):
+        if not self.peakIndexes or self.store is None or self.followCheckBox.isChecked():
+            return
+        start = time.perf_counter()
+        thresholds, inverted = self.peakThresholds()
+        width = self.peakWidthCBox.value()
+        distance = self.peakDistanceCBox.value()
+        for channel, threshold, invert in zip(CHANNELS, thresholds, inverted):
+            index = self.peakIndexes[channel]
+            data, indexInvert, _ = self.peakIndexKeys[channel]
+            if data is not self.store.channel(channel) or indexInvert != invert or not index.covers(threshold):
+                self.statusbar.showMessage("Peak settings are outside the candidate index, press \"Find peaks\" to search again.")
+                return
             # We are checking left ips to consider the moment the peak enters the laser beam
-            # Left_ips are the left sides of peak. 
-            # Left ips are floats so they need to be cast as integers first.
-            
-            peaks = properties["left_ips"].astype(int)
+            self.peakProperties[channel] = index.peakTable(threshold, width, distance)
+            self.peakDict[channel] = self.peakProperties[channel]["sample"]
 
-            #print(f"{channel}: {peaks}, type: {type(peaks)}")
-
-            self.peakDict[channel] = np.sort(peaks)
-            
+        # If we have more than one peak, let's see if we can merge some.
         self.collapseDoublePeaks()
-        print(self.peakDict)        
-
-        self.updateRawPlot()
+        self.updateCoincidences()
+        self.redraw.request("raw")
+        self.redraw.request("statistics")
+        self.statusbar.showMessage("Peaks: " + ", ".join(f"{channel}: {len(self.peakDict[channel + ' filtered'])}" for channel in CHANNELS)
+                                   + f" ({(time.perf_counter() - start) * 1000:0.0f} ms)")
 
     def collapseDoublePeaks(self):
+        from peakDetection import collapseLeadingPeaks
         doulePeakDistance = self.doublePeakDistanceSpinBox.value()*10
-        print(f"Double peak distance : {doulePeakDistance}")
-        
-        for channel in ["Channel 1", "Channel 2", "Channel 3"]:
-            leadingPeak = -1000000000
-            for peak in self.peakDict[channel]:
-                if (peak - leadingPeak) > doulePeakDistance:
-                    self.peakDict[channel + " filtered"] = np.append(self.peakDict[channel + " filtered"], peak)
-                    leadingPeak = peak
-                else:
-                    #print(f"Channel : {channel}, peak : {peak}, leading peak : {leadingPeak}, distance: {peak - leadingPeak}")
-                    self.peakDict[channel + " removed"] = np.append(self.peakDict[channel + " removed"], peak)
+        logger.debug(f"Double peak distance : {doulePeakDistance}")
+
+        with stage("double peak collapse", rows=sum(len(self.peakDict[channel]) for channel in CHANNELS)):
+            for channel in CHANNELS:
+                # Leading peak rule, vectorized (see peakDetection.collapseLeadingPeaks)
+                filtered, removed, _ = collapseLeadingPeaks(self.peakDict[channel], doulePeakDistance)
+                self.peakDict[channel + " filtered"] = filtered
+                self.peakDict[channel + " removed"] = removed
     
 
+    def channelFeatures(self, channel):
+        # Per peak features of the current peaks of a channel (see eventFeatures.py), None
+        # unless the peaks were selected from a candidate index
+        properties = self.peakProperties.get(channel)
+        if properties is None or properties["sample"] is not getattr(self, "peakDict", {}).get(channel):
+            return None
+        from peakDetection import leadingPeakMask
+        doublePeakDistance = self.doublePeakDistanceSpinBox.value()*10
+        cached = self.featureCache.get(channel)
+        if cached is not None and cached[0] is properties and cached[1] == doublePeakDistance:
+            return cached[2]
+        data, invert, _ = self.peakIndexKeys[channel]
+        final, _ = leadingPeakMask(properties["sample"], doublePeakDistance)
+        features = eventFeatures(data, properties, self.store.timeIndex, final, invert)
+        features["final"] = final
+        self.featureCache[channel] = (properties, doublePeakDistance, features)
+        return features
+
+    @instrumented("statistics redraw", level=logging.DEBUG)
+    def updateStatistics(self):
+        channel = self.statisticsChannelCBox.currentText()
+        feature = self.statisticsFeatureCBox.currentData()
+        features = self.channelFeatures(channel)
+        if features is None:
+            self.histogramHandle.setData([0, 1], [0])
+            self.rateHandle.setData([], [])
+            self.statisticsSummaryLabel.setText("Find peaks to see their statistics.")
+            return
+        final = features["final"]
+        values = np.asarray(features[feature][final], dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) > 0:
+            counts, edges = np.histogram(values, bins=self.histogramBinsSpinBox.value())
+            self.histogramHandle.setData(edges, counts)
+        else:
+            self.histogramHandle.setData([0, 1], [0])
+        self.histogramPlot.setLabel("bottom", FEATURES[feature])
+
+        times = np.asarray(self.store.timeIndex[self.peakProperties[channel]["sample"][final]], dtype=np.float64)
+        centres, rates = slidingRate(times, self.rateBinSpinBox.value())
+        self.rateHandle.setData(centres, rates)
+        summary = f"{channel}: {int(final.sum())} events"
+        if len(values) > 0:
+            summary += (f", {FEATURES[feature].lower()} mean {values.mean():0.4g}, median {np.median(values):0.4g}, "
+                        f"std {values.std():0.4g}")
+        if len(rates) > 0:
+            summary += f", rate {rates.mean():0.4g} +/- {rates.std():0.4g} 1/s"
+        self.statisticsSummaryLabel.setText(summary)
+
+    def channelShifts(self):
+        # Shifts of the channels as used by the views, the lag models while the drift is tracked
+        if self.alignment is not None and self.alignDriftCheckBox.isChecked():
+            return self.alignment
+        return [int(spinBox.value()) for spinBox in self.shiftSpinBoxes()]
+
+    def updateCoincidences(self):
+        # Coincidence groups of the final peaks (see coincidence.findCoincidences)
+        peakDict = getattr(self, "peakDict", {})
+        if any(f"{channel} filtered" not in peakDict for channel in CHANNELS):
+            self.coincidences = None
+            return
+        peaks = [peakDict[f"{channel} filtered"] for channel in CHANNELS]
+        window = self.coincidenceWindowSpinBox.value()
+        with stage("coincidence", rows=sum(len(channelPeaks) for channelPeaks in peaks), window=window):
+            codes, members, memberCodes = findCoincidences(peaks, self.channelShifts(), window)
+        self.coincidences = {"peaks": peaks, "codes": codes, "members": members, "memberCodes": memberCodes}
+        for channel, channelPeaks, channelCodes in zip(CHANNELS, peaks, codes):
+            for group in COINCIDENCE_COLORS:
+                self.peakDict[f"{channel} {group}"] = channelPeaks[channelCodes == COINCIDENCE_GROUPS.index(group)]
+        counts = np.bincount(memberCodes, minlength=len(COINCIDENCE_GROUPS))
+        logger.debug("Coincidences: " + ", ".join(f"{group}: {counts[code]}" for code, group in enumerate(COINCIDENCE_GROUPS) if code > 0))
+
+    def coincidenceSettingsChanged(self):
+        # While the drift is tracked the shift boxes only follow the window, the lags are fixed
+        if self.coincidences is None or self.followCheckBox.isChecked():
+            return
+        if self.sender() in self.shiftSpinBoxes() and self.alignDriftCheckBox.isChecked():
+            return
+        self.updateCoincidences()
+        self.redraw.request("raw")
+
+    """"
+    # Parameter sweep section
+    """
+    def fillSweepRanges(self):
+        # A single value per parameter, the current settings
+        thresholds = [self.rawPlotThreshold1.value(), self.rawPlotThreshold2.value(), self.rawPlotThreshold3.value()]
+        self.sweepDock.setRanges([[f"{threshold:g}", f"{self.peakWidthCBox.value():g}", f"{self.peakDistanceCBox.value():g}",
+                                   f"{self.doublePeakDistanceSpinBox.value():g}"] for threshold in thresholds])
+
+    def runParameterSweep(self, ranges):
+        from parameterSweep import PARAMETERS, parseRange, sweepGrid
+        if self.store is None:
+            self.statusbar.showMessage("Load data before running a parameter sweep.")
+            return
+        if self.sweep is not None and self.sweep.isRunning():
+            return
+        try:
+            grids = [None if texts is None else sweepGrid(dict(zip(PARAMETERS, (parseRange(text) for text in texts))))
+                     for texts in ranges]
+        except ValueError as error:
+            self.statusbar.showMessage(f"Parameter sweep: {error}")
+            return
+        _, inverted = self.peakThresholds()
+        # Thresholds are entered like in the GUI and negated for inverted channels
+        for grid, invert in zip(grids, inverted):
+            if grid is not None and invert:
+                grid[:, 0] *= -1
+
+        # Same data as "Find peaks": the whole channels or the current view
+        currentMin, currentMax = 0, len(self.store)
+        if self.currentViewCheckBox.isChecked():
+            currentMin = self.rawWindowStartSpinBox.value()
+            currentMax = currentMin + self.rawWindowSizeSpinBox.value()
+        shifts = [int(spinBox.value()) if self.currentViewCheckBox.isChecked() else 0 for spinBox in self.shiftSpinBoxes()]
+        views = [self.store.view(channel, currentMin, currentMax, shift=shift, inverted=invert)
+                 for channel, invert, shift in zip(CHANNELS, inverted, shifts)]
+
+        # Candidate indexes of the last peak search over the same data are reused
+        indexes = []
+        for channel, invert, shift in zip(CHANNELS, inverted, shifts):
+            data, indexInvert, window = getattr(self, "peakIndexKeys", {}).get(channel, (None, None, None))
+            reusable = data is self.store.channel(channel) and indexInvert == invert and window == (currentMin, currentMax, shift)
+            indexes.append(self.peakIndexes.get(channel) if reusable else None)
+        self.sweep = parameterSweepThread(views, self.store.timeIndex, grids, indexes, window=(currentMin, currentMax))
+        self.sweep.inverted = inverted
+        self.sweep.progress.connect(self.sweepDock.progressBar.setValue)
+        self.sweep.finished.connect(self.parameterSweepFinished)
+        self.sweepDock.cancelRequested.connect(self.sweep.cancel)
+        self.sweepDock.progressBar.setValue(0)
+        self.sweepDock.runButton.setEnabled(False)
+        self.sweep.start()
+
+    def parameterSweepFinished(self):
+        self.sweepDock.runButton.setEnabled(True)
+        self.sweepDock.cancelRequested.disconnect(self.sweep.cancel)
+        if self.sweep.results is None:
+            return
+        results = self.sweep.results
+        for result, invert in zip(results, self.sweep.inverted):
+            if result is not None and invert:
+                result["grid"][:, 0] *= -1
+        self.sweepDock.setResults(results, self.sweep.seconds)
+
+    def applySweepSettings(self, channel, values):
+        threshold, width, distance, doublePeakDistance = values
+        [self.rawPlotThreshold1, self.rawPlotThreshold2, self.rawPlotThreshold3][channel].setValue(threshold)
+        self.peakWidthCBox.setValue(width)
+        self.peakDistanceCBox.setValue(distance)
+        self.doublePeakDistanceSpinBox.setValue(doublePeakDistance)
+
     def exitProgram(self):
         print("[MainWindow] Exiting program.")
         #self.loadingBar.terminate()
@@ -611,11 +1358,12 @@ class MainWindow(QMainWindow):
         quit()
 
 
+if __name__ == "__main__":
+    # DAQDATAANALYZER_LOG=<file> additionally writes every stage as a JSON line
+    configureLogging(logFile=os.environ.get("DAQDATAANALYZER_LOG"))
+    app = QApplication(sys.argv)
 
+    window = MainWindow()
+    window.show()
 
-app = QApplication(sys.argv)
-
-window = MainWindow()
-window.show()
-
-app.exec()
\ No newline at end of file
+    app.exec()
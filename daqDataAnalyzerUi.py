@@ -0,0 +1,435 @@
+# Form implementation generated from reading ui file 'daqDataAnalyzer.ui'
+#
+# Created by: PyQt6 UI code generator 6.11.0
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic6 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        MainWindow.setObjectName("MainWindow")
+        MainWindow.resize(1119, 845)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(MainWindow.sizePolicy().hasHeightForWidth())
+        MainWindow.setSizePolicy(sizePolicy)
+        self.centralwidget = QtWidgets.QWidget(parent=MainWindow)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Preferred, QtWidgets.QSizePolicy.Policy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.centralwidget.sizePolicy().hasHeightForWidth())
+        self.centralwidget.setSizePolicy(sizePolicy)
+        self.centralwidget.setObjectName("centralwidget")
+        self.verticalLayout_2 = QtWidgets.QVBoxLayout(self.centralwidget)
+        self.verticalLayout_2.setObjectName("verticalLayout_2")
+        self.tabWidget = QtWidgets.QTabWidget(parent=self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Preferred, QtWidgets.QSizePolicy.Policy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.tabWidget.sizePolicy().hasHeightForWidth())
+        self.tabWidget.setSizePolicy(sizePolicy)
+        self.tabWidget.setObjectName("tabWidget")
+        self.rawDataPlotTab = QtWidgets.QWidget()
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Preferred, QtWidgets.QSizePolicy.Policy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.rawDataPlotTab.sizePolicy().hasHeightForWidth())
+        self.rawDataPlotTab.setSizePolicy(sizePolicy)
+        self.rawDataPlotTab.setObjectName("rawDataPlotTab")
+        self.verticalLayout = QtWidgets.QVBoxLayout(self.rawDataPlotTab)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.centralLayout = QtWidgets.QVBoxLayout()
+        self.centralLayout.setObjectName("centralLayout")
+        self.rawPlotLayout = QtWidgets.QVBoxLayout()
+        self.rawPlotLayout.setObjectName("rawPlotLayout")
+        self.rawPlotTools = QtWidgets.QHBoxLayout()
+        self.rawPlotTools.setObjectName("rawPlotTools")
+        self.rawPlotBackBtn = QtWidgets.QPushButton(parent=self.rawDataPlotTab)
+        self.rawPlotBackBtn.setToolTip("")
+        self.rawPlotBackBtn.setObjectName("rawPlotBackBtn")
+        self.rawPlotTools.addWidget(self.rawPlotBackBtn)
+        self.rawPlotForwardBtn = QtWidgets.QPushButton(parent=self.rawDataPlotTab)
+        self.rawPlotForwardBtn.setToolTip("")
+        self.rawPlotForwardBtn.setToolTipDuration(-1)
+        self.rawPlotForwardBtn.setObjectName("rawPlotForwardBtn")
+        self.rawPlotTools.addWidget(self.rawPlotForwardBtn)
+        self.rawStepSizeSpinBox = QtWidgets.QSpinBox(parent=self.rawDataPlotTab)
+        self.rawStepSizeSpinBox.setToolTipDuration(-1)
+        self.rawStepSizeSpinBox.setMinimum(1)
+        self.rawStepSizeSpinBox.setMaximum(999999999)
+        self.rawStepSizeSpinBox.setProperty("value", 1000)
+        self.rawStepSizeSpinBox.setObjectName("rawStepSizeSpinBox")
+        self.rawPlotTools.addWidget(self.rawStepSizeSpinBox)
+        self.rawWindowSizeSpinBox = QtWidgets.QSpinBox(parent=self.rawDataPlotTab)
+        self.rawWindowSizeSpinBox.setToolTip("")
+        self.rawWindowSizeSpinBox.setMinimum(1)
+        self.rawWindowSizeSpinBox.setMaximum(999999999)
+        self.rawWindowSizeSpinBox.setProperty("value", 10000)
+        self.rawWindowSizeSpinBox.setObjectName("rawWindowSizeSpinBox")
+        self.rawPlotTools.addWidget(self.rawWindowSizeSpinBox)
+        self.rawWindowStartSpinBox = QtWidgets.QSpinBox(parent=self.rawDataPlotTab)
+        self.rawWindowStartSpinBox.setMaximum(999999999)
+        self.rawWindowStartSpinBox.setObjectName("rawWindowStartSpinBox")
+        self.rawPlotTools.addWidget(self.rawWindowStartSpinBox)
+        self.downsamplingComboBox = QtWidgets.QComboBox(parent=self.rawDataPlotTab)
+        self.downsamplingComboBox.setObjectName("downsamplingComboBox")
+        self.downsamplingComboBox.addItem("")
+        self.downsamplingComboBox.addItem("")
+        self.downsamplingComboBox.addItem("")
+        self.downsamplingComboBox.addItem("")
+        self.downsamplingComboBox.addItem("")
+        self.rawPlotTools.addWidget(self.downsamplingComboBox)
+        self.rawPlotUpdateBtn = QtWidgets.QPushButton(parent=self.rawDataPlotTab)
+        self.rawPlotUpdateBtn.setToolTip("")
+        self.rawPlotUpdateBtn.setToolTipDuration(-1)
+        self.rawPlotUpdateBtn.setObjectName("rawPlotUpdateBtn")
+        self.rawPlotTools.addWidget(self.rawPlotUpdateBtn)
+        self.followCheckBox = QtWidgets.QCheckBox(parent=self.rawDataPlotTab)
+        self.followCheckBox.setObjectName("followCheckBox")
+        self.rawPlotTools.addWidget(self.followCheckBox)
+        self.autoScrollCheckBox = QtWidgets.QCheckBox(parent=self.rawDataPlotTab)
+        self.autoScrollCheckBox.setChecked(True)
+        self.autoScrollCheckBox.setObjectName("autoScrollCheckBox")
+        self.rawPlotTools.addWidget(self.autoScrollCheckBox)
+        self.jumpTimeSpinBox = QtWidgets.QDoubleSpinBox(parent=self.rawDataPlotTab)
+        self.jumpTimeSpinBox.setDecimals(6)
+        self.jumpTimeSpinBox.setMaximum(1000000000.0)
+        self.jumpTimeSpinBox.setObjectName("jumpTimeSpinBox")
+        self.rawPlotTools.addWidget(self.jumpTimeSpinBox)
+        self.jumpTimeBtn = QtWidgets.QPushButton(parent=self.rawDataPlotTab)
+        self.jumpTimeBtn.setObjectName("jumpTimeBtn")
+        self.rawPlotTools.addWidget(self.jumpTimeBtn)
+        self.rawPlotLayout.addLayout(self.rawPlotTools)
+        self.rawPlotThresholds = QtWidgets.QHBoxLayout()
+        self.rawPlotThresholds.setObjectName("rawPlotThresholds")
+        self.rawPlotThreshold1 = QtWidgets.QDoubleSpinBox(parent=self.rawDataPlotTab)
+        self.rawPlotThreshold1.setMinimumSize(QtCore.QSize(100, 0))
+        self.rawPlotThreshold1.setMinimum(-99.99)
+        self.rawPlotThreshold1.setSingleStep(0.1)
+        self.rawPlotThreshold1.setObjectName("rawPlotThreshold1")
+        self.rawPlotThresholds.addWidget(self.rawPlotThreshold1)
+        self.rawPlotThreshold2 = QtWidgets.QDoubleSpinBox(parent=self.rawDataPlotTab)
+        self.rawPlotThreshold2.setMinimumSize(QtCore.QSize(100, 0))
+        self.rawPlotThreshold2.setMinimum(-99.99)
+        self.rawPlotThreshold2.setSingleStep(0.1)
+        self.rawPlotThreshold2.setObjectName("rawPlotThreshold2")
+        self.rawPlotThresholds.addWidget(self.rawPlotThreshold2)
+        self.rawPlotThreshold3 = QtWidgets.QDoubleSpinBox(parent=self.rawDataPlotTab)
+        self.rawPlotThreshold3.setMinimumSize(QtCore.QSize(100, 0))
+        self.rawPlotThreshold3.setMinimum(-99.99)
+        self.rawPlotThreshold3.setSingleStep(0.1)
+        self.rawPlotThreshold3.setObjectName("rawPlotThreshold3")
+        self.rawPlotThresholds.addWidget(self.rawPlotThreshold3)
+        self.line = QtWidgets.QFrame(parent=self.rawDataPlotTab)
+        self.line.setFrameShape(QtWidgets.QFrame.Shape.VLine)
+        self.line.setFrameShadow(QtWidgets.QFrame.Shadow.Sunken)
+        self.line.setObjectName("line")
+        self.rawPlotThresholds.addWidget(self.line)
+        self.axisShiftLabel = QtWidgets.QLabel(parent=self.rawDataPlotTab)
+        self.axisShiftLabel.setObjectName("axisShiftLabel")
+        self.rawPlotThresholds.addWidget(self.axisShiftLabel)
+        self.axisShiftLabelCh1 = QtWidgets.QLabel(parent=self.rawDataPlotTab)
+        self.axisShiftLabelCh1.setObjectName("axisShiftLabelCh1")
+        self.rawPlotThresholds.addWidget(self.axisShiftLabelCh1)
+        self.axisCh1ShiftSpinBox = QtWidgets.QDoubleSpinBox(parent=self.rawDataPlotTab)
+        self.axisCh1ShiftSpinBox.setDecimals(0)
+        self.axisCh1ShiftSpinBox.setMinimum(-100000000.0)
+        self.axisCh1ShiftSpinBox.setMaximum(100000000.0)
+        self.axisCh1ShiftSpinBox.setObjectName("axisCh1ShiftSpinBox")
+        self.rawPlotThresholds.addWidget(self.axisCh1ShiftSpinBox)
+        self.axisShiftLabelCh2 = QtWidgets.QLabel(parent=self.rawDataPlotTab)
+        self.axisShiftLabelCh2.setObjectName("axisShiftLabelCh2")
+        self.rawPlotThresholds.addWidget(self.axisShiftLabelCh2)
+        self.axisCh2ShiftSpinBox = QtWidgets.QSpinBox(parent=self.rawDataPlotTab)
+        self.axisCh2ShiftSpinBox.setMinimum(-100000000)
+        self.axisCh2ShiftSpinBox.setMaximum(100000000)
+        self.axisCh2ShiftSpinBox.setObjectName("axisCh2ShiftSpinBox")
+        self.rawPlotThresholds.addWidget(self.axisCh2ShiftSpinBox)
+        self.axisShiftLabelCh3 = QtWidgets.QLabel(parent=self.rawDataPlotTab)
+        self.axisShiftLabelCh3.setObjectName("axisShiftLabelCh3")
+        self.rawPlotThresholds.addWidget(self.axisShiftLabelCh3)
+        self.axisCh3ShiftSpinBox = QtWidgets.QSpinBox(parent=self.rawDataPlotTab)
+        self.axisCh3ShiftSpinBox.setMinimum(-100000000)
+        self.axisCh3ShiftSpinBox.setMaximum(100000000)
+        self.axisCh3ShiftSpinBox.setObjectName("axisCh3ShiftSpinBox")
+        self.rawPlotThresholds.addWidget(self.axisCh3ShiftSpinBox)
+        self.autoAlignBtn = QtWidgets.QPushButton(parent=self.rawDataPlotTab)
+        self.autoAlignBtn.setObjectName("autoAlignBtn")
+        self.rawPlotThresholds.addWidget(self.autoAlignBtn)
+        self.alignDriftCheckBox = QtWidgets.QCheckBox(parent=self.rawDataPlotTab)
+        self.alignDriftCheckBox.setObjectName("alignDriftCheckBox")
+        self.rawPlotThresholds.addWidget(self.alignDriftCheckBox)
+        self.rawPlotLayout.addLayout(self.rawPlotThresholds)
+        self.centralLayout.addLayout(self.rawPlotLayout)
+        self.verticalLayout.addLayout(self.centralLayout)
+        self.tabWidget.addTab(self.rawDataPlotTab, "")
+        self.peakFindingTab = QtWidgets.QWidget()
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.peakFindingTab.sizePolicy().hasHeightForWidth())
+        self.peakFindingTab.setSizePolicy(sizePolicy)
+        self.peakFindingTab.setObjectName("peakFindingTab")
+        self.horizontalLayoutWidget = QtWidgets.QWidget(parent=self.peakFindingTab)
+        self.horizontalLayoutWidget.setGeometry(QtCore.QRect(9, 9, 811, 461))
+        self.horizontalLayoutWidget.setObjectName("horizontalLayoutWidget")
+        self.horizontalLayout = QtWidgets.QHBoxLayout(self.horizontalLayoutWidget)
+        self.horizontalLayout.setContentsMargins(0, 0, 0, 0)
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.leftLayout = QtWidgets.QGridLayout()
+        self.leftLayout.setObjectName("leftLayout")
+        self.coincidenceWindowLabel = QtWidgets.QLabel(parent=self.horizontalLayoutWidget)
+        self.coincidenceWindowLabel.setObjectName("coincidenceWindowLabel")
+        self.leftLayout.addWidget(self.coincidenceWindowLabel, 7, 0, 1, 1)
+        self.coincidenceWindowSpinBox = QtWidgets.QSpinBox(parent=self.horizontalLayoutWidget)
+        self.coincidenceWindowSpinBox.setMaximum(1000000)
+        self.coincidenceWindowSpinBox.setProperty("value", 10)
+        self.coincidenceWindowSpinBox.setObjectName("coincidenceWindowSpinBox")
+        self.leftLayout.addWidget(self.coincidenceWindowSpinBox, 7, 1, 1, 1)
+        self.showCoincidencesCheckBox = QtWidgets.QCheckBox(parent=self.horizontalLayoutWidget)
+        self.showCoincidencesCheckBox.setObjectName("showCoincidencesCheckBox")
+        self.leftLayout.addWidget(self.showCoincidencesCheckBox, 11, 0, 1, 1)
+        self.findPeaksBtn = QtWidgets.QPushButton(parent=self.horizontalLayoutWidget)
+        self.findPeaksBtn.setObjectName("findPeaksBtn")
+        self.leftLayout.addWidget(self.findPeaksBtn, 15, 1, 1, 1)
+        self.currentViewCheckBox = QtWidgets.QCheckBox(parent=self.horizontalLayoutWidget)
+        self.currentViewCheckBox.setObjectName("currentViewCheckBox")
+        self.leftLayout.addWidget(self.currentViewCheckBox, 3, 1, 1, 1)
+        self.peakDistanceCBox = QtWidgets.QDoubleSpinBox(parent=self.horizontalLayoutWidget)
+        self.peakDistanceCBox.setMinimum(1.0)
+        self.peakDistanceCBox.setMaximum(9999999999.99)
+        self.peakDistanceCBox.setObjectName("peakDistanceCBox")
+        self.leftLayout.addWidget(self.peakDistanceCBox, 9, 1, 1, 1)
+        self.invertedCh2Box = QtWidgets.QCheckBox(parent=self.horizontalLayoutWidget)
+        self.invertedCh2Box.setObjectName("invertedCh2Box")
+        self.leftLayout.addWidget(self.invertedCh2Box, 5, 1, 1, 1)
+        self.doublePeakDistanceSpinBox = QtWidgets.QDoubleSpinBox(parent=self.horizontalLayoutWidget)
+        self.doublePeakDistanceSpinBox.setMaximum(99999999999.99)
+        self.doublePeakDistanceSpinBox.setObjectName("doublePeakDistanceSpinBox")
+        self.leftLayout.addWidget(self.doublePeakDistanceSpinBox, 10, 1, 1, 1)
+        self.showFilteredPeaksCheckBox = QtWidgets.QCheckBox(parent=self.horizontalLayoutWidget)
+        self.showFilteredPeaksCheckBox.setObjectName("showFilteredPeaksCheckBox")
+        self.leftLayout.addWidget(self.showFilteredPeaksCheckBox, 11, 1, 1, 1)
+        self.filenameLineEdit = QtWidgets.QLineEdit(parent=self.horizontalLayoutWidget)
+        self.filenameLineEdit.setObjectName("filenameLineEdit")
+        self.leftLayout.addWidget(self.filenameLineEdit, 13, 0, 1, 1)
+        self.peakWidthLabel = QtWidgets.QLabel(parent=self.horizontalLayoutWidget)
+        self.peakWidthLabel.setObjectName("peakWidthLabel")
+        self.leftLayout.addWidget(self.peakWidthLabel, 8, 0, 1, 1)
+        self.peakWidthCBox = QtWidgets.QDoubleSpinBox(parent=self.horizontalLayoutWidget)
+        self.peakWidthCBox.setObjectName("peakWidthCBox")
+        self.leftLayout.addWidget(self.peakWidthCBox, 8, 1, 1, 1)
+        self.doublePeakDistanceLabel = QtWidgets.QLabel(parent=self.horizontalLayoutWidget)
+        self.doublePeakDistanceLabel.setObjectName("doublePeakDistanceLabel")
+        self.leftLayout.addWidget(self.doublePeakDistanceLabel, 10, 0, 1, 1)
+        self.invertedCh3Box = QtWidgets.QCheckBox(parent=self.horizontalLayoutWidget)
+        self.invertedCh3Box.setObjectName("invertedCh3Box")
+        self.leftLayout.addWidget(self.invertedCh3Box, 6, 1, 1, 1)
+        self.showRemovedPeaksCheckBox = QtWidgets.QCheckBox(parent=self.horizontalLayoutWidget)
+        self.showRemovedPeaksCheckBox.setObjectName("showRemovedPeaksCheckBox")
+        self.leftLayout.addWidget(self.showRemovedPeaksCheckBox, 12, 1, 1, 1)
+        spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Policy.Minimum, QtWidgets.QSizePolicy.Policy.Expanding)
+        self.leftLayout.addItem(spacerItem, 14, 0, 1, 1)
+        self.invertedCh1Box = QtWidgets.QCheckBox(parent=self.horizontalLayoutWidget)
+        self.invertedCh1Box.setObjectName("invertedCh1Box")
+        self.leftLayout.addWidget(self.invertedCh1Box, 4, 1, 1, 1)
+        self.peakDistanceLabel = QtWidgets.QLabel(parent=self.horizontalLayoutWidget)
+        self.peakDistanceLabel.setObjectName("peakDistanceLabel")
+        self.leftLayout.addWidget(self.peakDistanceLabel, 9, 0, 1, 1)
+        self.savePeaksBtn = QtWidgets.QPushButton(parent=self.horizontalLayoutWidget)
+        self.savePeaksBtn.setObjectName("savePeaksBtn")
+        self.leftLayout.addWidget(self.savePeaksBtn, 13, 1, 1, 1)
+        self.horizontalLayout.addLayout(self.leftLayout)
+        self.rightLayout = QtWidgets.QVBoxLayout()
+        self.rightLayout.setObjectName("rightLayout")
+        self.horizontalLayout.addLayout(self.rightLayout)
+        spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
+        self.horizontalLayout.addItem(spacerItem1)
+        self.tabWidget.addTab(self.peakFindingTab, "")
+        self.waveletFilteringTab = QtWidgets.QWidget()
+        self.waveletFilteringTab.setObjectName("waveletFilteringTab")
+        self.verticalLayout_3 = QtWidgets.QVBoxLayout(self.waveletFilteringTab)
+        self.verticalLayout_3.setObjectName("verticalLayout_3")
+        self.waveletLayout = QtWidgets.QVBoxLayout()
+        self.waveletLayout.setObjectName("waveletLayout")
+        self.gridLayout = QtWidgets.QGridLayout()
+        self.gridLayout.setObjectName("gridLayout")
+        self.waveletFamilyCBox = QtWidgets.QComboBox(parent=self.waveletFilteringTab)
+        self.waveletFamilyCBox.setObjectName("waveletFamilyCBox")
+        self.gridLayout.addWidget(self.waveletFamilyCBox, 0, 1, 1, 1)
+        self.waveletBackBtn = QtWidgets.QPushButton(parent=self.waveletFilteringTab)
+        self.waveletBackBtn.setObjectName("waveletBackBtn")
+        self.gridLayout.addWidget(self.waveletBackBtn, 1, 0, 1, 1)
+        self.selectChannelCBox = QtWidgets.QComboBox(parent=self.waveletFilteringTab)
+        self.selectChannelCBox.setCurrentText("")
+        self.selectChannelCBox.setObjectName("selectChannelCBox")
+        self.selectChannelCBox.addItem("")
+        self.selectChannelCBox.addItem("")
+        self.selectChannelCBox.addItem("")
+        self.gridLayout.addWidget(self.selectChannelCBox, 0, 0, 1, 1)
+        self.applyWaveletBtn = QtWidgets.QPushButton(parent=self.waveletFilteringTab)
+        self.applyWaveletBtn.setObjectName("applyWaveletBtn")
+        self.gridLayout.addWidget(self.applyWaveletBtn, 1, 3, 1, 1)
+        self.waveletForwardBtn = QtWidgets.QPushButton(parent=self.waveletFilteringTab)
+        self.waveletForwardBtn.setObjectName("waveletForwardBtn")
+        self.gridLayout.addWidget(self.waveletForwardBtn, 1, 1, 1, 1)
+        self.refreshWaveletPlotBtn = QtWidgets.QPushButton(parent=self.waveletFilteringTab)
+        self.refreshWaveletPlotBtn.setObjectName("refreshWaveletPlotBtn")
+        self.gridLayout.addWidget(self.refreshWaveletPlotBtn, 1, 2, 1, 1)
+        self.selectWaveletCBox = QtWidgets.QComboBox(parent=self.waveletFilteringTab)
+        self.selectWaveletCBox.setObjectName("selectWaveletCBox")
+        self.gridLayout.addWidget(self.selectWaveletCBox, 0, 2, 1, 1)
+        self.scalogramCheckBox = QtWidgets.QCheckBox(parent=self.waveletFilteringTab)
+        self.scalogramCheckBox.setObjectName("scalogramCheckBox")
+        self.gridLayout.addWidget(self.scalogramCheckBox, 0, 3, 1, 1)
+        self.waveletLayout.addLayout(self.gridLayout)
+        self.verticalLayout_3.addLayout(self.waveletLayout)
+        self.tabWidget.addTab(self.waveletFilteringTab, "")
+        self.statisticsTab = QtWidgets.QWidget()
+        self.statisticsTab.setObjectName("statisticsTab")
+        self.verticalLayout_4 = QtWidgets.QVBoxLayout(self.statisticsTab)
+        self.verticalLayout_4.setObjectName("verticalLayout_4")
+        self.statisticsLayout = QtWidgets.QVBoxLayout()
+        self.statisticsLayout.setObjectName("statisticsLayout")
+        self.statisticsGridLayout = QtWidgets.QGridLayout()
+        self.statisticsGridLayout.setObjectName("statisticsGridLayout")
+        self.statisticsChannelCBox = QtWidgets.QComboBox(parent=self.statisticsTab)
+        self.statisticsChannelCBox.setObjectName("statisticsChannelCBox")
+        self.statisticsGridLayout.addWidget(self.statisticsChannelCBox, 0, 0, 1, 1)
+        self.statisticsFeatureCBox = QtWidgets.QComboBox(parent=self.statisticsTab)
+        self.statisticsFeatureCBox.setObjectName("statisticsFeatureCBox")
+        self.statisticsGridLayout.addWidget(self.statisticsFeatureCBox, 0, 1, 1, 1)
+        self.histogramBinsLabel = QtWidgets.QLabel(parent=self.statisticsTab)
+        self.histogramBinsLabel.setObjectName("histogramBinsLabel")
+        self.statisticsGridLayout.addWidget(self.histogramBinsLabel, 0, 2, 1, 1)
+        self.histogramBinsSpinBox = QtWidgets.QSpinBox(parent=self.statisticsTab)
+        self.histogramBinsSpinBox.setMinimum(2)
+        self.histogramBinsSpinBox.setMaximum(10000)
+        self.histogramBinsSpinBox.setProperty("value", 100)
+        self.histogramBinsSpinBox.setObjectName("histogramBinsSpinBox")
+        self.statisticsGridLayout.addWidget(self.histogramBinsSpinBox, 0, 3, 1, 1)
+        self.rateBinLabel = QtWidgets.QLabel(parent=self.statisticsTab)
+        self.rateBinLabel.setObjectName("rateBinLabel")
+        self.statisticsGridLayout.addWidget(self.rateBinLabel, 0, 4, 1, 1)
+        self.rateBinSpinBox = QtWidgets.QDoubleSpinBox(parent=self.statisticsTab)
+        self.rateBinSpinBox.setDecimals(3)
+        self.rateBinSpinBox.setMinimum(0.001)
+        self.rateBinSpinBox.setMaximum(100000.0)
+        self.rateBinSpinBox.setProperty("value", 1.0)
+        self.rateBinSpinBox.setObjectName("rateBinSpinBox")
+        self.statisticsGridLayout.addWidget(self.rateBinSpinBox, 0, 5, 1, 1)
+        self.statisticsSummaryLabel = QtWidgets.QLabel(parent=self.statisticsTab)
+        self.statisticsSummaryLabel.setObjectName("statisticsSummaryLabel")
+        self.statisticsGridLayout.addWidget(self.statisticsSummaryLabel, 1, 0, 1, 6)
+        self.statisticsLayout.addLayout(self.statisticsGridLayout)
+        self.verticalLayout_4.addLayout(self.statisticsLayout)
+        self.tabWidget.addTab(self.statisticsTab, "")
+        self.verticalLayout_2.addWidget(self.tabWidget)
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.menubar = QtWidgets.QMenuBar(parent=MainWindow)
+        self.menubar.setGeometry(QtCore.QRect(0, 0, 1119, 26))
+        self.menubar.setObjectName("menubar")
+        self.menuFile = QtWidgets.QMenu(parent=self.menubar)
+        self.menuFile.setObjectName("menuFile")
+        self.menuView = QtWidgets.QMenu(parent=self.menubar)
+        self.menuView.setObjectName("menuView")
+        MainWindow.setMenuBar(self.menubar)
+        self.statusbar = QtWidgets.QStatusBar(parent=MainWindow)
+        self.statusbar.setObjectName("statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+        self.actionOpen = QtGui.QAction(parent=MainWindow)
+        self.actionOpen.setObjectName("actionOpen")
+        self.actionOpenSession = QtGui.QAction(parent=MainWindow)
+        self.actionOpenSession.setObjectName("actionOpenSession")
+        self.actionCacheSettings = QtGui.QAction(parent=MainWindow)
+        self.actionCacheSettings.setObjectName("actionCacheSettings")
+        self.actionFrameBudget = QtGui.QAction(parent=MainWindow)
+        self.actionFrameBudget.setObjectName("actionFrameBudget")
+        self.actionExit = QtGui.QAction(parent=MainWindow)
+        self.actionExit.setObjectName("actionExit")
+        self.menuFile.addAction(self.actionOpen)
+        self.menuFile.addAction(self.actionOpenSession)
+        self.menuFile.addAction(self.actionCacheSettings)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionExit)
+        self.menuView.addAction(self.actionFrameBudget)
+        self.menubar.addAction(self.menuFile.menuAction())
+        self.menubar.addAction(self.menuView.menuAction())
+
+        self.retranslateUi(MainWindow)
+        self.tabWidget.setCurrentIndex(0)
+        QtCore.QMetaObject.connectSlotsByName(MainWindow)
+
+    def retranslateUi(self, MainWindow):
+        _translate = QtCore.QCoreApplication.translate
+        MainWindow.setWindowTitle(_translate("MainWindow", "MainWindow"))
+        self.rawPlotBackBtn.setText(_translate("MainWindow", "←"))
+        self.rawPlotForwardBtn.setText(_translate("MainWindow", "→"))
+        self.downsamplingComboBox.setItemText(0, _translate("MainWindow", "Min/max envelope"))
+        self.downsamplingComboBox.setItemText(1, _translate("MainWindow", "No downsampling"))
+        self.downsamplingComboBox.setItemText(2, _translate("MainWindow", "Peak"))
+        self.downsamplingComboBox.setItemText(3, _translate("MainWindow", "Subsample"))
+        self.downsamplingComboBox.setItemText(4, _translate("MainWindow", "Mean"))
+        self.rawPlotUpdateBtn.setText(_translate("MainWindow", "Update"))
+        self.followCheckBox.setText(_translate("MainWindow", "Follow file"))
+        self.autoScrollCheckBox.setText(_translate("MainWindow", "Auto-scroll"))
+        self.jumpTimeSpinBox.setToolTip(_translate("MainWindow", "Time to jump to, from the first sample"))
+        self.jumpTimeSpinBox.setSuffix(_translate("MainWindow", " s"))
+        self.jumpTimeBtn.setToolTip(_translate("MainWindow", "Move the window to the given time"))
+        self.jumpTimeBtn.setText(_translate("MainWindow", "Jump"))
+        self.axisShiftLabel.setText(_translate("MainWindow", "Shift X axis"))
+        self.axisShiftLabelCh1.setText(_translate("MainWindow", "Channel 1"))
+        self.axisShiftLabelCh2.setText(_translate("MainWindow", "Channel 2"))
+        self.axisShiftLabelCh3.setText(_translate("MainWindow", "Channel 3"))
+        self.autoAlignBtn.setToolTip(_translate("MainWindow", "Estimate the shifts of channels 2 and 3 against channel 1 by cross-correlation"))
+        self.autoAlignBtn.setText(_translate("MainWindow", "Auto-align"))
+        self.alignDriftCheckBox.setToolTip(_translate("MainWindow", "Estimate the shifts per segment and follow their drift along the recording"))
+        self.alignDriftCheckBox.setText(_translate("MainWindow", "Track drift"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.rawDataPlotTab), _translate("MainWindow", "Raw data plot"))
+        self.coincidenceWindowLabel.setText(_translate("MainWindow", "Coincidence window [samples]"))
+        self.coincidenceWindowSpinBox.setToolTip(_translate("MainWindow", "Peaks of different channels at most this many samples apart (after the shifts) are one event"))
+        self.showCoincidencesCheckBox.setText(_translate("MainWindow", "Show coincidences"))
+        self.findPeaksBtn.setText(_translate("MainWindow", "Find Peaks"))
+        self.currentViewCheckBox.setText(_translate("MainWindow", "Current view only"))
+        self.invertedCh2Box.setText(_translate("MainWindow", "Inverted peaks channel 2"))
+        self.showFilteredPeaksCheckBox.setText(_translate("MainWindow", "Show filtered peaks"))
+        self.filenameLineEdit.setPlaceholderText(_translate("MainWindow", "peaks.pkl"))
+        self.peakWidthLabel.setText(_translate("MainWindow", "Peak width"))
+        self.doublePeakDistanceLabel.setText(_translate("MainWindow", "Double peak distance [ms]"))
+        self.invertedCh3Box.setText(_translate("MainWindow", "Inverted peaks channel 3"))
+        self.showRemovedPeaksCheckBox.setText(_translate("MainWindow", "Show unfiltered peaks"))
+        self.invertedCh1Box.setText(_translate("MainWindow", "Inverted peaks channel 1"))
+        self.peakDistanceLabel.setText(_translate("MainWindow", "Peak distance"))
+        self.savePeaksBtn.setText(_translate("MainWindow", "Save peaks"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.peakFindingTab), _translate("MainWindow", "Peak finding"))
+        self.waveletFamilyCBox.setPlaceholderText(_translate("MainWindow", "Select wavelet family"))
+        self.waveletBackBtn.setText(_translate("MainWindow", "←"))
+        self.selectChannelCBox.setPlaceholderText(_translate("MainWindow", "Select a channel"))
+        self.selectChannelCBox.setItemText(0, _translate("MainWindow", "Channel 1"))
+        self.selectChannelCBox.setItemText(1, _translate("MainWindow", "Channel 2"))
+        self.selectChannelCBox.setItemText(2, _translate("MainWindow", "Channel 3"))
+        self.applyWaveletBtn.setText(_translate("MainWindow", "Apply wavelet filter"))
+        self.waveletForwardBtn.setText(_translate("MainWindow", "→"))
+        self.refreshWaveletPlotBtn.setText(_translate("MainWindow", "Refresh plot"))
+        self.selectWaveletCBox.setPlaceholderText(_translate("MainWindow", "Select wavelet"))
+        self.scalogramCheckBox.setToolTip(_translate("MainWindow", "Time-scale image of the selected channel, pan and zoom it with the mouse"))
+        self.scalogramCheckBox.setText(_translate("MainWindow", "Scalogram"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.waveletFilteringTab), _translate("MainWindow", "Wavelet filtering"))
+        self.histogramBinsLabel.setText(_translate("MainWindow", "Histogram bins"))
+        self.rateBinLabel.setText(_translate("MainWindow", "Rate bin"))
+        self.rateBinSpinBox.setSuffix(_translate("MainWindow", " s"))
+        self.statisticsSummaryLabel.setText(_translate("MainWindow", "Find peaks to see their statistics."))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.statisticsTab), _translate("MainWindow", "Statistics"))
+        self.menuFile.setTitle(_translate("MainWindow", "File"))
+        self.menuView.setTitle(_translate("MainWindow", "View"))
+        self.actionOpen.setText(_translate("MainWindow", "Open"))
+        self.actionOpenSession.setText(_translate("MainWindow", "Open session..."))
+        self.actionOpenSession.setToolTip(_translate("MainWindow", "Open several capture files as one timeline"))
+        self.actionCacheSettings.setText(_translate("MainWindow", "Cache settings..."))
+        self.actionFrameBudget.setText(_translate("MainWindow", "Redraw rate..."))
+        self.actionExit.setText(_translate("MainWindow", "Exit"))
@@ -0,0 +1,239 @@
+import io, sys, time, warnings
+import numpy as np
+
+# Default size of a binary block read from the DAQ file in one go.
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Every record is a timestamp followed by three channel values.
+COLUMNS = 4
+
+SPACE, TAB, CR, LF = 32, 9, 13, 10
+
+
+class parseStats:
+    def __init__(self):
+        self.bytesRead = 0
+        self.rows = 0
+        self.malformedLines = 0
+        self.seconds = 0.0
+
+    @property
+    def megabytesPerSecond(self):
+        if self.seconds == 0:
+            return 0.0
+        return self.bytesRead / 1e6 / self.seconds
+
+    @property
+    def rowsPerSecond(self):
+        if self.seconds == 0:
+            return 0.0
+        return self.rows / self.seconds
+
+    def __str__(self):
+        return (f"{self.rows} rows, {self.bytesRead/1e6:0.1f} MB in {self.seconds:0.2f} s "
+                f"({self.megabytesPerSecond:0.1f} MB/s, {self.rowsPerSecond:0.0f} rows/s, "
+                f"{self.malformedLines} malformed lines)")
+
+
+class growableColumns:
+    # Preallocated output columns which grow by 1.5x when the row estimate is exceeded.
+    def __init__(self, capacity):
+        self.n = 0
+        self._allocate(max(int(capacity), 1024))
+
+    def _allocate(self, capacity):
+        old = getattr(self, "timeIndex", None)
+        timeIndex = np.zeros(capacity, dtype=np.float64)
+        channels = np.zeros((3, capacity), dtype=np.float32)
+        if old is not None:
+            timeIndex[:self.n] = self.timeIndex[:self.n]
+            channels[:, :self.n] = self.channels[:, :self.n]
+        self.timeIndex = timeIndex
+        self.channels = channels
+
+    def append(self, records):
+        rows = len(records)
+        if self.n + rows > len(self.timeIndex):
+            self._allocate(int((self.n + rows) * 1.5))
+        self.timeIndex[self.n:self.n+rows] = records[:, 0]
+        self.channels[:, self.n:self.n+rows] = records[:, 1:COLUMNS].T
+        self.n += rows
+
+    def result(self):
+        return self.timeIndex[:self.n], self.channels[0, :self.n], self.channels[1, :self.n], self.channels[2, :self.n]
+
+
+def _parseLinesSlow(block):
+    # Fallback mirroring the original per-line loop, used only for blocks containing
+    # tokens NumPy cannot convert. Lines that cannot be converted are dropped.
+    records = []
+    malformed = 0
+    for line in block.split(b"\n"):
+        line = line.decode(errors="replace").replace("\t", " ").rstrip()
+        if len(line) == 0:
+            continue
+        line = [i for i in line.split(" ") if i]
+        try:
+            records.append([float(value) for value in line[:COLUMNS]])
+        except ValueError:
+            malformed += 1
+            continue
+        if len(records[-1]) < COLUMNS:
+            records.pop()
+            malformed += 1
+    return np.array(records, dtype=np.float64).reshape(-1, COLUMNS), malformed
+
+
+def _parseTokens(block):
+    # Used when some lines do not hold four values. Token boundaries are located with
+    # byte masks so that every token can be assigned to its line.
+    buf = np.frombuffer(block, dtype=np.uint8)
+    isNewline = buf == LF
+    isSeparator = isNewline | (buf == SPACE) | (buf == TAB) | (buf == CR)
+    # A token starts on a non separator byte preceded by a separator (or block start)
+    tokenStart = ~isSeparator
+    tokenStart[1:] &= isSeparator[:-1]
+    starts = np.flatnonzero(tokenStart)
+    del isSeparator, tokenStart
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            values = np.fromstring(block, dtype=np.float64, sep=" ")
+        except (ValueError, DeprecationWarning):
+            values = None
+    if values is None or len(values) != len(starts):
+        return _parseLinesSlow(block)
+
+    newlines = np.flatnonzero(isNewline)
+    lineOfToken = np.searchsorted(newlines, starts)
+    tokensPerLine = np.bincount(lineOfToken, minlength=len(newlines) + 1)
+
+    # Keeping the first four tokens of every line that has at least four.
+    firstToken = np.cumsum(tokensPerLine) - tokensPerLine
+    rank = np.arange(len(starts)) - firstToken[lineOfToken]
+    keep = (rank < COLUMNS) & (tokensPerLine[lineOfToken] >= COLUMNS)
+    malformed = int(np.count_nonzero((tokensPerLine > 0) & (tokensPerLine < COLUMNS)))
+    return values[keep].reshape(-1, COLUMNS), malformed
+
+
+def parseBlock(block):
+    """Converts a block of complete text lines into an (n, 4) float64 array.
+
+    Returns the records and the number of dropped (malformed) lines. Separators may
+    be any run of spaces or tabs; only the first four values of a line are used, which
+    is how the original loop treated malformed double lines. Lines with fewer than
+    four values are dropped.
+    """
+    if len(block) == 0:
+        return np.zeros((0, COLUMNS), dtype=np.float64), 0
+
+    with warnings.catch_warnings():
+        # Blocks made only of empty lines trigger an "empty input" warning
+        warnings.simplefilter("ignore", UserWarning)
+        try:
+            records = np.loadtxt(io.BytesIO(block), dtype=np.float64, comments=None,
+                                 usecols=range(COLUMNS), ndmin=2)
+            return records, 0
+        except ValueError:
+            return _parseTokens(block)
+
+
+def iterBlocks(f_in, blockSize=DEFAULT_BLOCK_SIZE):
+    # Yields (block, bytesConsumed) where every block ends on a complete line.
+    remainder = b""
+    while True:
+        chunk = f_in.read(blockSize)
+        if not chunk:
+            break
+        chunk = remainder + chunk
+        cut = chunk.rfind(b"\n")
+        if cut == -1:
+            remainder = chunk
+            continue
+        remainder = chunk[cut+1:]
+        yield chunk[:cut+1], cut + 1
+    if remainder:
+        yield remainder + b"\n", len(remainder)
+
+
+def parseDAQFile(inputFile, blockSize=DEFAULT_BLOCK_SIZE, progressCallback=None, stats=None):
+    """Parses a DAQ text file block by block.
+
+    Returns (timeIndex, ch1, ch2, ch3) in file order, timeIndex as float64 and
+    the channels as float32. progressCallback(percent) is called once per block.
+    """
+    if stats is None:
+        stats = parseStats()
+    start = time.perf_counter()
+
+    with open(inputFile, "rb") as f_in:
+        f_in.seek(0, 2)
+        fileSize = f_in.tell()
+        f_in.seek(0)
+
+        columns = None
+        for block, consumed in iterBlocks(f_in, blockSize):
+            records, malformed = parseBlock(block)
+            if columns is None:
+                # Estimating the total row count from the first block
+                bytesPerRow = consumed / max(len(records), 1)
+                columns = growableColumns(fileSize / bytesPerRow * 1.05)
+            columns.append(records)
+            stats.bytesRead += consumed
+            stats.rows += len(records)
+            stats.malformedLines += malformed
+            if progressCallback is not None and fileSize > 0:
+                progressCallback(int(stats.bytesRead / fileSize * 100))
+
+    stats.seconds = time.perf_counter() - start
+    if columns is None:
+        columns = growableColumns(0)
+    return columns.result()
+
+
+def parseDAQFileLegacy(inputFile, stats=None):
+    # The original per-line loop from loadingBarThread.run, kept for throughput comparison.
+    if stats is None:
+        stats = parseStats()
+    start = time.perf_counter()
+    with open(inputFile, "rb") as f_in:
+        fileLines = f_in.readlines()
+        count = len(fileLines) + 10000
+        timeIndex = np.zeros(count, dtype=np.float64)
+        ch1 = np.zeros(count, dtype=np.float32)
+        ch2 = np.zeros(count, dtype=np.float32)
+        ch3 = np.zeros(count, dtype=np.float32)
+        n = 0
+        for line in fileLines:
+            stats.bytesRead += len(line)
+            line = line.decode().rstrip()
+            if len(line) == 0:
+                continue
+            line = [i for i in line.split(" ") if i]
+            timeIndex[n] = line[0]
+            ch1[n] = float(line[1])
+            ch2[n] = float(line[2])
+            ch3[n] = float(line[3])
+            n += 1
+    stats.rows = n
+    stats.seconds = time.perf_counter() - start
+    return timeIndex[:n], ch1[:n], ch2[:n], ch3[:n]
+
+
+if __name__ == "__main__":
+    # Throughput comparison: python daqParser.py <daq file> [--legacy]
+    if len(sys.argv) < 2:
+        print("Usage: python daqParser.py <daq file> [--legacy]")
+        sys.exit(1)
+
+    stats = parseStats()
+    parseDAQFile(sys.argv[1], stats=stats)
+    print(f"[daqParser] Chunked parser : {stats}")
+
+    if "--legacy" in sys.argv:
+        legacyStats = parseStats()
+        parseDAQFileLegacy(sys.argv[1], stats=legacyStats)
+        print(f"[daqParser] Legacy loop    : {legacyStats}")
+        if stats.seconds > 0:
+            print(f"[daqParser] Speed-up       : {legacyStats.seconds / stats.seconds:0.1f}x")
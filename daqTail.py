@@ -0,0 +1,84 @@
+import sys, time
+import numpy as np
+
+from daqParser import parseBlock
+
+
+class daqTail:
+    """Keeps a DAQ file open and parses only the lines appended since the last poll.
+
+    An incomplete last line (the acquisition is still writing it) is kept back until
+    its newline arrives.
+    """
+    def __init__(self, inputFile, offset=0, timeOrigin=0.0):
+        self.inputFile = inputFile
+        self.f_in = open(inputFile, "rb")
+        self.f_in.seek(offset)
+        self.offset = offset
+        self.timeOrigin = timeOrigin
+        self.remainder = b""
+        self.malformedLines = 0
+
+    def poll(self, maxBytes=64 * 1024 * 1024):
+        """Returns (timeIndex, ch1, ch2, ch3) of the complete lines appended since the last call."""
+        chunk = self.f_in.read(maxBytes)
+        self.offset += len(chunk)
+        chunk = self.remainder + chunk
+        cut = chunk.rfind(b"\n")
+        if cut == -1:
+            self.remainder = chunk
+            records = np.zeros((0, 4))
+        else:
+            self.remainder = chunk[cut+1:]
+            records, malformed = parseBlock(chunk[:cut+1])
+            self.malformedLines += malformed
+            # Same filtering as the loader: rows without a timestamp are dropped
+            records = records[records[:, 0] != 0]
+
+        timeIndex = records[:, 0] - self.timeOrigin
+        channels = records[:, 1:4].T.astype(np.float32)
+        return timeIndex, channels[0], channels[1], channels[2]
+
+    def close(self):
+        self.f_in.close()
+
+
+def writeSyntheticLines(outputFile, rate=10000, duration=60.0, batch=0.1, peakRate=20.0, seed=0):
+    # Test writer: appends lines in the DAQ format to outputFile in real time,
+    # the way the acquisition does, with occasional negative peaks on every channel.
+    rng = np.random.default_rng(seed)
+    start = time.time()
+    t = start
+    with open(outputFile, "a") as f_out:
+        while time.time() - start < duration:
+            rows = int(rate * batch)
+            timeIndex = t + np.arange(rows) / rate
+            channels = rng.normal(0, 0.01, size=(3, rows))
+            peaks = rng.random(rows) < peakRate / rate
+            channels[:, peaks] -= 1.0
+            lines = [f"{timeIndex[i]:.6f}  {channels[0, i]:.5f} {channels[1, i]:.5f}  {channels[2, i]:.5f}\n" for i in range(rows)]
+            f_out.write("".join(lines))
+            f_out.flush()
+            t += rows / rate
+            time.sleep(max(0.0, (t - start) - (time.time() - start)))
+
+
+if __name__ == "__main__":
+    # python daqTail.py write <file> [seconds]   appends synthetic lines in real time
+    # python daqTail.py follow <file> [seconds]  prints the rows parsed from the growing file
+    if len(sys.argv) < 3 or sys.argv[1] not in ("write", "follow"):
+        print("Usage: python daqTail.py write|follow <file> [seconds]")
+        sys.exit(1)
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 60.0
+    if sys.argv[1] == "write":
+        writeSyntheticLines(sys.argv[2], duration=duration)
+    else:
+        tail = daqTail(sys.argv[2])
+        total = 0
+        start = time.time()
+        while time.time() - start < duration:
+            timeIndex, ch1, ch2, ch3 = tail.poll()
+            total += len(timeIndex)
+            print(f"[daqTail] {len(timeIndex)} new rows, {total} total, offset {tail.offset}")
+            time.sleep(0.25)
+        tail.close()
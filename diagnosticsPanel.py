@@ -0,0 +1,78 @@
+import time
+from PyQt6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                             QCheckBox, QPushButton, QLabel, QHeaderView)
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+
+# Most recent stages shown in the table
+MAX_ROWS = 200
+COLUMNS = ["Time", "Stage", "Seconds", "Rows", "Rows/s", "Process RSS rise [MB]", "Thread"]
+
+
+class recordBridge(QObject):
+    # Stages finish on worker threads as well, the signal moves them to the GUI thread
+    recorded = pyqtSignal(object)
+
+
+class diagnosticsDock(QDockWidget):
+    """Dock listing the timing, rows and memory rise of the latest stages.
+
+    The memory column is the rise of the resident memory of the whole process during
+    the stage, sampled, so stages running at the same time share it. "Profile next
+    operation" runs the next operation (loading, filtering, a peak search...) under
+    cProfile, redraws are never profiled; the path of the written profile is shown
+    below the table.
+    """
+    def __init__(self, instruments, parent=None):
+        super().__init__("Diagnostics", parent)
+        self.setObjectName("diagnosticsDock")
+        self.instruments = instruments
+
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        controls = QHBoxLayout()
+        self.redrawCheckBox = QCheckBox("Show redraws")
+        self.redrawCheckBox.setToolTip("List every plot redraw as well")
+        controls.addWidget(self.redrawCheckBox)
+        self.profileCheckBox = QCheckBox("Profile next operation")
+        self.profileCheckBox.setToolTip("Run the next operation (loading, filtering, a peak search, a sweep or an alignment) under cProfile")
+        self.profileCheckBox.toggled.connect(self.armProfile)
+        controls.addWidget(self.profileCheckBox)
+        clearButton = QPushButton("Clear")
+        clearButton.clicked.connect(lambda: self.table.setRowCount(0))
+        controls.addWidget(clearButton)
+        controls.addStretch()
+        layout.addLayout(controls)
+        self.profileLabel = QLabel("")
+        self.profileLabel.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addWidget(self.profileLabel)
+        self.setWidget(widget)
+
+        self.bridge = recordBridge()
+        self.bridge.recorded.connect(self.addRecord)
+        instruments.addListener(self.bridge.recorded.emit)
+
+    def armProfile(self, checked):
+        self.instruments.profileNext = checked
+
+    def addRecord(self, record):
+        if record.profile is not None:
+            self.profileLabel.setText(f"Profile of {record.name}: {record.profile}")
+            self.profileCheckBox.setChecked(False)
+        if record.name.endswith("redraw") and not self.redrawCheckBox.isChecked():
+            return
+
+        memory = "" if record.memoryIncrease is None else f"{record.memoryIncrease / 1024**2:0.1f}"
+        rate = "" if record.rowsPerSecond is None else f"{record.rowsPerSecond:0.0f}"
+        values = [time.strftime("%H:%M:%S", time.localtime(record.started)), record.name + (" (failed)" if record.error else ""),
+                  f"{record.seconds:0.3f}", "" if record.rows is None else str(record.rows), rate, memory, record.thread]
+        self.table.insertRow(0)
+        for column, value in enumerate(values):
+            self.table.setItem(0, column, QTableWidgetItem(value))
+        if self.table.rowCount() > MAX_ROWS:
+            self.table.setRowCount(MAX_ROWS)
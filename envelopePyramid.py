@@ -0,0 +1,106 @@
+import numpy as np
+
+# The channel itself is read in blocks of about READ_BLOCK samples
+READ_BLOCK = 1 << 22
+
+
+class EnvelopePyramid:
+    """Min/max envelope of one channel at decreasing resolutions.
+
+    Level L (L >= 1) stores the minimum and maximum of every bucket of factor**L
+    samples. A window is drawn from the coarsest level that still gives at least one
+    bucket per pixel, so the number of drawn points depends on the plot width and not
+    on the window size. Because every bucket keeps its extremes, a single sample spike
+    is never averaged or subsampled away.
+    """
+    def __init__(self, data, factor=8, minBuckets=512):
+        self.factor = factor
+        self.minBuckets = minBuckets
+        self.data = data
+        self.length = 0
+        self.mins = []
+        self.maxs = []
+        self.counts = []
+        self.extend(data)
+
+    def bucketSize(self, level):
+        return self.factor ** level
+
+    def _reserve(self, level, count):
+        if level > len(self.mins):
+            capacity = max(count, 1024)
+            self.mins.append(np.empty(capacity, dtype=self.data.dtype))
+            self.maxs.append(np.empty(capacity, dtype=self.data.dtype))
+            self.counts.append(0)
+        elif count > len(self.mins[level-1]):
+            # Doubling the capacity keeps incremental appends amortized O(new samples)
+            capacity = max(count, 2 * len(self.mins[level-1]))
+            for levels in (self.mins, self.maxs):
+                grown = np.empty(capacity, dtype=levels[level-1].dtype)
+                grown[:self.counts[level-1]] = levels[level-1][:self.counts[level-1]]
+                levels[level-1] = grown
+
+    def extend(self, data):
+        """Updates the pyramid after samples were appended to data.
+
+        Only the buckets from the last (possibly partial) bucket onwards are recomputed.
+        """
+        self.data = data
+        oldLength = self.length
+        newLength = len(data)
+        if newLength == oldLength:
+            return
+
+        previousMins = previousMaxs = data
+        previousCount = newLength
+        level = 1
+        while previousCount > self.minBuckets or level <= len(self.mins):
+            count = -(-newLength // self.bucketSize(level))
+            # First bucket of this level touched by the new samples (all of them for a new level)
+            first = oldLength // self.bucketSize(level) if level <= len(self.mins) else 0
+            self._reserve(level, count)
+            if level == 1:
+                # The data may be memory mapped or spread over several files (see captureSession.py)
+                block = max(READ_BLOCK // self.factor, 1) * self.factor
+                for blockStart in range(first * self.factor, previousCount, block):
+                    chunk = np.asarray(data[blockStart:blockStart+block])
+                    starts = np.arange(0, len(chunk), self.factor)
+                    bucket = blockStart // self.factor
+                    self.mins[0][bucket:bucket+len(starts)] = np.minimum.reduceat(chunk, starts)
+                    self.maxs[0][bucket:bucket+len(starts)] = np.maximum.reduceat(chunk, starts)
+            else:
+                starts = np.arange(first * self.factor, previousCount, self.factor) - first * self.factor
+                if len(starts) > 0:
+                    self.mins[level-1][first:count] = np.minimum.reduceat(previousMins[first*self.factor:previousCount], starts)
+                    self.maxs[level-1][first:count] = np.maximum.reduceat(previousMaxs[first*self.factor:previousCount], starts)
+            self.counts[level-1] = count
+            previousMins = self.mins[level-1][:count]
+            previousMaxs = self.maxs[level-1][:count]
+            previousCount = count
+            level += 1
+        self.length = newLength
+
+    def levelFor(self, samples, pixels):
+        level = 0
+        pixels = max(int(pixels), 1)
+        while level < len(self.mins) and self.bucketSize(level + 1) * pixels <= samples:
+            level += 1
+        return level
+
+    def window(self, timeIndex, start, stop, pixels):
+        """Returns (x, y) to draw samples [start, stop) on a plot pixels wide."""
+        start = min(max(start, 0), self.length)
+        stop = min(max(stop, start), self.length)
+        level = self.levelFor(stop - start, pixels)
+        if level == 0:
+            return timeIndex[start:stop], self.data[start:stop]
+
+        size = self.bucketSize(level)
+        first = start // size
+        last = min(-(-stop // size), self.counts[level-1])
+        # Every bucket is drawn as a vertical segment from its minimum to its maximum
+        x = np.repeat(timeIndex[np.maximum(np.arange(first, last) * size, start)], 2)
+        y = np.empty(2 * (last - first), dtype=self.data.dtype)
+        y[0::2] = self.mins[level-1][first:last]
+        y[1::2] = self.maxs[level-1][first:last]
+        return x, y
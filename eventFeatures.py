@@ -0,0 +1,75 @@
+import numpy as np
+
+from instrumentation import stage
+
+# Channels are read in blocks of READ_BLOCK samples for the peak areas
+READ_BLOCK = 1 << 22
+# Per event features, in the units of the peak store columns
+FEATURES = {"amplitude": "Amplitude", "width": "Width [samples]", "area": "Area [value x samples]",
+            "interArrival": "Inter-arrival time [s]"}
+
+
+def peakAreas(values, left, right, base, inverted=False):
+    """Sum of values - base over [left, right) for every peak, without a loop over the peaks.
+
+    The peaks are grouped by the READ_BLOCK block of their left edge. Every block is read
+    once (up to the furthest right edge of its peaks), and the areas are differences of
+    its cumulative sum. left must be sorted. With inverted the values are negated first,
+    like the data the peaks were searched in.
+    """
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    areas = np.empty(len(left))
+    if len(left) == 0:
+        return areas
+    blocks = left // READ_BLOCK
+    firsts = np.flatnonzero(np.concatenate(([True], blocks[1:] != blocks[:-1])))
+    lasts = np.concatenate((firsts[1:], [len(left)]))
+    for first, last in zip(firsts, lasts):
+        start = int(blocks[first]) * READ_BLOCK
+        stop = int(right[first:last].max())
+        chunk = np.asarray(values[start:stop], dtype=np.float64)
+        if inverted:
+            chunk = -chunk
+        cumulative = np.concatenate(([0.0], np.cumsum(chunk)))
+        areas[first:last] = cumulative[right[first:last] - start] - cumulative[left[first:last] - start]
+    return areas - np.asarray(base, dtype=np.float64) * (right - left)
+
+
+def eventFeatures(values, table, timeIndex, final, inverted=False):
+    """Amplitude, width, area and inter-arrival time of every peak of a peakTable.
+
+    values is the channel the peaks were found in, final the double peak filter mask.
+    The amplitude is the height of the data (negative for inverted peaks), the area is
+    taken above the peak base (height - prominence) over the width of the peak at half
+    prominence, and the inter-arrival time is the time since the previous final peak
+    (NaN for the first one and for removed double peaks).
+    """
+    samples = np.asarray(table["sample"], dtype=np.int64)
+    with stage("event features", rows=len(samples)):
+        right = np.minimum(np.floor(table["rightEdge"]).astype(np.int64) + 1, len(values))
+        area = peakAreas(values, samples, np.maximum(right, samples + 1), table["height"] - table["prominence"], inverted)
+        interArrival = np.full(len(samples), np.nan)
+        times = np.asarray(timeIndex[samples[final]], dtype=np.float64)
+        interArrival[np.flatnonzero(final)[1:]] = np.diff(times)
+    return {"amplitude": -table["height"] if inverted else table["height"], "width": table["width"],
+            "area": area, "interArrival": interArrival}
+
+
+def slidingRate(times, binSeconds, stepSeconds=None, start=None, stop=None):
+    """Event rate [1/s] in bins of binSeconds moved by stepSeconds (half a bin by default).
+
+    times must be sorted. Returns the bin centres and the rates; the counts of all bins
+    are two searchsorted calls.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if stepSeconds is None:
+        stepSeconds = binSeconds / 2
+    if start is None:
+        start = times[0] if len(times) > 0 else 0.0
+    if stop is None:
+        stop = times[-1] if len(times) > 0 else 0.0
+    starts = np.arange(start, max(stop - binSeconds, start) + stepSeconds / 2, stepSeconds)
+    counts = np.searchsorted(times, starts + binSeconds, side="left") - np.searchsorted(times, starts, side="left")
+    return starts + binSeconds / 2, counts / binSeconds
+
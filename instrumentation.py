@@ -0,0 +1,235 @@
+import os, sys, json, time, logging, threading, tempfile, cProfile, pstats, io, functools, inspect
+from collections import deque
+from contextlib import contextmanager
+
+# Per-stage instrumentation: wall time, rows processed and how far the resident memory
+# of the process rose during every stage (loading, sorting, filtering, peak detection,
+# redraws...). Finished stages are logged through the "daqDataAnalyzer" logger and
+# passed to listeners such as the diagnostics panel.
+
+logger = logging.getLogger("daqDataAnalyzer")
+
+# Period of the resident memory sampling while a stage runs
+MEMORY_SAMPLE_SECONDS = 0.01
+
+
+def residentMemory():
+    # Resident set size of the process in bytes, None where it cannot be read
+    try:
+        with open("/proc/self/statm") as f_in:
+            return int(f_in.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        # Elsewhere only the peak resident size of the process is known, which is
+        # still enough to see how far a stage raised it
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+    except ImportError:
+        return None
+
+
+class stageRecord:
+    def __init__(self, name, rows=None, **details):
+        self.name = name
+        self.rows = rows
+        self.details = details
+        self.started = time.time()
+        self.seconds = 0.0
+        self.thread = threading.current_thread().name
+        self.startMemory = residentMemory()
+        self.peakMemory = self.startMemory
+        self.error = None
+        self.profile = None
+
+    @property
+    def memoryIncrease(self):
+        # Rise of the process resident memory (sampled) from the start of the stage to its
+        # peak; stages running at the same time on other threads count as well
+        if self.startMemory is None:
+            return None
+        return self.peakMemory - self.startMemory
+
+    @property
+    def rowsPerSecond(self):
+        if not self.rows or self.seconds == 0:
+            return None
+        return self.rows / self.seconds
+
+    def asDict(self):
+        return {"stage": self.name, "started": self.started, "seconds": self.seconds, "rows": self.rows,
+                "rowsPerSecond": self.rowsPerSecond, "startMemory": self.startMemory, "peakMemory": self.peakMemory,
+                "memoryIncrease": self.memoryIncrease, "thread": self.thread, "error": self.error,
+                "profile": self.profile, **self.details}
+
+    def __str__(self):
+        text = f"{self.name}: {self.seconds:0.3f} s"
+        if self.rows is not None:
+            text += f", {self.rows} rows"
+            if self.rowsPerSecond is not None:
+                text += f" ({self.rowsPerSecond:0.0f} rows/s)"
+        if self.memoryIncrease is not None:
+            text += f", process RSS peak +{self.memoryIncrease / 1024**2:0.1f} MB"
+        if self.error is not None:
+            text += f", failed ({self.error})"
+        return text
+
+
+class instrumentation:
+    """Collects stageRecords of the last maxRecords stages.
+
+    Stages are timed with the stage() context manager or the instrumented decorator.
+    Stages may run on any thread and may be nested. When profileNext is set, the next
+    operation started (a stage marked operation=True that is not nested in another
+    stage, so never a redraw) is run under cProfile and the statistics are written to
+    profileDirectory.
+    """
+    def __init__(self, maxRecords=500, profileDirectory=None):
+        self.records = deque(maxlen=maxRecords)
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.active = []
+        self.local = threading.local()
+        self.profileNext = False
+        self.profileDirectory = profileDirectory or tempfile.gettempdir()
+        self.sampling = threading.Event()
+        self.sampler = None
+
+    def addListener(self, callback):
+        # callback(record) is called on the thread which finished the stage
+        self.listeners.append(callback)
+
+    def removeListener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _sample(self):
+        # Background thread raising the peak memory of the running stages
+        while True:
+            self.sampling.wait()
+            memory = residentMemory()
+            with self.lock:
+                for record in self.active:
+                    if memory is not None and memory > record.peakMemory:
+                        record.peakMemory = memory
+                if not self.active:
+                    self.sampling.clear()
+            time.sleep(MEMORY_SAMPLE_SECONDS)
+
+    def current(self):
+        # Innermost stage running on this thread, e.g. to set its rows from inside
+        stack = getattr(self.local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def stage(self, name, rows=None, level=logging.INFO, operation=False, **details):
+        record = stageRecord(name, rows, **details)
+        profiler = None
+        with self.lock:
+            if self.profileNext and operation and not getattr(self.local, "stack", None):
+                self.profileNext = False
+                profiler = cProfile.Profile()
+            self.active.append(record)
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self._sample, name="memorySampler", daemon=True)
+                self.sampler.start()
+            self.sampling.set()
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        self.local.stack.append(record)
+
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        except BaseException as error:
+            record.error = type(error).__name__
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record.seconds = time.perf_counter() - start
+            self.local.stack.pop()
+            memory = residentMemory()
+            with self.lock:
+                self.active.remove(record)
+                if memory is not None and record.peakMemory is not None:
+                    record.peakMemory = max(record.peakMemory, memory)
+                self.records.append(record)
+            if profiler is not None:
+                record.profile = self._saveProfile(profiler, record)
+            logger.log(level, str(record), extra={"stage": record.asDict()})
+            for listener in list(self.listeners):
+                listener(record)
+
+    def instrumented(self, name, level=logging.INFO, operation=False):
+        # Decorator running the whole function as one stage
+        def decorator(function):
+            # Qt drops signal arguments a slot does not take; the wrapper does the same so
+            # that decorated methods can still be connected to signals like valueChanged
+            parameters = inspect.signature(function).parameters.values()
+            if any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters):
+                positional = None
+            else:
+                positional = sum(parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)
+                                 for parameter in parameters)
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name, level=level, operation=operation):
+                    return function(*args[:positional], **kwargs)
+            return wrapper
+        return decorator
+
+    def _saveProfile(self, profiler, record):
+        path = os.path.join(self.profileDirectory, f"daqDataAnalyzer-{record.name.replace(' ', '-')}-{int(record.started)}.prof")
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        logger.info(f"Profile of {record.name} written to {path} (open with python -m pstats or snakeviz)\n{summary.getvalue()}")
+        return path
+
+    def summary(self):
+        # Total seconds, rows and calls per stage name over the kept records
+        totals = {}
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            total = totals.setdefault(record.name, {"calls": 0, "seconds": 0.0, "rows": 0})
+            total["calls"] += 1
+            total["seconds"] += record.seconds
+            total["rows"] += record.rows or 0
+        return totals
+
+
+class jsonFormatter(logging.Formatter):
+    # One JSON object per line; stage records carry all their fields
+    def format(self, record):
+        entry = {"time": record.created, "level": record.levelname, "logger": record.name, "message": record.getMessage()}
+        if hasattr(record, "stage"):
+            entry["stage"] = record.stage
+        return json.dumps(entry)
+
+
+def configureLogging(level=logging.INFO, logFile=None):
+    """Readable log lines on the console and, with logFile, JSON lines with every stage (also debug ones)."""
+    logger.setLevel(logging.DEBUG)
+    if not any(isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler)
+               for handler in logger.handlers):
+        console = logging.StreamHandler()
+        console.setLevel(level)
+        console.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+        logger.addHandler(console)
+    if logFile:
+        handler = logging.FileHandler(logFile)
+        handler.setLevel(logging.DEBUG)
+        handler.setFormatter(jsonFormatter())
+        logger.addHandler(handler)
+
+
+# Instrumentation shared by the whole program
+INSTRUMENTS = instrumentation()
+stage = INSTRUMENTS.stage
+instrumented = INSTRUMENTS.instrumented
@@ -0,0 +1,184 @@
+import os, itertools, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+import numpy as np
+
+from peakDetection import peakCandidateIndex, buildViewIndexes, leadingPeakMask, peakSearchCancelled
+from instrumentation import stage
+
+# Swept peak finding settings, in the units of the GUI: threshold (negated for inverted
+# channels by the caller), peak width and distance in samples, and the double peak
+# distance in tens of samples like doublePeakDistanceSpinBox.
+PARAMETERS = ["height", "width", "distance", "doublePeakDistance"]
+# Time bins of the rate stability, the coefficient of variation of the event rate over them
+RATE_BINS = 20
+# Grid points per task
+TASK_SIZE = 64
+# Columns of the candidate indexes the workers query, see peakCandidateIndex.leftEdges
+INDEX_COLUMNS = {"peaks": "peaks", "peak_heights": "heights", "widths": "widths", "left_ips": "leftIps"}
+
+
+def parseRange(text):
+    """Values of "start:stop:steps" (steps evenly spaced values) or of a single number."""
+    parts = [part.strip() for part in str(text).split(":")]
+    if len(parts) == 1:
+        return np.array([float(parts[0])])
+    if len(parts) != 3:
+        raise ValueError(f"Expected a number or start:stop:steps, got {text!r}")
+    start, stop, steps = float(parts[0]), float(parts[1]), int(parts[2])
+    if steps < 1:
+        raise ValueError(f"The number of steps must be at least 1, got {steps}")
+    return np.linspace(start, stop, steps)
+
+
+def sweepGrid(ranges):
+    # (combinations, len(PARAMETERS)) array of every combination of the value arrays in
+    # ranges (a dict by parameter), the double peak distance varying fastest
+    return np.array(list(itertools.product(*(ranges[parameter] for parameter in PARAMETERS))), dtype=np.float64).reshape(-1, len(PARAMETERS))
+
+
+class sharedArray:
+    """numpy array in a shared memory block, attached by name in the worker processes."""
+    def __init__(self, values=None, spec=None):
+        if spec is None:
+            values = np.ascontiguousarray(values)
+            self.memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            self.spec = (self.memory.name, values.shape, values.dtype.str)
+            self.array = np.ndarray(values.shape, dtype=values.dtype, buffer=self.memory.buf)
+            self.array[...] = values
+            self.owner = True
+        else:
+            self.spec = spec
+            name, shape, dtype = spec
+            # Spawned workers share the resource tracker of the creating process, which
+            # removes the block once the creator unlinks it
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.memory.buf)
+            self.owner = False
+
+    def close(self):
+        self.array = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+# Shared arrays and candidate indexes of a worker process
+_shared = {}
+_indexes = {}
+
+
+def _attachWorker(specs, floors):
+    # specs[channel][column] of the shared index columns and a one byte cancel flag
+    for key, spec in specs.items():
+        _shared[key] = sharedArray(spec=spec) if key == "cancel" else {column: sharedArray(spec=value) for column, value in spec.items()}
+    for channel, floor in floors.items():
+        columns = {column: _shared[channel][column].array for column in INDEX_COLUMNS}
+        # Prominences and right edges are not needed for leftEdges
+        columns.update(prominences=None, right_ips=None)
+        _indexes[channel] = peakCandidateIndex(columns.pop("peaks"), columns, floor)
+
+
+def _evaluate(channel, combinations, sampleEdges, binSeconds):
+    """Event count, removed double peaks and rate variation of every combination."""
+    index = _indexes[channel]
+    cancelled = _shared["cancel"].array
+    events = np.empty(len(combinations), dtype=np.int64)
+    removed = np.empty(len(combinations), dtype=np.int64)
+    rateVariation = np.empty(len(combinations))
+    previous, samples = None, None
+    for number, (height, width, distance, doublePeakDistance) in enumerate(combinations):
+        if cancelled[0]:
+            return None
+        # Combinations differing only in the double peak distance share the peak selection
+        if previous != (height, width, distance):
+            samples = index.leftEdges(height, width, distance if distance >= 1 else None)
+            previous = (height, width, distance)
+        keep, _ = leadingPeakMask(samples, doublePeakDistance*10)
+        final = samples[keep]
+        events[number] = len(final)
+        removed[number] = len(samples) - len(final)
+        rates = np.diff(np.searchsorted(final, sampleEdges)) / binSeconds
+        rateVariation[number] = rates.std() / rates.mean() if rates.mean() > 0 else np.nan
+    return events, removed, rateVariation
+
+
+def rateBins(timeIndex, bins=RATE_BINS, start=0, stop=None):
+    # Sample edges (from start) and durations of equal time bins over samples [start, stop)
+    # of timeIndex; empty stretches (gaps) keep their duration. Only the edges are read.
+    stop = len(timeIndex) if stop is None else min(stop, len(timeIndex))
+    edges = np.linspace(timeIndex[start], timeIndex[stop - 1], bins + 1) if stop - start > 1 else np.zeros(bins + 1)
+    sampleEdges = np.clip(np.searchsorted(timeIndex, edges, side="left") - start, 0, max(stop - start, 0))
+    sampleEdges[-1] = max(stop - start, 0)
+    return sampleEdges, np.maximum(np.diff(edges), 1e-12)
+
+
+def runSweep(channels, timeIndex, grids, workers=None, progressCallback=None, cancelEvent=None, indexes=None, window=None):
+    """Evaluates the grids of peak finding settings on a process pool.
+
+    channels are channelViews of the channels to search (inverted where needed), grids
+    one sweepGrid array per channel (None to skip a channel). indexes may hold a
+    peakCandidateIndex per channel (or None) built on the same views, which is reused
+    when it covers the lowest threshold of the grid; the other channels are indexed
+    here, on all cores and one file of a session at a time. The columns of the indexes are copied once into shared memory,
+    which the workers attach to, so every task of TASK_SIZE grid points only queries
+    them. The workers stop at the next grid point once cancelEvent is set.
+
+    Returns per channel None (not swept) or a dict with the grid and the "events",
+    "removed" and "rateVariation" (std / mean of the event rate over RATE_BINS time
+    bins of timeIndex, or of its samples window=(start, stop)) arrays.
+    """
+    sampleEdges, binSeconds = rateBins(timeIndex, RATE_BINS, *(window or (0, None)))
+    results = [None if grid is None else {"grid": grid, "events": np.zeros(len(grid), dtype=np.int64),
+                                          "removed": np.zeros(len(grid), dtype=np.int64), "rateVariation": np.full(len(grid), np.nan)}
+               for grid in grids]
+    tasks = [(channel, start) for channel, grid in enumerate(grids) if grid is not None
+             for start in range(0, len(grid), TASK_SIZE)]
+    if not tasks:
+        return results
+    if indexes is None:
+        indexes = [None] * len(channels)
+
+    with stage("parameter sweep", rows=sum(len(grid) for grid in grids if grid is not None), operation=True):
+        swept = [channel for channel, grid in enumerate(grids) if grid is not None]
+        indexes = {channel: indexes[channel] for channel in swept
+                   if indexes[channel] is not None and indexes[channel].covers(grids[channel][:, 0].min())}
+        missing = [channel for channel in swept if channel not in indexes]
+        if missing:
+            built = buildViewIndexes([channels[channel] for channel in missing], [grids[channel][:, 0].min() for channel in missing],
+                                     workers=workers, cancelEvent=cancelEvent,
+                                     progressCallback=None if progressCallback is None else lambda percent: progressCallback(percent // 2))
+            indexes.update(zip(missing, built))
+        first = 50 if missing else 0
+
+        shared = {channel: {column: sharedArray(getattr(index, attribute)) for column, attribute in INDEX_COLUMNS.items()}
+                  for channel, index in indexes.items()}
+        shared["cancel"] = sharedArray(np.zeros(1, dtype=np.uint8))
+        specs = {key: value.spec if key == "cancel" else {column: array.spec for column, array in value.items()}
+                 for key, value in shared.items()}
+        try:
+            # Workers are spawned, forking a process running GUI threads is not safe
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_attachWorker, initargs=(specs, {channel: index.floor for channel, index in indexes.items()})) as executor:
+                futures = {executor.submit(_evaluate, channel, grids[channel][start:start+TASK_SIZE], sampleEdges, binSeconds): (channel, start)
+                           for channel, start in tasks}
+                pending, done = set(futures), 0
+                while pending:
+                    finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    if cancelEvent is not None and cancelEvent.is_set():
+                        shared["cancel"].array[0] = 1
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        raise peakSearchCancelled()
+                    for future in finished:
+                        channel, start = futures[future]
+                        for key, values in zip(["events", "removed", "rateVariation"], future.result()):
+                            results[channel][key][start:start+TASK_SIZE] = values
+                        done += 1
+                    if progressCallback is not None and finished:
+                        progressCallback(int(first + (100 - first) * done / len(tasks)))
+        finally:
+            for value in shared.values():
+                for array in ([value] if isinstance(value, sharedArray) else value.values()):
+                    array.close()
+    return results
+
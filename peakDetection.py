@@ -0,0 +1,494 @@
+import os, threading, warnings
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy
+from scipy.signal import find_peaks
+
+from instrumentation import stage
+
+# scipy releases the chunked search was checked against (major, minor), inclusive
+VALIDATED_SCIPY = ((1, 9), (1, 17))
+
+# The building blocks of find_peaks. They are private to scipy, but calling them in the
+# same order is what makes the chunked search return exactly the find_peaks result.
+# Without them every chunk runs the public find_peaks with CHUNK_OVERLAP samples of
+# context on both sides, which can differ from a whole channel search near the seams.
+try:
+    from scipy.signal._peak_finding import _arg_x_as_expected, _unpack_condition_args, _select_by_property
+    from scipy.signal._peak_finding_utils import _local_maxima_1d, _select_by_peak_distance, _peak_prominences, _peak_widths
+    EXACT_CHUNKS = True
+except ImportError:
+    EXACT_CHUNKS = False
+    print(f"[peakDetection] Warning: scipy {scipy.__version__} lacks the find_peaks internals, "
+          "chunked peak searches fall back to overlapping find_peaks calls.")
+
+_scipyVersion = tuple(int(part) for part in scipy.__version__.split(".")[:2] if part.isdigit())
+if EXACT_CHUNKS and not VALIDATED_SCIPY[0] <= _scipyVersion <= VALIDATED_SCIPY[1]:
+    warnings.warn(f"peakDetection: scipy {scipy.__version__} was not validated (validated "
+                  f"{VALIDATED_SCIPY[0]} to {VALIDATED_SCIPY[1]}), run pytest tests/test_peakDetection.py")
+
+# Samples per chunk of the parallel peak search and the initial look-ahead after a chunk
+DEFAULT_CHUNK_SIZE = 1 << 20
+CHUNK_OVERLAP = 1024
+
+
+def detectPeaks(values, height, width, distance, offset=0):
+    """find_peaks on values, returning the sorted left_ips cast to sample numbers.
+
+    The left side of a peak is the moment the particle enters the laser beam. offset is
+    added to map positions in a window back to sample numbers of the whole channel.
+    """
+    peaks, properties = find_peaks(values, height=height, width=width, distance=distance)
+    return np.sort(properties["left_ips"].astype(int) + offset)
+
+
+class peakSearchCancelled(Exception):
+    pass
+
+
+def _chunkMaxima(x, start, stop):
+    # Midpoints of the local maxima whose plateau starts in [start, stop). Whether a
+    # rising edge is a peak only depends on the plateau after it, so the chunk is read
+    # from start - 1 up to the first sample after a plateau still open at stop. The
+    # look-ahead is doubled until such a plateau is closed.
+    n = len(x)
+    first = max(start - 1, 0)
+    overlap = CHUNK_OVERLAP
+    last = min(stop + overlap, n)
+    while last < n:
+        tail = x[stop-1:last]
+        if not (tail == tail[-1]).all():
+            break
+        overlap *= 2
+        last = min(stop + overlap, n)
+    midpoints, leftEdges, _ = _local_maxima_1d(x[first:last])
+    leftEdges = leftEdges + first
+    return midpoints[(leftEdges >= start) & (leftEdges < stop)] + first
+
+
+def _selectByPeakDistance(peaks, priority, distance):
+    # Loop version of scipy's _select_by_peak_distance: the highest peaks first, removing
+    # every peak closer than distance to a kept one
+    keep = np.ones(len(peaks), dtype=bool)
+    distance = np.ceil(distance)
+    for j in np.argsort(priority)[::-1]:
+        if not keep[j]:
+            continue
+        k = j - 1
+        while k >= 0 and peaks[j] - peaks[k] < distance:
+            keep[k] = False
+            k -= 1
+        k = j + 1
+        while k < len(peaks) and peaks[k] - peaks[j] < distance:
+            keep[k] = False
+            k += 1
+    return keep
+
+
+if not EXACT_CHUNKS:
+    _select_by_peak_distance = _selectByPeakDistance
+
+
+def _chunkFindPeaks(x, start, stop, condition):
+    # find_peaks on [start, stop) with CHUNK_OVERLAP samples (at least twice the distance)
+    # of context on both sides, keeping the peaks inside the chunk
+    overlap = int(max(CHUNK_OVERLAP, 2 * (condition.get("distance") or 0)))
+    first, last = max(start - overlap, 0), min(stop + overlap, len(x))
+    peaks, properties = find_peaks(x[first:last], **condition)
+    inside = (peaks + first >= start) & (peaks + first < stop)
+    properties = {key: array[inside] + first if key in ("left_bases", "right_bases", "left_ips", "right_ips") else array[inside]
+                  for key, array in properties.items()}
+    return peaks[inside] + first, properties
+
+
+def findPeaksChannels(channels, conditions, chunkSize=DEFAULT_CHUNK_SIZE, workers=None, progressCallback=None,
+                      cancelEvent=None):
+    """find_peaks on several channels at once, split into chunks running on a thread pool.
+
+    conditions holds one dict of find_peaks arguments (height, width, distance) per
+    channel. Returns a list of (peaks, properties) identical to find_peaks(channel,
+    **condition). Local maxima are searched per chunk, the height and distance
+    conditions are applied to the whole peak list and prominences and widths are
+    computed for groups of peaks on the whole channel, so nothing depends on where the
+    chunks are cut. progressCallback(percent) and cancelEvent work as in
+    waveletEngine.filterChannels; a cancelled search raises peakSearchCancelled. Without
+    the scipy internals (EXACT_CHUNKS False) the chunks overlap instead and the result
+    can differ from find_peaks near the seams.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if cancelEvent is None:
+        cancelEvent = threading.Event()
+    if not EXACT_CHUNKS:
+        return _findPeaksChannelsApproximate(channels, conditions, chunkSize, workers, progressCallback, cancelEvent)
+    channels = [_arg_x_as_expected(values) for values in channels]
+    for condition in conditions:
+        if condition.get("distance") is not None and condition["distance"] < 1:
+            raise ValueError('`distance` must be greater or equal to 1')
+
+    def run(executor, tasks, first, last):
+        # Runs (function, arguments) tasks, reporting progress from first to last percent
+        results = []
+        for done, result in enumerate(executor.map(lambda task: None if cancelEvent.is_set() else task[0](*task[1]), tasks), 1):
+            if cancelEvent.is_set():
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise peakSearchCancelled()
+            results.append(result)
+            if progressCallback is not None:
+                progressCallback(int(first + (last - first) * done / len(tasks)))
+        return results
+
+    with stage("peak search", rows=sum(len(x) for x in channels)), ThreadPoolExecutor(max_workers=workers) as executor:
+        # Local maxima of every chunk of every channel
+        tasks = [(_chunkMaxima, (x, start, min(start + chunkSize, len(x))))
+                 for x in channels for start in range(0, len(x), chunkSize)]
+        chunks = iter(run(executor, tasks, 0, 40))
+        peakLists = [np.concatenate([next(chunks) for _ in range(0, len(x), chunkSize)] + [np.array([], dtype=np.intp)])
+                     for x in channels]
+
+        # Height and distance, in the order find_peaks applies them
+        properties = []
+        for i, (x, condition) in enumerate(zip(channels, conditions)):
+            peaks, props = peakLists[i], {}
+            if condition.get("height") is not None:
+                peakHeights = x[peaks]
+                hmin, hmax = _unpack_condition_args(condition["height"], x, peaks)
+                keep = _select_by_property(peakHeights, hmin, hmax)
+                peaks, props = peaks[keep], {"peak_heights": peakHeights[keep]}
+            peakLists[i] = peaks
+            properties.append(props)
+        tasks = [(_select_by_peak_distance, (peaks, x[peaks], condition["distance"]))
+                 for x, peaks, condition in zip(channels, peakLists, conditions) if condition.get("distance") is not None]
+        kept = iter(run(executor, tasks, 40, 50)) if tasks else iter(())
+        for i, condition in enumerate(conditions):
+            if condition.get("distance") is not None:
+                keep = next(kept)
+                peakLists[i] = peakLists[i][keep]
+                properties[i] = {key: array[keep] for key, array in properties[i].items()}
+
+        # Prominences and widths only depend on the peak itself, groups of peaks run in parallel
+        groups = []
+        for i, (x, peaks, condition) in enumerate(zip(channels, peakLists, conditions)):
+            if condition.get("width") is not None:
+                step = max(-(-len(peaks) // workers), 1)
+                groups.extend((i, peaks[j:j+step]) for j in range(0, max(len(peaks), 1), step))
+        tasks = [(_peakShape, (channels[i], group)) for i, group in groups]
+        shapes = run(executor, tasks, 50, 100) if tasks else []
+
+    results = []
+    for i, (x, condition) in enumerate(zip(channels, conditions)):
+        peaks, props = peakLists[i], properties[i]
+        parts = [shape for (group, _), shape in zip(groups, shapes) if group == i]
+        if parts:
+            names = ["prominences", "left_bases", "right_bases", "widths", "width_heights", "left_ips", "right_ips"]
+            props.update((name, np.concatenate([part[j] for part in parts])) for j, name in enumerate(names))
+            wmin, wmax = _unpack_condition_args(condition["width"], x, peaks)
+            keep = _select_by_property(props["widths"], wmin, wmax)
+            peaks = peaks[keep]
+            props = {key: array[keep] for key, array in props.items()}
+        results.append((peaks, props))
+    return results
+
+
+def _findPeaksChannelsApproximate(channels, conditions, chunkSize, workers, progressCallback, cancelEvent):
+    # findPeaksChannels with the public find_peaks only, one overlapping call per chunk
+    channels = [np.asarray(values) for values in channels]
+    tasks = [(x, start, min(start + chunkSize, len(x)), condition)
+             for x, condition in zip(channels, conditions) for start in range(0, len(x), chunkSize)]
+    results = []
+    with stage("peak search", rows=sum(len(x) for x in channels)), ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, result in enumerate(executor.map(lambda task: None if cancelEvent.is_set() else _chunkFindPeaks(*task), tasks), 1):
+            if cancelEvent.is_set():
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise peakSearchCancelled()
+            results.append(result)
+            if progressCallback is not None:
+                progressCallback(int(100 * done / len(tasks)))
+
+    output, parts = [], iter(results)
+    for x, condition in zip(channels, conditions):
+        chunks = [next(parts) for _ in range(0, len(x), chunkSize)] or [find_peaks(x, **condition)]
+        peaks = np.concatenate([chunk[0] for chunk in chunks]).astype(np.intp)
+        properties = {key: np.concatenate([chunk[1][key] for chunk in chunks]) for key in chunks[0][1]}
+        output.append((peaks, properties))
+    return output
+
+
+def _peakShape(x, peaks):
+    # Prominences and widths at half prominence, the find_peaks defaults (wlen=None, rel_height=0.5)
+    prominences, leftBases, rightBases = _peak_prominences(x, peaks, wlen=-1)
+    return (prominences, leftBases, rightBases) + tuple(_peak_widths(x, peaks, 0.5, prominences, leftBases, rightBases))
+
+
+class peakCandidateIndex:
+    """Every local maximum of a channel at or above floor with its find_peaks properties.
+
+    The prominence, width and left_ips of a peak do not depend on which other peaks
+    are selected, so find_peaks(x, height, width, distance) for any height >= floor is
+    this index masked by height, resolved for distance and masked by width, in that
+    order. The columns are sorted by peak position; offset is added to left_ips to get
+    sample numbers of the whole channel.
+    """
+    def __init__(self, peaks, properties, floor, offset=0):
+        self.peaks = peaks
+        self.heights = properties["peak_heights"]
+        self.prominences = properties["prominences"]
+        self.widths = properties["widths"]
+        self.leftIps = properties["left_ips"]
+        self.rightIps = properties["right_ips"]
+        self.floor = floor
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.peaks)
+
+    def covers(self, height):
+        return height >= self.floor
+
+    def select(self, height, width, distance):
+        # Positions in the index of the peaks find_peaks would return
+        if not self.covers(height):
+            raise ValueError(f"Height {height} is below the floor of the candidate index ({self.floor})")
+        selected = np.flatnonzero(self.heights >= height)
+        if distance is not None:
+            if distance < 1:
+                raise ValueError('`distance` must be greater or equal to 1')
+            selected = selected[_select_by_peak_distance(self.peaks[selected], self.heights[selected], distance)]
+        if width is not None:
+            selected = selected[self.widths[selected] >= width]
+        return selected
+
+    def peakTable(self, height, width, distance):
+        # Columns of the selected peaks ordered by sample number (left_ips), as exported
+        selected = self.select(height, width, distance)
+        samples = self.leftIps[selected].astype(int) + self.offset
+        order = np.argsort(samples, kind="stable")
+        selected = selected[order]
+        return {"sample": samples[order], "height": self.heights[selected],
+                "prominence": self.prominences[selected], "width": self.widths[selected],
+                "rightEdge": self.rightIps[selected] + self.offset}
+
+    def leftEdges(self, height, width, distance):
+        # Same result as detectPeaks(values, height, width, distance, offset), needs only
+        # the peaks, heights, widths and leftIps columns
+        return np.sort(self.leftIps[self.select(height, width, distance)].astype(int) + self.offset)
+
+
+def candidateFloor(values, height, samples=100000):
+    # Peaks below the channel median are noise, so the index starts at the median
+    # (estimated from a strided sample), or at the requested height if that is lower.
+    if len(values) == 0:
+        return height
+    return min(height, float(np.median(values[::max(len(values) // samples, 1)])))
+
+
+def buildCandidateIndexes(channels, floors, offsets=None, **kwargs):
+    """One peakCandidateIndex per channel, searched with findPeaksChannels (kwargs are passed on)."""
+    if offsets is None:
+        offsets = [0] * len(channels)
+    # width=0 keeps every peak but makes find_peaks compute the widths and left_ips
+    conditions = [{"height": floor, "width": 0.0} for floor in floors]
+    results = findPeaksChannels(channels, conditions, **kwargs)
+    return [peakCandidateIndex(peaks, properties, floor, offset)
+            for (peaks, properties), floor, offset in zip(results, floors, offsets)]
+
+
+def mergeCandidateIndexes(indexes, offset):
+    # One index of consecutive pieces of a channel, positions counted from offset
+    if len(indexes) == 1 and indexes[0].offset == offset:
+        return indexes[0]
+    shifts = [index.offset - offset for index in indexes]
+    properties = {"peak_heights": np.concatenate([index.heights for index in indexes]),
+                  "prominences": np.concatenate([index.prominences for index in indexes]),
+                  "widths": np.concatenate([index.widths for index in indexes]),
+                  "left_ips": np.concatenate([index.leftIps + shift for index, shift in zip(indexes, shifts)]),
+                  "right_ips": np.concatenate([index.rightIps + shift for index, shift in zip(indexes, shifts)])}
+    peaks = np.concatenate([index.peaks + shift for index, shift in zip(indexes, shifts)]).astype(np.intp)
+    return peakCandidateIndex(peaks, properties, indexes[0].floor, offset)
+
+
+def buildViewIndexes(views, heights, progressCallback=None, **kwargs):
+    """One peakCandidateIndex per channelView covering the given heights.
+
+    The views are searched piece by piece (channelView.pieces), so a session is read one
+    file at a time and never copied whole; the pieces of all views run together. The
+    candidates of the pieces are merged into one index per view, with prominences and
+    widths measured within each file. kwargs are passed on to findPeaksChannels.
+    """
+    with stage("candidate index", rows=sum(len(view) for view in views), operation=True):
+        floors = [candidateFloor(view.sample(100000), height) for view, height in zip(views, heights)]
+        pieces = [view.pieces() for view in views]
+        rounds = max(len(viewPieces) for viewPieces in pieces)
+        parts = [[] for _ in views]
+        for number in range(rounds):
+            members = [i for i, viewPieces in enumerate(pieces) if number < len(viewPieces)]
+            callback = None
+            if progressCallback is not None:
+                callback = lambda percent, number=number: progressCallback(int((100 * number + percent) / rounds))
+            built = buildCandidateIndexes([pieces[i][number].values for i in members], [floors[i] for i in members],
+                                          offsets=[pieces[i][number].start for i in members], progressCallback=callback, **kwargs)
+            for i, index in zip(members, built):
+                parts[i].append(index)
+        return [mergeCandidateIndexes(indexes, view.start) for indexes, view in zip(parts, views)]
+
+
+# Long chains of kept peaks inside one dense burst switch to pointer doubling after this many steps
+MAX_CLUSTER_ROUNDS = 32
+
+
+def _markChains(keep, jump, lead, starts, n):
+    # Marks every peak reachable from lead by jumps that stay inside the cluster. Each
+    # round doubles the chain length covered, so this takes O(n log n) instead of one
+    # Python step per kept peak.
+    clusterEnd = np.concatenate((starts[1:], [n]))
+    clusterEnd = np.repeat(clusterEnd, np.diff(np.concatenate((starts, [n]))))
+    step = np.full(n + 1, n)
+    first = starts[0]
+    step[first:n] = np.where(jump[first:] < clusterEnd, jump[first:], n)
+    reached = np.zeros(n + 1, dtype=bool)
+    reached[lead] = True
+    while True:
+        nodes = np.flatnonzero(reached[:n])
+        targets = step[nodes]
+        targets = targets[targets < n]
+        if len(targets) == 0 or reached[targets].all():
+            break
+        reached[targets] = True
+        step = step[step]
+    keep |= reached[:n]
+
+
+def leadingPeakMask(peaks, doublePeakDistance, leadingPeak=-1000000000):
+    """Leading-peak rule used by collapseDoublePeaks on sorted peak positions.
+
+    A peak is kept when it lies more than doublePeakDistance samples after the last kept
+    peak, otherwise it is removed. Returns (keep, leadingPeak) so that the scan can be
+    continued on later peaks.
+
+    The peaks are split into clusters at gaps larger than doublePeakDistance; the first
+    peak of a cluster is always kept. Inside the clusters the next kept peak is found by
+    a precomputed searchsorted jump (O(n log n)), advancing all clusters at once. Every
+    round is O(number of clusters); after MAX_CLUSTER_ROUNDS rounds the remaining chains
+    are marked by _markChains with pointer doubling, O(n log n). The Python loop thus
+    runs at most MAX_CLUSTER_ROUNDS plus log2(n) times.
+    """
+    peaks = np.asarray(peaks)
+    n = len(peaks)
+    keep = np.zeros(n, dtype=bool)
+    # Peaks within doublePeakDistance of the leading peak of a previous call are removed
+    first = np.searchsorted(peaks, leadingPeak + doublePeakDistance, side="right")
+    if first < n:
+        jump = np.searchsorted(peaks, peaks + doublePeakDistance, side="right")
+        starts = np.flatnonzero(np.diff(peaks[first:]) > doublePeakDistance) + first + 1
+        starts = np.concatenate(([first], starts))
+        ends = np.concatenate((starts[1:], [n]))
+        lead = starts
+        keep[lead] = True
+        rounds = 0
+        while len(lead) > 0 and rounds < MAX_CLUSTER_ROUNDS:
+            candidates = jump[lead]
+            inside = candidates < ends
+            lead = candidates[inside]
+            ends = ends[inside]
+            keep[lead] = True
+            rounds += 1
+        if len(lead) > 0:
+            _markChains(keep, jump, lead, starts, n)
+
+    kept = np.flatnonzero(keep)
+    if len(kept) > 0:
+        leadingPeak = peaks[kept[-1]]
+    return keep, leadingPeak
+
+
+def collapseLeadingPeaks(peaks, doublePeakDistance, leadingPeak=-1000000000):
+    # (filtered, removed, leadingPeak) split of leadingPeakMask
+    peaks = np.asarray(peaks)
+    keep, leadingPeak = leadingPeakMask(peaks, doublePeakDistance, leadingPeak)
+    return peaks[keep], peaks[~keep], leadingPeak
+
+
+def collapseLeadingPeaksLoop(peaks, doublePeakDistance, leadingPeak=-1000000000):
+    # Reference implementation, the per-peak loop collapseDoublePeaks used originally.
+    filtered = np.array([], dtype=int)
+    removed = np.array([], dtype=int)
+    for peak in peaks:
+        if (peak - leadingPeak) > doublePeakDistance:
+            filtered = np.append(filtered, peak)
+            leadingPeak = peak
+        else:
+            removed = np.append(removed, peak)
+    return filtered, removed, leadingPeak
+
+
+class growablePeaks:
+    # Preallocated sample numbers which grow by 1.5x, handed out as views.
+    def __init__(self, capacity=1024):
+        self.n = 0
+        self.values = np.zeros(max(int(capacity), 1024), dtype=int)
+
+    def append(self, values):
+        if self.n + len(values) > len(self.values):
+            grown = np.zeros(int((self.n + len(values)) * 1.5), dtype=int)
+            grown[:self.n] = self.values[:self.n]
+            self.values = grown
+        self.values[self.n:self.n+len(values)] = values
+        self.n += len(values)
+
+    def result(self):
+        return self.values[:self.n]
+
+
+class incrementalPeakFinder:
+    """Runs find_peaks on the newly appended samples of a growing channel.
+
+    Every update searches [processed - margin, length) and accepts the peaks whose
+    left_ips lie in [processed, length - margin). The last margin samples are held back
+    until more data arrives, so a peak cut by the end of the data is not reported early,
+    and the accepted ranges do not overlap, so the peaks stay sorted. Widths and
+    prominences can differ slightly from a whole-array search because they only see
+    margin samples of context.
+    """
+    def __init__(self, threshold, width, distance, doublePeakDistance, inverted=False, margin=None):
+        self.threshold = -threshold if inverted else threshold
+        self.width = width
+        self.distance = distance
+        self.doublePeakDistance = doublePeakDistance
+        self.inverted = inverted
+        if margin is None:
+            margin = int(max(1000, 20 * (width or 0), 2 * (distance or 0), 2 * doublePeakDistance))
+        self.margin = margin
+        self.processed = 0
+        self.leadingPeak = -1000000000
+        self.peaks = growablePeaks()
+        self.filtered = growablePeaks()
+        self.removed = growablePeaks()
+
+    def update(self, data):
+        stop = len(data) - self.margin
+        if stop <= self.processed:
+            return np.array([], dtype=int)
+        start = max(self.processed - self.margin, 0)
+        values = data[start:len(data)]
+        if self.inverted:
+            values = np.negative(values)
+        peaks, properties = find_peaks(values, height=self.threshold, width=self.width, distance=self.distance)
+
+        # Only peaks starting in the newly settled range are accepted
+        leftIps = properties["left_ips"].astype(int) + start
+        leftIps = np.sort(leftIps[(leftIps >= self.processed) & (leftIps < stop)])
+        filtered, removed, self.leadingPeak = collapseLeadingPeaks(leftIps, self.doublePeakDistance, self.leadingPeak)
+
+        self.peaks.append(leftIps)
+        self.filtered.append(filtered)
+        self.removed.append(removed)
+        self.processed = stop
+        return leftIps
+
+    def result(self):
+        # (peaks, filtered, removed) accumulated so far, views of the buffers
+        return self.peaks.result(), self.filtered.result(), self.removed.result()
+
+    def count(self):
+        return self.filtered.n
+
@@ -0,0 +1,51 @@
+import numpy as np
+import pyqtgraph as pg
+
+
+def visiblePeaks(peaks, start, stop):
+    # Peaks are sorted sample numbers, the visible ones (start <= peak <= stop) are a slice
+    first = np.searchsorted(peaks, start, side="left")
+    last = np.searchsorted(peaks, stop, side="right")
+    return peaks[first:last]
+
+
+def thinToPixels(x, x0, x1, pixels):
+    # Keeps at most one marker per pixel column; the dropped ones would be drawn on top
+    # of the kept ones anyway.
+    if len(x) <= pixels or x1 <= x0:
+        return x
+    column = ((x - x0) / (x1 - x0) * pixels).astype(np.int64)
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:] = column[1:] != column[:-1]
+    return x[keep]
+
+
+class peakMarkerLayer:
+    """All vertical peak markers of one plot and one kind drawn as a single item.
+
+    The markers are the segments of one PlotCurveItem (connect="pairs"), which is
+    created once and only gets new data on every redraw.
+    """
+    def __init__(self, plot, color):
+        self.plot = plot
+        self.item = pg.PlotCurveItem(pen=pg.mkPen(color=color), connect="pairs")
+        self.item.setZValue(-1)
+        plot.addItem(self.item, ignoreBounds=True)
+
+    def update(self, peaks, timeIndex, start, stop, yRange, pixels):
+        if peaks is None or len(peaks) == 0 or len(timeIndex) == 0:
+            self.clear()
+            return
+        peaks = visiblePeaks(peaks, start, stop)
+        peaks = peaks[peaks < len(timeIndex)]
+        x = timeIndex[peaks]
+        x0 = timeIndex[min(max(start, 0), len(timeIndex) - 1)]
+        x1 = timeIndex[min(max(stop, 0), len(timeIndex) - 1)]
+        x = thinToPixels(x, x0, x1, int(pixels))
+
+        y = np.empty(2 * len(x))
+        y[0::2], y[1::2] = yRange
+        self.item.setData(np.repeat(x, 2), y)
+
+    def clear(self):
+        self.item.setData([], [])
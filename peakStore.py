@@ -0,0 +1,129 @@
+import os, sys, json, time
+import numpy as np
+
+from daqCache import sourceSignature
+
+# Peak store layout: a directory with meta.json and one subdirectory per run holding a
+# .npy file per channel and column. Rows are sorted by time, so a time range is a
+# searchsorted slice of the memory mapped columns.
+MAGIC = "daqDataAnalyzer peaks"
+VERSION = 1
+META = "meta.json"
+COLUMNS = {"sample": np.int64, "time": np.float64, "height": np.float32, "prominence": np.float32,
+           "width": np.float32, "filtered": np.bool_, "coincidence": np.int8, "event": np.int64,
+           "area": np.float32, "interArrival": np.float64}
+# Value of a column which was not given, NaN for the others
+DEFAULTS = {"filtered": True, "coincidence": -1, "event": -1}
+
+
+def _readMeta(path):
+    with open(os.path.join(path, META)) as f_in:
+        meta = json.load(f_in)
+    if meta.get("magic") != MAGIC or meta.get("version") != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} peak store")
+    return meta
+
+
+def _writeMeta(path, meta):
+    tmpPath = os.path.join(path, META + ".tmp")
+    with open(tmpPath, "w") as f_out:
+        json.dump(meta, f_out, indent=1)
+    os.replace(tmpPath, os.path.join(path, META))
+
+
+def _fileName(channel, column):
+    return f"{channel.replace(' ', '').lower()}.{column}.npy"
+
+
+def appendRun(path, channels, timeIndex, parameters, inputFile=None, timeOrigin=0.0):
+    """Adds the peaks of one detection run to the store at path (created if missing).
+
+    channels maps a channel name to a dict of columns with at least "sample" (sorted
+    sample numbers); "height", "prominence", "width", "filtered", "coincidence" (the
+    coincidence.COINCIDENCE_GROUPS code), "event" (the number of the coincidence
+    event across the channels), "area" and "interArrival" (see eventFeatures.py) are
+    optional and filled with NaN / True / -1 when missing. Times are taken from
+    timeIndex and stored relative to timeOrigin like the loaded data. parameters (the detection settings)
+    and the source file signature go into the metadata. Returns the run number.
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, META)):
+        meta = _readMeta(path)
+    else:
+        meta = {"magic": MAGIC, "version": VERSION, "runs": []}
+
+    run = len(meta["runs"]) + 1
+    runDirectory = f"run-{run:04d}"
+    os.makedirs(os.path.join(path, runDirectory), exist_ok=True)
+    if isinstance(timeIndex, list):
+        timeIndex = np.asarray(timeIndex)
+    rows = {}
+    for channel, columns in channels.items():
+        samples = np.asarray(columns["sample"], dtype=np.int64)
+        for column, dtype in COLUMNS.items():
+            if column == "time":
+                # Only the times of the peaks are read, timeIndex may be a session (see captureSession.py)
+                values = timeIndex[samples] if len(samples) > 0 else np.array([], dtype=dtype)
+            elif column in columns:
+                values = columns[column]
+            else:
+                values = np.full(len(samples), DEFAULTS.get(column, np.nan))
+            np.save(os.path.join(path, runDirectory, _fileName(channel, column)), np.ascontiguousarray(values, dtype=dtype))
+        rows[channel] = len(samples)
+
+    meta["runs"].append({"run": run, "directory": runDirectory, "created": time.time(), "rows": rows,
+                         "parameters": parameters, "timeOrigin": timeOrigin,
+                         "sourceFile": os.path.abspath(inputFile) if inputFile else None,
+                         "source": sourceSignature(inputFile) if inputFile and os.path.exists(inputFile) else None})
+    # The metadata is written last, a run only exists once all its columns do
+    _writeMeta(path, meta)
+    return run
+
+
+class peakStore:
+    """Reader of a peak store. Columns are memory mapped, nothing is loaded up front."""
+    def __init__(self, path):
+        self.path = path
+        self.meta = _readMeta(path)
+
+    @property
+    def runs(self):
+        return self.meta["runs"]
+
+    def __len__(self):
+        return len(self.runs)
+
+    def _run(self, run):
+        # run is a run number, or a negative position like -1 for the latest run
+        return self.runs[run] if run < 0 else self.runs[run - 1]
+
+    def channels(self, run=-1):
+        return list(self._run(run)["rows"].keys())
+
+    def column(self, column, channel, run=-1):
+        entry = self._run(run)
+        path = os.path.join(self.path, entry["directory"], _fileName(channel, column))
+        if not os.path.exists(path) and column in COLUMNS:
+            # Runs saved before the column existed
+            return np.full(entry["rows"][channel], DEFAULTS.get(column, np.nan), dtype=COLUMNS[column])
+        return np.load(path, mmap_mode="r")
+
+    def query(self, channel, start=None, stop=None, run=-1, columns=None):
+        """Columns of the peaks with start <= time < stop (relative times), as arrays."""
+        times = self.column("time", channel, run)
+        first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        last = len(times) if stop is None else int(np.searchsorted(times, stop, side="left"))
+        return {column: np.array(self.column(column, channel, run)[first:last]) for column in (columns or COLUMNS)}
+
+
+if __name__ == "__main__":
+    # python peakStore.py <store> [start stop] lists the runs and the peaks per channel in a time range
+    if len(sys.argv) < 2:
+        print("Usage: python peakStore.py <store> [start stop]")
+        sys.exit(1)
+    store = peakStore(sys.argv[1])
+    start, stop = (float(sys.argv[2]), float(sys.argv[3])) if len(sys.argv) > 3 else (None, None)
+    for entry in store.runs:
+        counts = ", ".join(f"{channel}: {len(store.query(channel, start, stop, entry['run'], ['time'])['time'])}"
+                           for channel in entry["rows"])
+        print(f"[peakStore] Run {entry['run']} ({time.ctime(entry['created'])}, {entry['sourceFile']}): {counts}")
@@ -0,0 +1,86 @@
+import time
+from PyQt6.QtCore import QObject, QTimer
+
+# Default minimum time between two redraws of the same plot, about one 60 Hz frame
+DEFAULT_FRAME_BUDGET_MS = 16
+
+
+def sameState(a, b):
+    # States are tuples; arrays (and other objects) are compared by identity, so that
+    # replaced data always counts as a change without comparing its contents
+    if a is None or b is None or len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x is y:
+            continue
+        if hasattr(x, "__array__") or hasattr(y, "__array__") or x != y:
+            return False
+    return True
+
+
+class renderScheduler(QObject):
+    """Coalesces redraw requests into at most one redraw per target and frame.
+
+    A target is registered with a draw callback taking the list of its dirty parts
+    (for example the channels of the raw plot) and a state function returning a tuple
+    that describes what a part would show. Requests only mark parts dirty; the draw
+    runs from a timer at most once per frame budget, and parts whose state did not
+    change since they were last drawn are skipped unless the request was forced. A
+    state of None means there is nothing to draw.
+    """
+    def __init__(self, parent=None, frameBudget=DEFAULT_FRAME_BUDGET_MS):
+        super().__init__(parent)
+        self.frameBudget = frameBudget
+        self.targets = {}
+        self.dirty = {}
+        self.forced = set()
+        self.drawn = {}
+        self.lastFrame = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def register(self, name, draw, state, parts=(None,)):
+        self.targets[name] = (draw, state, list(parts))
+
+    def setFrameBudget(self, milliseconds):
+        self.frameBudget = max(int(milliseconds), 0)
+
+    def request(self, name, parts=None, force=False):
+        # parts=None marks every part of the target dirty
+        draw, state, allParts = self.targets[name]
+        parts = allParts if parts is None else parts
+        self.dirty.setdefault(name, set()).update(parts)
+        if force:
+            self.forced.update((name, part) for part in parts)
+        if not self.timer.isActive():
+            wait = self.frameBudget - (time.perf_counter() - self.lastFrame) * 1000
+            self.timer.start(max(int(wait), 0))
+
+    def invalidate(self, name=None):
+        # Forgets the drawn states, the next request redraws everything
+        for target in ([name] if name else list(self.targets)):
+            self.drawn.pop(target, None)
+
+    def flush(self):
+        """Draws all dirty parts now."""
+        self.timer.stop()
+        self.lastFrame = time.perf_counter()
+        dirty, self.dirty = self.dirty, {}
+        forced, self.forced = self.forced, set()
+        for name, parts in dirty.items():
+            draw, state, allParts = self.targets[name]
+            drawn = self.drawn.setdefault(name, {})
+            changed = []
+            for part in allParts:
+                if part not in parts:
+                    continue
+                current = state(part)
+                if current is None:
+                    # Nothing to show, e.g. no data loaded yet
+                    continue
+                if (name, part) in forced or not sameState(current, drawn.get(part)):
+                    changed.append(part)
+                    drawn[part] = current
+            if changed:
+                draw(changed)
@@ -0,0 +1,135 @@
+import os, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pywt
+
+from instrumentation import stage, logger
+
+# A scalogram tile holds TILE_SAMPLES columns of |cwt| over the SCALES (in samples of
+# its level, geometric from 2 to 256). Level L tiles are computed on the channel
+# decimated by 2**L (block means), so a view of any length needs only a few tiles.
+SCALOGRAM_WAVELET = "cmor1.5-1.0"
+TILE_SAMPLES = 2048
+SCALES = np.geomspace(2, 256, 48)
+READ_BLOCK = 1 << 22
+
+
+def tilePadding(wavelet=SCALOGRAM_WAVELET, scales=SCALES):
+    # Samples on both sides of a tile reaching the support of the widest wavelet
+    wavelet = pywt.ContinuousWavelet(wavelet)
+    return int(np.ceil(scales.max() * (wavelet.upper_bound - wavelet.lower_bound) / 2)) + 2
+
+
+def tileLevel(samples, pixels):
+    # Decimation level giving about one tile column per screen pixel
+    return max(int(np.ceil(np.log2(max(samples / max(pixels, 1), 1)))), 0)
+
+
+def decimate(data, start, stop, factor):
+    """Means of the blocks of factor samples of data[start:stop], read in blocks."""
+    blocks = (stop - start) // factor
+    out = np.empty(blocks, dtype=np.float32)
+    step = max(READ_BLOCK // factor, 1)
+    for first in range(0, blocks, step):
+        last = min(first + step, blocks)
+        chunk = np.asarray(data[start+first*factor:start+last*factor], dtype=np.float32)
+        out[first:last] = chunk.reshape(last - first, factor).mean(axis=1)
+    return out
+
+
+def computeTile(data, level, tile, wavelet=SCALOGRAM_WAVELET, scales=SCALES):
+    """|cwt| of tile number tile of level, shape (len(scales), TILE_SAMPLES).
+
+    The tile is computed with tilePadding() decimated samples of the channel on both
+    sides, so tiles put side by side equal the scalogram of the whole decimated
+    channel. Columns past the end of the channel are NaN.
+    """
+    factor = 1 << level
+    padding = tilePadding(wavelet, scales)
+    first = tile * TILE_SAMPLES
+    blocks = len(data) // factor
+    low, high = max(first - padding, 0), min(first + TILE_SAMPLES + padding, blocks)
+    values = decimate(data, low * factor, high * factor, factor)
+    out = np.full((len(scales), TILE_SAMPLES), np.nan, dtype=np.float32)
+    columns = min(TILE_SAMPLES, blocks - first)
+    if columns > 0:
+        coefs, _ = pywt.cwt(values - values.mean(), scales, wavelet, method="fft")
+        out[:, :columns] = np.abs(coefs[:, first-low:first-low+columns])
+    return out
+
+
+class tileCache:
+    """Memory capped LRU cache of scalogram tiles computed by background workers.
+
+    Keys are (channel, level, tile). request() returns the cached tiles right away and
+    queues the missing ones on a thread pool; tiles queued earlier and no longer asked
+    for are cancelled, so panning quickly does not build a backlog. callback() is called
+    from the worker thread after every stored tile. version counts the stored tiles.
+    """
+    def __init__(self, maxBytes=128 * 1024**2, workers=None, callback=None):
+        self.maxBytes = maxBytes
+        self.callback = callback
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = 0
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.generation = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+    def _compute(self, key, data, generation):
+        channel, level, tile = key
+        try:
+            with stage("scalogram tile", rows=TILE_SAMPLES << level, level=level):
+                value = computeTile(data, level, tile)
+        except Exception:
+            # The tile is requested again by the next redraw
+            logger.exception(f"[tileCache] Tile {key} failed.")
+            return
+        finally:
+            with self.lock:
+                if generation == self.generation:
+                    self.pending.pop(key, None)
+        with self.lock:
+            # Tiles of data loaded before the last clear() are dropped
+            if key in self.entries or generation != self.generation:
+                return
+            self.entries[key] = value
+            self.bytes += value.nbytes
+            self.version += 1
+            while self.bytes > self.maxBytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+        if self.callback is not None:
+            self.callback()
+
+    def request(self, keys, data, prefetch=()):
+        """Cached tiles of keys as a dict; missing keys, then prefetch keys, are queued."""
+        with self.lock:
+            wanted = set(keys) | set(prefetch)
+            for key in [key for key in self.pending if key not in wanted]:
+                if self.pending[key].cancel():
+                    del self.pending[key]
+            found = {}
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+            for key in list(keys) + list(prefetch):
+                if key not in self.entries and key not in self.pending:
+                    self.pending[key] = self.executor.submit(self._compute, key, data, self.generation)
+        return found
+
+    def clear(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.entries.clear()
+            self.pending.clear()
+            self.bytes = 0
+            self.generation += 1
+
+    def __str__(self):
+        return f"{len(self.entries)} tiles, {len(self.pending)} queued, {self.bytes / 1024**2:0.1f}/{self.maxBytes / 1024**2:0.0f} MB"
+
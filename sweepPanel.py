@@ -0,0 +1,179 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
+                             QProgressBar, QComboBox, QLabel, QHeaderView, QSplitter)
+from PyQt6.QtCore import Qt, pyqtSignal
+
+from channelStore import CHANNELS
+
+# Rows of the range table (the parameters of parameterSweep.PARAMETERS, same order)
+PARAMETER_LABELS = ["Threshold", "Peak width", "Peak distance", "Double peak distance"]
+METRICS = {"Events": "events", "Removed doubles": "removed", "Rate variation": "rateVariation"}
+RESULT_COLUMNS = ["Channel"] + PARAMETER_LABELS + list(METRICS)
+
+
+class parameterSweepDock(QDockWidget):
+    """Dock to sweep the peak finding settings over a grid (see parameterSweep.py).
+
+    The range table holds one column per channel; a cell is a single value or
+    start:stop:steps. The results are listed in a sortable table and shown as a heatmap
+    of one metric over two parameters, the other parameters fixed at the values of the
+    selected result. Double clicking a result applies its settings.
+    """
+    runRequested = pyqtSignal(object)
+    cancelRequested = pyqtSignal()
+    fillRequested = pyqtSignal()
+    applyRequested = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__("Parameter sweep", parent)
+        self.setObjectName("parameterSweepDock")
+        self.results = []
+
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        self.rangeTable = QTableWidget(len(PARAMETER_LABELS) + 1, len(CHANNELS))
+        self.rangeTable.setHorizontalHeaderLabels(CHANNELS)
+        self.rangeTable.setVerticalHeaderLabels(["Sweep"] + PARAMETER_LABELS)
+        self.rangeTable.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.rangeTable.setToolTip("A value or start:stop:steps per parameter and channel")
+        for column in range(len(CHANNELS)):
+            item = QTableWidgetItem("")
+            item.setFlags(Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.rangeTable.setItem(0, column, item)
+        layout.addWidget(self.rangeTable)
+
+        controls = QHBoxLayout()
+        fillButton = QPushButton("From settings")
+        fillButton.setToolTip("Fill the ranges with the current peak finding settings")
+        fillButton.clicked.connect(self.fillRequested.emit)
+        controls.addWidget(fillButton)
+        self.runButton = QPushButton("Run sweep")
+        self.runButton.clicked.connect(self.requestRun)
+        controls.addWidget(self.runButton)
+        cancelButton = QPushButton("Cancel")
+        cancelButton.clicked.connect(self.cancelRequested.emit)
+        controls.addWidget(cancelButton)
+        self.progressBar = QProgressBar()
+        controls.addWidget(self.progressBar)
+        layout.addLayout(controls)
+        self.statusLabel = QLabel("")
+        layout.addWidget(self.statusLabel)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.resultTable = QTableWidget(0, len(RESULT_COLUMNS))
+        self.resultTable.setHorizontalHeaderLabels(RESULT_COLUMNS)
+        self.resultTable.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.resultTable.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.resultTable.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.resultTable.setSortingEnabled(True)
+        self.resultTable.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        self.resultTable.itemSelectionChanged.connect(self.updateHeatmap)
+        self.resultTable.cellDoubleClicked.connect(self.applyRow)
+        splitter.addWidget(self.resultTable)
+
+        heatmap = QWidget()
+        heatmapLayout = QVBoxLayout(heatmap)
+        selectors = QHBoxLayout()
+        self.xCombo, self.yCombo, self.metricCombo = QComboBox(), QComboBox(), QComboBox()
+        self.xCombo.addItems(PARAMETER_LABELS)
+        self.yCombo.addItems(PARAMETER_LABELS)
+        self.yCombo.setCurrentIndex(3)
+        self.metricCombo.addItems(list(METRICS))
+        for label, combo in [("x", self.xCombo), ("y", self.yCombo), ("colour", self.metricCombo)]:
+            selectors.addWidget(QLabel(label))
+            selectors.addWidget(combo)
+            combo.currentIndexChanged.connect(self.updateHeatmap)
+        heatmapLayout.addLayout(selectors)
+        self.heatmapPlot = pg.PlotWidget()
+        self.heatmapImage = pg.ImageItem()
+        self.heatmapImage.setLookupTable(pg.colormap.get("viridis").getLookupTable())
+        self.heatmapPlot.addItem(self.heatmapImage)
+        heatmapLayout.addWidget(self.heatmapPlot)
+        self.heatmapLabel = QLabel("")
+        heatmapLayout.addWidget(self.heatmapLabel)
+        splitter.addWidget(heatmap)
+        layout.addWidget(splitter)
+        self.setWidget(widget)
+
+    def setRanges(self, values):
+        # values[channel][parameter] as text
+        for column, channelValues in enumerate(values):
+            for row, value in enumerate(channelValues, 1):
+                self.rangeTable.setItem(row, column, QTableWidgetItem(str(value)))
+
+    def requestRun(self):
+        # Per channel None (not swept) or the parameter texts
+        ranges = []
+        for column in range(len(CHANNELS)):
+            if self.rangeTable.item(0, column).checkState() != Qt.CheckState.Checked:
+                ranges.append(None)
+                continue
+            ranges.append([self.rangeTable.item(row, column).text() if self.rangeTable.item(row, column) else ""
+                           for row in range(1, len(PARAMETER_LABELS) + 1)])
+        self.runRequested.emit(ranges)
+
+    def setResults(self, results, seconds):
+        """results: per channel None or a runSweep result dict (thresholds as entered)."""
+        self.results = results
+        rows = sum(len(result["grid"]) for result in results if result is not None)
+        self.statusLabel.setText(f"{rows} settings evaluated in {seconds:0.1f} s")
+        self.resultTable.setSortingEnabled(False)
+        self.resultTable.setRowCount(rows)
+        row = 0
+        for number, result in enumerate(results):
+            if result is None:
+                continue
+            for point in range(len(result["grid"])):
+                values = [CHANNELS[number]] + list(result["grid"][point]) + [result[key][point] for key in METRICS.values()]
+                for column, value in enumerate(values):
+                    item = QTableWidgetItem()
+                    # Numbers are stored as numbers so that the columns sort numerically
+                    item.setData(Qt.ItemDataRole.DisplayRole, value if isinstance(value, str) else float(np.round(value, 6)))
+                    if column == 0:
+                        item.setData(Qt.ItemDataRole.UserRole, (number, point))
+                    self.resultTable.setItem(row, column, item)
+                row += 1
+        self.resultTable.setSortingEnabled(True)
+        if rows > 0:
+            self.resultTable.selectRow(0)
+
+    def selectedPoint(self):
+        rows = self.resultTable.selectionModel().selectedRows() if self.resultTable.selectionModel() else []
+        if not rows:
+            return None
+        return self.resultTable.item(rows[0].row(), 0).data(Qt.ItemDataRole.UserRole)
+
+    def applyRow(self, row, column):
+        number, point = self.resultTable.item(row, 0).data(Qt.ItemDataRole.UserRole)
+        self.applyRequested.emit(number, self.results[number]["grid"][point])
+
+    def updateHeatmap(self):
+        selected = self.selectedPoint()
+        if selected is None:
+            self.heatmapImage.clear()
+            return
+        number, point = selected
+        result = self.results[number]
+        grid = result["grid"]
+        x, y = self.xCombo.currentIndex(), self.yCombo.currentIndex()
+        values = result[METRICS[self.metricCombo.currentText()]].astype(np.float64)
+        # Grid points equal to the selected one in every other parameter
+        others = [column for column in range(grid.shape[1]) if column not in (x, y)]
+        mask = np.all(grid[:, others] == grid[point, others], axis=1)
+        xValues, yValues = np.unique(grid[mask, x]), np.unique(grid[mask, y])
+        image = np.full((len(xValues), len(yValues)), np.nan)
+        image[np.searchsorted(xValues, grid[mask, x]), np.searchsorted(yValues, grid[mask, y])] = values[mask]
+
+        finite = image[np.isfinite(image)]
+        levels = (finite.min(), finite.max()) if len(finite) > 0 else (0, 1)
+        self.heatmapImage.setImage(np.nan_to_num(image, nan=levels[0]), levels=levels if levels[1] > levels[0] else (levels[0], levels[0] + 1))
+        # Pixel centres on the parameter values
+        xStep = np.diff(xValues).min() if len(xValues) > 1 else 1.0
+        yStep = np.diff(yValues).min() if len(yValues) > 1 else 1.0
+        self.heatmapImage.setRect(xValues[0] - xStep / 2, yValues[0] - yStep / 2,
+                                  xValues[-1] - xValues[0] + xStep, yValues[-1] - yValues[0] + yStep)
+        self.heatmapPlot.setLabel("bottom", self.xCombo.currentText())
+        self.heatmapPlot.setLabel("left", self.yCombo.currentText())
+        self.heatmapLabel.setText(f"{CHANNELS[number]}, {self.metricCombo.currentText()} from {levels[0]:0.4g} (dark) to {levels[1]:0.4g} (yellow)")
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pytest
+
+import envelopePyramid
+from captureSession import loadSession, ROW_BYTES
+from channelStore import CHANNELS
+from peakDetection import buildViewIndexes, detectPeaks
+from daqCache import cacheSettings, evict
+
+# The files hold the timestamps to 1 ns
+ATOL = 1e-9
+
+ROWS = (5000, 12000, 7000)
+
+
+def writeFiles(directory):
+    # Synthetic files, each starting after a pause
+    rng = np.random.default_rng(0)
+    files, parts, channels = [], [], []
+    origin = 1000.0
+    for number, count in enumerate(ROWS):
+        timeIndex = origin + np.cumsum(rng.uniform(0.5e-5, 1.5e-5, count))
+        values = np.round(np.convolve(rng.normal(0, 1, (3, count)).ravel(), np.hanning(5), mode="same").reshape(3, count), 6)
+        path = directory / f"segment{number}.txt"
+        with open(path, "w") as f_out:
+            for row in range(count):
+                f_out.write(f"{timeIndex[row]:.9f}\t{values[0, row]:.6f}\t{values[1, row]:.6f}\t{values[2, row]:.6f}\n")
+        files.append(str(path))
+        parts.append(timeIndex)
+        channels.append(values.astype(np.float32))
+        origin = timeIndex[-1] + 0.01
+    return files, np.concatenate(parts) - parts[0][0], channels
+
+
+@pytest.fixture
+def session(tmp_path):
+    # Opened in reverse order with a budget of one segment
+    files, concatenated, _ = writeFiles(tmp_path)
+    settings = cacheSettings(str(tmp_path / "cache"))
+    store = loadSession(files[::-1], settings, memoryBudget=max(ROWS) * ROW_BYTES)
+    yield store, concatenated, settings
+    store.session.close()
+
+
+@pytest.fixture
+def tightSession(tmp_path):
+    # A budget far below one column, every whole column read has to go per file or in blocks
+    files, _, channels = writeFiles(tmp_path)
+    store = loadSession(files, cacheSettings(str(tmp_path / "cache")), memoryBudget=2000 * ROW_BYTES)
+    yield store, channels
+    store.session.close()
+
+
+def test_session_matches_concatenated_files(session):
+    store, concatenated, _ = session
+    timeIndex = store.timeIndex
+    rng = np.random.default_rng(1)
+    np.testing.assert_allclose(timeIndex[:], concatenated, atol=ATOL)
+    samples = rng.integers(0, len(concatenated), 1000)
+    np.testing.assert_allclose(timeIndex[samples], concatenated[samples], atol=ATOL)
+    for start, stop in [(0, 10), (4990, 5010), (100, 23999), (16990, 17010)]:
+        np.testing.assert_allclose(timeIndex[start:stop], concatenated[start:stop], atol=ATOL)
+    assert len(store.session.open) <= 1
+
+
+@pytest.mark.parametrize("side", ["left", "right"])
+def test_session_searchsorted(session, side):
+    store, concatenated, _ = session
+    times = np.random.default_rng(2).uniform(-0.01, concatenated[-1] + 0.01, 1000)
+    np.testing.assert_array_equal(np.searchsorted(store.timeIndex, times, side=side), np.searchsorted(concatenated, times, side=side))
+
+
+def test_open_session_sidecars_survive_eviction(session):
+    store, concatenated, settings = session
+    evict(cacheSettings(settings.directory, maxBytes=0))
+    assert all(os.path.exists(segment.sidecar) for segment in store.session.segments)
+    # Once closed the sidecars can go, the files are parsed again
+    store.session.close()
+    evict(cacheSettings(settings.directory, maxBytes=0))
+    np.testing.assert_allclose(store.timeIndex[:], concatenated, atol=ATOL)
+
+
+def test_large_copies_raise(tightSession):
+    store, channels = tightSession
+    with pytest.raises(MemoryError):
+        np.asarray(store.timeIndex)
+    with pytest.raises(MemoryError):
+        store.channel(CHANNELS[0])[:]
+    # Reads within a file or smaller than the budget still work
+    np.testing.assert_allclose(store.channel(CHANNELS[0])[ROWS[0]:ROWS[0] + ROWS[1]], channels[1][0])
+    np.testing.assert_allclose(store.channel(CHANNELS[0])[ROWS[0] - 10:ROWS[0] + 10], np.concatenate((channels[0][0][-10:], channels[1][0][:10])))
+
+
+@pytest.mark.parametrize("inverted", [False, True])
+def test_peak_search_runs_per_file(tightSession, inverted):
+    store, channels = tightSession
+    view = store.view(CHANNELS[1], 100, len(store) - 100, inverted=inverted)
+    pieces = view.pieces()
+    assert [(piece.start, piece.stop) for piece in pieces] == [(100, ROWS[0]), (ROWS[0], ROWS[0] + ROWS[1]), (ROWS[0] + ROWS[1], len(store) - 100)]
+    index, = buildViewIndexes([view], [0.5])
+    expected = np.concatenate([detectPeaks(piece.values, 0.5, 2, None, piece.start) for piece in pieces])
+    np.testing.assert_array_equal(index.leftEdges(0.5, 2, None), np.sort(expected))
+
+
+def test_filter_and_pyramid_read_in_blocks(tightSession, monkeypatch):
+    waveletEngine = pytest.importorskip("waveletEngine")
+    store, channels = tightSession
+    whole = np.concatenate([values[2] for values in channels])
+    output = store.allocate(CHANNELS[2], install=False)
+    waveletEngine.filterChannels([store.channel(CHANNELS[2])], [output], "db4", blockSize=4096, workers=2)
+    expected = np.empty_like(whole)
+    waveletEngine.filterChannels([whole], [expected], "db4", blockSize=4096, workers=2)
+    np.testing.assert_allclose(output, expected, atol=1e-5)
+
+    monkeypatch.setattr(envelopePyramid, "READ_BLOCK", 4096)
+    pyramid = store.pyramid(CHANNELS[2], layer="original")
+    np.testing.assert_array_equal(pyramid.mins[0], np.minimum.reduceat(whole, np.arange(0, len(whole), pyramid.factor)))
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from channelAlignment import estimateLag, alignChannels
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_known_lag_is_recovered(seed):
+    # Noisy peak trains, the shifted channel has the opposite peak direction
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(50000, 500000))
+    base = np.zeros(n + 20000)
+    base[rng.integers(0, len(base), n // 200)] = 1.0
+    base = np.convolve(base, np.hanning(9), mode="same")
+    lag = int(rng.integers(-5000, 5000))
+    reference = (base[10000:10000+n] + rng.normal(0, 0.05, n)).astype(np.float32)
+    signal = (-base[10000-lag:10000-lag+n] + rng.normal(0, 0.05, n)).astype(np.float32)
+    # signal[t + lag] matches reference[t]
+    estimated, _ = estimateLag(reference, signal, maxLag=10000)
+    assert estimated == lag
+
+
+def test_drift_is_tracked_per_segment():
+    # The second half is delayed by 30 more samples
+    rng = np.random.default_rng(0)
+    n = 2000000
+    base = np.zeros(n + 200)
+    base[rng.integers(0, len(base), n // 200)] = 1.0
+    reference = base[100:100+n].astype(np.float32)
+    signal = np.concatenate((base[100-20:100-20+n//2], base[100-50+n//2:100-50+n])).astype(np.float32)
+    model, = alignChannels([reference, signal], segmentSamples=n // 2)[1:]
+    assert list(model.lags) == [20, 50]
@@ -0,0 +1,34 @@
+import numpy as np
+
+import channelStore
+from channelStore import loadStore
+from daqCache import cacheSettings, writeSidecar
+
+
+def writeLines(path, times, mode="w"):
+    with open(path, mode) as f_out:
+        for t in times:
+            f_out.write(f"{t:.6f}\t0.1\t0.2\t0.3\n")
+
+
+def test_load_store_survives_append_after_sidecar_write(tmp_path, monkeypatch):
+    # The acquisition appends to the file right after its sidecar was written
+    source = tmp_path / "capture.txt"
+    writeLines(source, 1.0 + np.arange(100) * 1e-4)
+
+    def writeThenAppend(inputFile, *args, **kwargs):
+        mapped = writeSidecar(inputFile, *args, **kwargs)
+        writeLines(inputFile, 2.0 + np.arange(10) * 1e-4, mode="a")
+        return mapped
+    monkeypatch.setattr(channelStore, "writeSidecar", writeThenAppend)
+
+    settings = cacheSettings(str(tmp_path / "cache"))
+    store = loadStore(str(source), settings)
+    assert isinstance(store.timeIndex, np.memmap)
+    assert len(store.timeIndex) == 100
+    np.testing.assert_allclose(store.timeIndex[-1], 99e-4)
+
+    # The grown file is parsed again on the next load
+    monkeypatch.undo()
+    store = loadStore(str(source), settings)
+    assert len(store.timeIndex) == 110
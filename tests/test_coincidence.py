@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from coincidence import nearestMatches
+
+
+def bruteForceMatches(a, b, tolerance):
+    # Mutual nearest neighbours within the tolerance, the lower one on ties
+    expected = []
+    for i, x in enumerate(a):
+        if len(b) == 0:
+            break
+        j = int(np.argmin(np.abs(b - x)))
+        if abs(b[j] - x) <= tolerance and int(np.argmin(np.abs(a - b[j]))) == i:
+            expected.append((i, j))
+    return expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_nearest_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    for trial in range(50):
+        # Peaks of one channel are distinct samples
+        a = np.unique(rng.integers(0, 2000, int(rng.integers(0, 200))))
+        b = np.unique(rng.integers(0, 2000, int(rng.integers(0, 200))))
+        tolerance = int(rng.choice([0, 3, 10, 50]))
+        result = list(zip(*(indices.tolist() for indices in nearestMatches(a, b, tolerance))))
+        assert result == bruteForceMatches(a, b, tolerance)
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+
+from daqCache import cacheSettings, writeSidecar, loadSidecar, sidecarPath, evict, HEADER_SIZE
+
+
+def writeSource(path, text="1.0\t0.1\t0.2\t0.3\n"):
+    with open(path, "w") as f_out:
+        f_out.write(text)
+    return os.path.getsize(path)
+
+
+def arrays(rows=100):
+    return np.arange(rows, dtype=np.float64), *(np.full(rows, value, dtype=np.float32) for value in (1, 2, 3))
+
+
+def test_sidecar_round_trip(tmp_path):
+    source = tmp_path / "capture.txt"
+    size = writeSource(source)
+    settings = cacheSettings(str(tmp_path / "cache"))
+    runs = [[i * 10, i * 10 + 5] for i in range(500)]
+    mapped = writeSidecar(str(source), settings, *arrays(), sourceBytes=size, reordered=runs)
+    assert all(isinstance(array, np.memmap) for array in mapped)
+    (timeIndex, ch1, ch2, ch3), header = loadSidecar(str(source), settings)
+    np.testing.assert_array_equal(timeIndex, arrays()[0])
+    np.testing.assert_array_equal(ch3, arrays()[3])
+    assert header["reordered"] == runs
+
+
+def test_sidecar_of_a_prefix_is_rejected(tmp_path):
+    # Written from a prefix of the file, then matched again in size and mtime
+    source = tmp_path / "capture.txt"
+    size = writeSource(source)
+    settings = cacheSettings(str(tmp_path / "cache"))
+    assert writeSidecar(str(source), settings, *arrays(), sourceBytes=size - 4) is None
+    assert not os.path.exists(sidecarPath(str(source), settings))
+    assert loadSidecar(str(source), settings) is None
+
+
+def test_changed_source_is_stale(tmp_path):
+    source = tmp_path / "capture.txt"
+    size = writeSource(source)
+    settings = cacheSettings(str(tmp_path / "cache"))
+    writeSidecar(str(source), settings, *arrays(), sourceBytes=size)
+    writeSource(source, "1.0\t0.1\t0.2\t0.3\n2.0\t0.1\t0.2\t0.3\n")
+    assert loadSidecar(str(source), settings) is None
+    assert not os.path.exists(sidecarPath(str(source), settings))
+
+
+def test_evict_keeps_the_newest_sidecar(tmp_path):
+    settings = cacheSettings(str(tmp_path / "cache"), maxBytes=HEADER_SIZE + 100 * 20 + 1)
+    paths = []
+    for number in range(3):
+        source = tmp_path / f"capture{number}.txt"
+        writeSidecar(str(source), settings, *arrays(), sourceBytes=writeSource(source))
+        paths.append(sidecarPath(str(source), settings))
+    evict(settings)
+    assert [os.path.exists(path) for path in paths] == [False, False, True]
@@ -0,0 +1,50 @@
+import threading
+import numpy as np
+
+from daqTail import daqTail, writeSyntheticLines
+
+
+def fileTimes(path):
+    return np.loadtxt(path, usecols=0, ndmin=1)
+
+
+def test_poll_delivers_every_line_once_while_written(tmp_path):
+    # Small reads cut the lines the writer appends at arbitrary positions
+    path = tmp_path / "live.txt"
+    path.touch()
+    writer = threading.Thread(target=writeSyntheticLines, args=(str(path),),
+                              kwargs={"rate": 20000, "duration": 1.0, "batch": 0.05})
+    writer.start()
+    tail = daqTail(str(path))
+    parts = []
+    while writer.is_alive():
+        parts.append(tail.poll(maxBytes=997)[0])
+    writer.join()
+    while True:
+        timeIndex = tail.poll(maxBytes=997)[0]
+        if len(timeIndex) == 0 and tail.offset == path.stat().st_size:
+            break
+        parts.append(timeIndex)
+    tail.close()
+    times = np.concatenate(parts)
+    assert len(times) > 0
+    np.testing.assert_allclose(times, fileTimes(path), rtol=0, atol=1e-6)
+    assert tail.remainder == b""
+
+
+def test_partial_line_is_held_back(tmp_path):
+    path = tmp_path / "live.txt"
+    line = "100.000100 0.1 0.2 0.3\n"
+    path.write_text(line)
+    tail = daqTail(str(path), timeOrigin=100.0)
+    np.testing.assert_allclose(tail.poll()[0], [0.0001])
+    with open(path, "a") as f_out:
+        f_out.write("100.000200 0.1 0.")
+    assert len(tail.poll()[0]) == 0
+    with open(path, "a") as f_out:
+        f_out.write("2 0.3\n100.000300 0.1 0.2 0.3\n")
+    timeIndex, ch1, ch2, ch3 = tail.poll()
+    np.testing.assert_allclose(timeIndex, [0.0002, 0.0003])
+    np.testing.assert_allclose(ch2, [0.2, 0.2])
+    assert tail.offset == path.stat().st_size
+    tail.close()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import eventFeatures
+from eventFeatures import peakAreas, eventFeatures as features, slidingRate
+
+
+def randomPeaks(rng, n):
+    peaks = int(rng.integers(0, 200))
+    left = np.sort(rng.integers(0, n - 1, peaks))
+    right = np.minimum(left + rng.integers(1, 50, peaks), n)
+    return left, right, rng.normal(0, 1, peaks)
+
+
+@pytest.mark.parametrize("blocked", [False, True])
+def test_peak_areas_match_loop(blocked, monkeypatch):
+    if blocked:
+        # Peaks spread over several read blocks
+        monkeypatch.setattr(eventFeatures, "READ_BLOCK", 1024)
+    rng = np.random.default_rng(0)
+    for trial in range(50):
+        n = int(rng.integers(10, 5000))
+        values = rng.normal(0, 1, n).astype(np.float32)
+        left, right, base = randomPeaks(rng, n)
+        inverted = bool(rng.integers(0, 2))
+        sign = -1.0 if inverted else 1.0
+        expected = [np.sum(sign * values[a:b].astype(np.float64)) - c * (b - a) for a, b, c in zip(left, right, base)]
+        np.testing.assert_allclose(peakAreas(values, left, right, base, inverted), expected, atol=1e-6)
+
+
+def test_inter_arrival_times_match_loop():
+    rng = np.random.default_rng(1)
+    for trial in range(50):
+        n = int(rng.integers(10, 5000))
+        values = rng.normal(0, 1, n).astype(np.float32)
+        left, right, base = randomPeaks(rng, n)
+        peaks = len(left)
+        timeIndex = np.cumsum(rng.uniform(0.5, 1.5, n))
+        final = rng.integers(0, 2, peaks).astype(bool)
+        table = {"sample": left, "rightEdge": right - 0.5, "height": base + 1, "prominence": np.ones(peaks), "width": right - left}
+        previous, expected = None, np.full(peaks, np.nan)
+        for number in range(peaks):
+            if final[number]:
+                if previous is not None:
+                    expected[number] = timeIndex[left[number]] - timeIndex[left[previous]]
+                previous = number
+        np.testing.assert_allclose(features(values, table, timeIndex, final)["interArrival"], expected, equal_nan=True)
+
+
+def test_sliding_rate_matches_counting():
+    times = np.sort(np.random.default_rng(2).uniform(0, 100, 10000))
+    centres, rates = slidingRate(times, 10.0, 5.0, 0.0, 100.0)
+    expected = [np.sum((times >= centre - 5) & (times < centre + 5)) / 10.0 for centre in centres]
+    np.testing.assert_allclose(rates, expected)
@@ -0,0 +1,35 @@
+import os
+
+from instrumentation import instrumentation
+
+
+def test_profile_next_skips_redraws_and_nested_stages(tmp_path):
+    instruments = instrumentation(profileDirectory=str(tmp_path))
+    instruments.profileNext = True
+    with instruments.stage("raw redraw"):
+        pass
+    with instruments.stage("load", operation=True) as outer:
+        # Operations nested in another stage are part of it
+        with instruments.stage("peak search", operation=True) as inner:
+            pass
+    assert inner.profile is None
+    assert outer.profile is not None and os.path.exists(outer.profile)
+    assert not instruments.profileNext
+    assert [record.profile is not None for record in instruments.records] == [False, False, True]
+
+
+def test_instrumented_operation_is_profiled(tmp_path):
+    instruments = instrumentation(profileDirectory=str(tmp_path))
+
+    @instruments.instrumented("wavelet redraw")
+    def redraw():
+        pass
+
+    @instruments.instrumented("peak retune", operation=True)
+    def retune():
+        pass
+
+    instruments.profileNext = True
+    redraw()
+    retune()
+    assert [record.name for record in instruments.records if record.profile is not None] == ["peak retune"]
@@ -0,0 +1,68 @@
+import threading
+import numpy as np
+import pytest
+
+from channelStore import channelView
+from parameterSweep import parseRange, sweepGrid, runSweep
+from peakDetection import detectPeaks, leadingPeakMask, buildCandidateIndexes, candidateFloor, peakSearchCancelled
+
+
+@pytest.fixture(scope="module")
+def signal():
+    rng = np.random.default_rng(0)
+    n = 50000
+    timeIndex = np.cumsum(rng.uniform(0.9e-5, 1.1e-5, n))
+    values = np.convolve(rng.normal(0, 1, n), np.hanning(7), mode="same").astype(np.float32)
+    return timeIndex, values
+
+
+def wholeChannel(timeIndex, values):
+    return channelView(timeIndex, values, 0, len(values))
+
+
+def smallGrid():
+    return sweepGrid({"height": parseRange("0.5:2:3"), "width": parseRange("0:3:2"), "distance": parseRange("1:20:2"),
+                      "doublePeakDistance": parseRange("0:5:2")})
+
+
+def assertMatchesPeakSearch(result, values, grid):
+    # Same counts as a detectPeaks and leadingPeakMask run per grid point
+    for number, (height, width, distance, doublePeakDistance) in enumerate(grid):
+        samples = detectPeaks(values, height, width, distance)
+        keep, _ = leadingPeakMask(samples, doublePeakDistance*10)
+        assert result["events"][number] == keep.sum()
+        assert result["removed"][number] == len(samples) - keep.sum()
+
+
+def test_sweep_matches_peak_search(signal):
+    timeIndex, values = signal
+    grid = smallGrid()
+    result, skipped = runSweep([wholeChannel(timeIndex, values)] * 2, timeIndex, [grid, None], workers=2)
+    assert skipped is None
+    assertMatchesPeakSearch(result, values, grid)
+    assert np.all(np.isfinite(result["rateVariation"][result["events"] > 0]))
+
+
+def test_sweep_reuses_a_covering_index(signal):
+    timeIndex, values = signal
+    grid = smallGrid()
+    index, = buildCandidateIndexes([values], [candidateFloor(values, grid[:, 0].min())], workers=1)
+    result, = runSweep([wholeChannel(timeIndex, values)], timeIndex, [grid], workers=1, indexes=[index])
+    assertMatchesPeakSearch(result, values, grid)
+
+
+def test_cancelled_sweep_raises(signal):
+    timeIndex, values = signal
+    cancelEvent = threading.Event()
+    cancelEvent.set()
+    with pytest.raises(peakSearchCancelled):
+        runSweep([wholeChannel(timeIndex, values)], timeIndex, [smallGrid()], workers=1, cancelEvent=cancelEvent)
+
+
+def test_sweep_of_a_window(signal):
+    # Rate bins and indexes cover the samples of the window only
+    timeIndex, values = signal
+    grid = smallGrid()
+    view = channelView(timeIndex, values, 10000, 30000)
+    result, = runSweep([view], timeIndex, [grid], workers=1, window=(10000, 30000))
+    assertMatchesPeakSearch(result, values[10000:30000], grid)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from scipy.signal import find_peaks
+
+import peakDetection
+from peakDetection import (findPeaksChannels, buildCandidateIndexes, candidateFloor, detectPeaks, collapseLeadingPeaks,
+                           collapseLeadingPeaksLoop, incrementalPeakFinder, _selectByPeakDistance)
+
+
+def randomSignal(rng, n, plateaus=True):
+    # Noise with peaks, quantized stretches (plateaus) and sometimes a long constant run
+    signal = rng.normal(0, 0.1, n)
+    signal[rng.random(n) < 0.01] += 1.0
+    if plateaus:
+        quantized = rng.random(n) < 0.2
+        signal[quantized] = np.round(signal[quantized], 1)
+        start = int(rng.integers(0, n))
+        signal[start:start+int(rng.integers(0, 5000))] = 0.5
+    return signal.astype(np.float32)
+
+
+def pulseTrain(rng, n, pulses):
+    # Isolated pulses on a flat baseline, every peak's bases lie within its pulse
+    signal = np.zeros(n, dtype=np.float32)
+    shape = np.hanning(21).astype(np.float32)
+    for position in rng.choice(np.arange(0, n - len(shape), 40), pulses, replace=False):
+        signal[position:position+len(shape)] += shape * rng.uniform(0.2, 2.0)
+    return signal
+
+
+@pytest.mark.skipif(not peakDetection.EXACT_CHUNKS, reason="scipy find_peaks internals not available")
+@pytest.mark.parametrize("seed", range(40))
+def test_chunked_search_matches_find_peaks(seed):
+    rng = np.random.default_rng(seed)
+    signal = randomSignal(rng, int(rng.integers(1, 20000)), plateaus=seed % 2 == 0)
+    condition = {"height": float(rng.choice([0.0, 0.3, -1.0])), "width": [0.0, 1.0, 3.0, None][seed % 4],
+                 "distance": float(rng.choice([1.0, 5.0, 50.0]))}
+    chunkSize = int(rng.choice([1, 7, 100, 1024, 5000]))
+    (peaks, properties), = findPeaksChannels([signal], [condition], chunkSize=chunkSize, workers=4)
+    expectedPeaks, expectedProperties = find_peaks(signal, **condition)
+    np.testing.assert_array_equal(peaks, expectedPeaks)
+    assert properties.keys() == expectedProperties.keys()
+    for key, values in expectedProperties.items():
+        np.testing.assert_array_equal(properties[key], values, err_msg=key)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_candidate_index_matches_find_peaks(seed):
+    rng = np.random.default_rng(seed)
+    signal = randomSignal(rng, int(rng.integers(1, 20000)), plateaus=False)
+    index, = buildCandidateIndexes([signal], [candidateFloor(signal, 0.0)], chunkSize=4096, workers=2)
+    for query in range(10):
+        height, width, distance = float(rng.uniform(index.floor, 1.5)), float(rng.choice([0.0, 1.0, 2.5])), float(rng.choice([1.0, 3.0, 40.0]))
+        np.testing.assert_array_equal(index.leftEdges(height, width, distance), detectPeaks(signal, height, width, distance))
+
+
+@pytest.mark.skipif(not peakDetection.EXACT_CHUNKS, reason="scipy find_peaks internals not available")
+@pytest.mark.parametrize("seed", range(20))
+def test_distance_selection_fallback(seed):
+    # The loop used without the internals against scipy's own selection, ties included
+    rng = np.random.default_rng(seed)
+    peaks = np.sort(rng.choice(100000, int(rng.integers(0, 2000)), replace=False)).astype(np.intp)
+    heights = np.round(rng.random(len(peaks)), 2)
+    distance = float(rng.choice([1.0, 4.5, 30.0, 500.0]))
+    expected = peakDetection._select_by_peak_distance(peaks, heights, distance).astype(bool)
+    np.testing.assert_array_equal(_selectByPeakDistance(peaks, heights, distance), expected)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_approximate_chunks_match_find_peaks_on_pulses(monkeypatch, seed):
+    # Without the internals the overlapping chunks find the same isolated pulses
+    monkeypatch.setattr(peakDetection, "EXACT_CHUNKS", False)
+    rng = np.random.default_rng(seed)
+    signal = pulseTrain(rng, 50000, 300)
+    condition = {"height": 0.5, "width": 2.0, "distance": 20.0}
+    (peaks, properties), = findPeaksChannels([signal], [condition], chunkSize=int(rng.choice([997, 4096])), workers=4)
+    expectedPeaks, expectedProperties = find_peaks(signal, **condition)
+    np.testing.assert_array_equal(peaks, expectedPeaks)
+    for key, values in expectedProperties.items():
+        np.testing.assert_allclose(properties[key], values, err_msg=key)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_collapse_matches_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 2000))
+    if seed % 4 == 0:
+        # Dense burst, long chains of kept peaks inside one cluster
+        gaps = rng.integers(0, 4, n)
+    else:
+        gaps = np.where(rng.random(n) < 0.3, rng.integers(0, 20, n), rng.integers(0, 500, n))
+    peaks = np.cumsum(gaps) + int(rng.integers(0, 100))
+    distance = float(rng.choice([0, 5, 10, 15.5, 50, 1000]))
+    leadingPeak = int(rng.choice([-1000000000, int(rng.integers(0, 200))]))
+    expected = collapseLeadingPeaksLoop(peaks, distance, leadingPeak)
+    result = collapseLeadingPeaks(peaks, distance, leadingPeak)
+    np.testing.assert_array_equal(result[0], expected[0])
+    np.testing.assert_array_equal(result[1], expected[1])
+    assert result[2] == expected[2]
+
+
+def test_incremental_peaks_sorted_and_complete():
+    rng = np.random.default_rng(1)
+    signal = np.convolve(rng.normal(0, 0.1, 200000) + (rng.random(200000) < 0.003), np.hanning(9), "same").astype(np.float32)
+    finder = incrementalPeakFinder(0.5, 1, 5, 50)
+    for length in range(5000, len(signal) + 1, 3777):
+        finder.update(signal[:length])
+    peaks, filtered, removed = finder.result()
+    assert np.all(np.diff(peaks) >= 0)
+    assert len(filtered) + len(removed) == len(peaks) == finder.count() + len(removed)
+    expected = detectPeaks(signal[:finder.processed], 0.5, 1, 5)
+    assert len(np.intersect1d(peaks, expected)) >= 0.99 * len(expected)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+pywt = pytest.importorskip("pywt")
+
+from scalogram import SCALES, SCALOGRAM_WAVELET, TILE_SAMPLES, tilePadding, decimate, computeTile
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    n = 5 * TILE_SAMPLES + 1234
+    return np.convolve(rng.normal(0, 1, 4 * n), np.hanning(15), mode="same").astype(np.float32)
+
+
+@pytest.mark.parametrize("level", [0, 2])
+def test_stitched_tiles_match_whole_scalogram(data, level):
+    values = decimate(data, 0, len(data), 1 << level)
+    expected, _ = pywt.cwt(values - values.mean(), SCALES, SCALOGRAM_WAVELET, method="fft")
+    tiles = -(-len(values) // TILE_SAMPLES)
+    stitched = np.concatenate([computeTile(data, level, tile) for tile in range(tiles)], axis=1)[:, :len(values)]
+    # Tiles remove their own mean, which only matters where the wavelet reaches the data ends
+    inner = slice(tilePadding(), len(values) - tilePadding())
+    error = np.abs(stitched[:, inner] - np.abs(expected[:, inner])).max() / np.abs(expected).max()
+    assert error < 1e-3
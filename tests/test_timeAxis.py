@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from timeAxis import timeAxis, sortRuns, KINDS, GAP, RATE_CHANGE, DUPLICATES, OUT_OF_ORDER, FILE_BOUNDARY, READ_BLOCK
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_sort_runs_matches_argsort(seed):
+    # Almost sorted indexes with swaps, late rows and ties
+    rng = np.random.default_rng(seed)
+    for trial in range(50):
+        n = int(rng.integers(1, 5000))
+        timeIndex = np.round(np.cumsum(rng.uniform(0, 1, n)), int(rng.integers(0, 3)))
+        for _ in range(int(rng.integers(0, 5))):
+            i, j = rng.integers(0, n, 2)
+            timeIndex[[i, j]] = timeIndex[[j, i]]
+        order, runs = sortRuns(timeIndex)
+        if order is None:
+            order = np.arange(n)
+        np.testing.assert_array_equal(order, np.argsort(timeIndex, kind="stable"))
+        # Rows outside the runs stay where they are
+        outside = np.ones(n, dtype=bool)
+        for start, stop in runs:
+            outside[start:stop] = False
+        np.testing.assert_array_equal(order[outside], np.flatnonzero(outside))
+
+
+def syntheticIndex(seed=0):
+    # Known gaps, a rate change in the middle and duplicates, one at a read block boundary
+    rng = np.random.default_rng(seed)
+    n = 3 * READ_BLOCK // 2
+    intervals = np.where(np.arange(n - 1) < n // 2, 1e-5, 2e-5) * (1 + rng.normal(0, 0.001, n - 1))
+    gapSamples = np.sort(rng.choice(np.arange(1000, n - 1000), 20, replace=False))
+    intervals[gapSamples - 1] *= 50
+    duplicateSamples = np.array([12345, READ_BLOCK, n - 10])
+    intervals[duplicateSamples - 1] = 0
+    return np.concatenate(([0.0], np.cumsum(intervals))), gapSamples, duplicateSamples
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    timeIndex, gapSamples, duplicateSamples = syntheticIndex()
+    return timeAxis(timeIndex, reordered=[[500, 520]], boundaries=[(700000, "second.txt")]), gapSamples, duplicateSamples
+
+
+def test_irregularities_are_found(synthetic):
+    axis, gapSamples, duplicateSamples = synthetic
+    n = len(axis)
+    np.testing.assert_array_equal(axis.gaps[0], gapSamples)
+    assert len(axis.segments) == 2 and abs(int(axis.segments[1, 0]) - n // 2) <= 1
+    np.testing.assert_array_equal(axis.duplicates[:, 0], duplicateSamples - 1)
+
+
+def test_sample_at_matches_searchsorted(synthetic):
+    axis = synthetic[0]
+    samples = np.random.default_rng(1).integers(0, len(axis), 1000)
+    np.testing.assert_array_equal(axis.sampleAt(axis.timeIndex[samples]), np.searchsorted(axis.timeIndex, axis.timeIndex[samples]))
+
+
+def test_events_are_ordered_by_sample(synthetic):
+    axis, gapSamples, duplicateSamples = synthetic
+    samples, kinds, positions = axis.events()
+    assert np.all(np.diff(samples) >= 0)
+    assert len(samples) == len(gapSamples) + 1 + len(duplicateSamples) + 2
+    counts = {KINDS[kind]: count for kind, count in zip(*np.unique(kinds, return_counts=True))}
+    assert counts == {GAP: 20, RATE_CHANGE: 1, DUPLICATES: 3, OUT_OF_ORDER: 1, FILE_BOUNDARY: 1}
+    for sample, kind, position in zip(samples, kinds, positions):
+        if KINDS[kind] == GAP:
+            assert axis.gaps[0][position] == sample
+    details = {KINDS[kind]: axis.details(kind, position) for kind, position in zip(kinds, positions)}
+    assert details[OUT_OF_ORDER] == "20 samples re-sorted"
+    assert details[FILE_BOUNDARY] == "second.txt starts"
+    assert details[RATE_CHANGE].startswith("period 1e-05 s -> 2e-05 s")
+    assert details[GAP].endswith("periods)")
+
+
+def test_events_of_a_regular_index():
+    samples, kinds, positions = timeAxis(np.arange(5000) * 1e-4).events()
+    assert len(samples) == len(kinds) == len(positions) == 0
@@ -0,0 +1,189 @@
+import warnings
+import numpy as np
+
+# Intervals are examined in blocks of RATE_BLOCK samples: the median interval of a block
+# gives the local sample period, a relative change of more than RATE_TOLERANCE between
+# neighbouring blocks is a sample rate change and an interval longer than GAP_FACTOR
+# periods is a gap. The time index is read in chunks of READ_BLOCK samples.
+RATE_BLOCK = 1024
+RATE_TOLERANCE = 0.05
+GAP_FACTOR = 2.0
+READ_BLOCK = 1 << 22
+
+# Kinds of irregularities listed by timeAxis.events()
+GAP, RATE_CHANGE, DUPLICATES, OUT_OF_ORDER = "gap", "rate change", "duplicates", "out of order"
+FILE_BOUNDARY = "file boundary"
+KINDS = (GAP, RATE_CHANGE, DUPLICATES, OUT_OF_ORDER, FILE_BOUNDARY)
+
+
+def sortRuns(timeIndex):
+    """Stable sorting order of an almost sorted time index.
+
+    Only the out-of-order runs are sorted: the index splits into independent blocks
+    wherever everything before a position is <= everything after it, and only blocks
+    containing a descent need sorting, in place. Returns (order, runs) with order None
+    when the index is already sorted and runs the (start, stop) sample ranges that were
+    re-sorted. The order equals np.argsort(timeIndex, kind="stable").
+    """
+    n = len(timeIndex)
+    descents = np.flatnonzero(timeIndex[1:] < timeIndex[:-1])
+    if len(descents) == 0:
+        return None, np.empty((0, 2), dtype=np.int64)
+    prefixMax = np.maximum.accumulate(timeIndex)
+    suffixMin = np.minimum.accumulate(timeIndex[::-1])[::-1]
+    # Positions i where the index can be cut between i and i + 1
+    cuts = np.flatnonzero(prefixMax[:-1] <= suffixMin[1:]) + 1
+    starts = np.concatenate(([0], cuts))
+    stops = np.concatenate((cuts, [n]))
+    blocks = np.unique(np.searchsorted(starts, descents, side="right") - 1)
+    runs = np.stack((starts[blocks], stops[blocks]), axis=1)
+
+    order = np.arange(n)
+    for start, stop in runs:
+        order[start:stop] = start + np.argsort(timeIndex[start:stop], kind="stable")
+    return order, runs
+
+
+def _runs(mask, offset=0):
+    # (start, stop) of the runs of True in mask
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.stack((np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)), axis=1) + offset
+
+
+class timeAxis:
+    """Lookup between seconds and samples and the irregularities of a sorted time index.
+
+    Built once per loaded capture in O(n), reading the index in chunks. Attributes:
+        segments      (start sample, period) of every stretch with a constant sample rate
+        gaps          (sample after the gap, duration [s]) of intervals longer than
+                      GAP_FACTOR periods
+        duplicates    (start, stop) runs of samples with the same timestamp
+        reordered     (start, stop) sample ranges that were out of order in the file
+        boundaries    (first sample, file name) of the files after the first of a session
+    """
+    def __init__(self, timeIndex, reordered=None, boundaries=None):
+        self.timeIndex = timeIndex
+        self.boundaries = list(boundaries or [])
+        self.reordered = np.asarray(reordered if reordered is not None else np.empty((0, 2)), dtype=np.int64).reshape(-1, 2)
+        n = len(timeIndex)
+        blocks = max((n - 1) // RATE_BLOCK, 0)
+
+        # Median positive interval of every block, duplicates do not count as intervals
+        medians = np.empty(blocks)
+        step = READ_BLOCK // RATE_BLOCK
+        for first in range(0, blocks, step):
+            last = min(first + step, blocks)
+            intervals = np.diff(np.asarray(timeIndex[first*RATE_BLOCK:last*RATE_BLOCK+1], dtype=np.float64))
+            intervals[intervals <= 0] = np.nan
+            with warnings.catch_warnings():
+                # All-NaN blocks are filled below
+                warnings.simplefilter("ignore", RuntimeWarning)
+                medians[first:last] = np.nanmedian(intervals.reshape(last - first, RATE_BLOCK), axis=1)
+        medians = self._fillMissing(medians)
+        self.segments = self._rateSegments(medians)
+
+        gaps, durations, duplicates = [], [], []
+        for first in range(0, max(n - 1, 0), READ_BLOCK):
+            last = min(first + READ_BLOCK, n - 1)
+            intervals = np.diff(np.asarray(timeIndex[first:last+1], dtype=np.float64))
+            periods = self.periodAt(np.arange(first, last))
+            found = np.flatnonzero(intervals > GAP_FACTOR * periods)
+            gaps.append(found + first + 1)
+            durations.append(intervals[found])
+            duplicates.append(_runs(intervals == 0, first))
+        self.gaps = (np.concatenate(gaps) if gaps else np.empty(0, dtype=np.int64),
+                     np.concatenate(durations) if durations else np.empty(0))
+        # A duplicate run of intervals [a, b) covers the samples [a, b + 1)
+        self.duplicates = self._mergeRuns(np.concatenate(duplicates) + [0, 1]) if duplicates else np.empty((0, 2), dtype=np.int64)
+
+    @staticmethod
+    def _fillMissing(medians):
+        # Blocks made only of duplicates take the period of their neighbours
+        valid = np.isfinite(medians)
+        if not valid.any():
+            return np.ones(len(medians))
+        positions = np.arange(len(medians))
+        return np.interp(positions, positions[valid], medians[valid])
+
+    def _rateSegments(self, medians):
+        if len(medians) == 0:
+            period = float(np.diff(self.timeIndex[:2])[0]) if len(self.timeIndex) > 1 else 1.0
+            return np.array([[0, period]])
+        change = np.abs(np.diff(medians)) > RATE_TOLERANCE * medians[:-1]
+        # Several neighbouring changed blocks are one change (a block mixing both rates)
+        firsts = np.flatnonzero(change & ~np.concatenate(([False], change[:-1]))) + 1
+        bounds = np.concatenate(([0], firsts))
+        ends = np.concatenate((firsts, [len(medians)]))
+        periods = np.array([np.median(medians[start:stop]) for start, stop in zip(bounds, ends)])
+        starts = [0]
+        for number, block in enumerate(firsts):
+            # Exact sample of the change inside the two blocks around the block boundary
+            old, new = periods[number], periods[number + 1]
+            first = (block - 1) * RATE_BLOCK
+            intervals = np.diff(np.asarray(self.timeIndex[first:first+2*RATE_BLOCK+1], dtype=np.float64))
+            closerNew = np.abs(intervals - new) < np.abs(intervals - old)
+            # The cut maximizes old-like intervals before it plus new-like intervals after it
+            score = np.concatenate(([0], np.cumsum(~closerNew))) + np.concatenate((np.cumsum(closerNew[::-1])[::-1], [0]))
+            starts.append(first + int(np.argmax(score)) + 1)
+        return np.column_stack((starts, periods))
+
+    @staticmethod
+    def _mergeRuns(runs):
+        # Runs of consecutive chunks touching each other are one run
+        if len(runs) < 2:
+            return runs.astype(np.int64)
+        separate = np.concatenate(([True], runs[1:, 0] > runs[:-1, 1]))
+        starts = runs[separate, 0]
+        stops = np.maximum.reduceat(runs[:, 1], np.flatnonzero(separate))
+        return np.column_stack((starts, stops)).astype(np.int64)
+
+    def __len__(self):
+        return len(self.timeIndex)
+
+    def sampleAt(self, seconds):
+        """First sample at or after the given time (relative to the first sample), in O(log n)."""
+        return np.minimum(np.searchsorted(self.timeIndex, seconds, side="left"), max(len(self.timeIndex) - 1, 0))
+
+    def periodAt(self, samples):
+        segment = np.searchsorted(self.segments[:, 0], samples, side="right") - 1
+        return self.segments[np.maximum(segment, 0), 1]
+
+    def events(self):
+        """(samples, kinds, positions) arrays of all irregularities, ordered by sample.
+
+        kinds indexes KINDS and positions is the number of the event within its kind,
+        see details(). Nothing is formatted here, a capture can have millions of events.
+        """
+        perKind = [self.gaps[0], self.segments[1:, 0], self.duplicates[:, 0], self.reordered[:, 0],
+                   [start for start, _ in self.boundaries]]
+        perKind = [np.asarray(samples, dtype=np.int64).reshape(-1) for samples in perKind]
+        samples = np.concatenate(perKind)
+        kinds = np.repeat(np.arange(len(KINDS), dtype=np.int8), [len(kind) for kind in perKind])
+        positions = np.concatenate([np.arange(len(kind)) for kind in perKind])
+        # Stable, so events at the same sample keep the order of KINDS
+        order = np.argsort(samples, kind="stable")
+        return samples[order], kinds[order], positions[order]
+
+    def details(self, kind, position):
+        """Description of event number position of KINDS[kind]."""
+        kind = KINDS[kind]
+        if kind == GAP:
+            sample, duration = self.gaps[0][position], self.gaps[1][position]
+            return f"{duration:0.6g} s missing ({duration / self.periodAt(sample - 1):0.0f} periods)"
+        if kind == RATE_CHANGE:
+            previous, period = self.segments[position, 1], self.segments[position + 1, 1]
+            return f"period {previous:0.6g} s -> {period:0.6g} s ({1 / period:0.6g} Hz)"
+        if kind == DUPLICATES:
+            start, stop = self.duplicates[position]
+            return f"{stop - start} samples with the same timestamp"
+        if kind == OUT_OF_ORDER:
+            start, stop = self.reordered[position]
+            return f"{stop - start} samples re-sorted"
+        return f"{self.boundaries[position][1]} starts"
+
+    def __str__(self):
+        rate = ", ".join(f"{1 / period:0.6g} Hz" for period in np.unique(self.segments[:, 1])[:5])
+        return (f"{len(self)} samples at {rate}, {len(self.gaps[0])} gaps, {len(self.segments) - 1} rate changes, "
+                f"{len(self.duplicates)} duplicate runs, {len(self.reordered)} out of order runs"
+                + (f", {len(self.boundaries) + 1} files" if self.boundaries else ""))
+
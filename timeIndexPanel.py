@@ -0,0 +1,54 @@
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QLabel, QHeaderView
+from PyQt6.QtCore import Qt, pyqtSignal
+
+from timeAxis import KINDS
+
+# Irregularities listed in the table, a capture can have millions of duplicate timestamps
+MAX_ROWS = 10000
+COLUMNS = ["Sample", "Time [s]", "Kind", "Details"]
+
+
+class timeIndexDock(QDockWidget):
+    """Dock listing the gaps, sample rate changes, duplicate timestamps and out of order
+    runs of the loaded capture (see timeAxis.py). Double clicking a row jumps to it.
+    """
+    jump = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__("Time index", parent)
+        self.setObjectName("timeIndexDock")
+
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        self.summaryLabel = QLabel("No data loaded.")
+        self.summaryLabel.setWordWrap(True)
+        layout.addWidget(self.summaryLabel)
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.cellDoubleClicked.connect(lambda row, column: self.jump.emit(int(self.table.item(row, 0).text())))
+        layout.addWidget(self.table)
+        self.setWidget(widget)
+
+    def setAxis(self, axis):
+        samples, kinds, positions = axis.events()
+        text = str(axis)
+        if len(samples) > MAX_ROWS:
+            text += f" (the first {MAX_ROWS} of {len(samples)} are listed)"
+        self.summaryLabel.setText(text)
+
+        # Only the listed rows are formatted
+        rows = min(len(samples), MAX_ROWS)
+        times = axis.timeIndex[samples[:rows]] if rows > 0 else []
+        self.table.setRowCount(0)
+        self.table.setRowCount(rows)
+        for row in range(rows):
+            sample, kind, position = int(samples[row]), int(kinds[row]), int(positions[row])
+            for column, value in enumerate([str(sample), f"{times[row]:0.6f}", KINDS[kind], axis.details(kind, position)]):
+                item = QTableWidgetItem(value)
+                if column < 2:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
@@ -0,0 +1,179 @@
+import os, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pywt
+
+from instrumentation import stage
+
+# Settings used by the wavelet tab and the whole-dataset filter
+WAVELET_LEVEL = 5
+WAVELET_MODE = "periodic"
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+
+class filterCancelled(Exception):
+    pass
+
+
+def approximationReconstruction(data, wavelet, level=WAVELET_LEVEL, mode=WAVELET_MODE):
+    """Same result as waverec((cA, 0*cD_level, ..., 0*cD1)) of wavedec(data).
+
+    Only the approximation coefficients are computed (downcoef) and the detail
+    coefficients are passed to idwt as None, so no detail or zeroed arrays are allocated.
+    """
+    wavelet = pywt.Wavelet(wavelet)
+    lengths = [len(data)]
+    for i in range(level):
+        lengths.append(pywt.dwt_coeff_len(lengths[-1], wavelet.dec_len, mode))
+    approximation = pywt.downcoef("a", data, wavelet, mode=mode, level=level)
+    for i in range(level, 0, -1):
+        # waverec trims the approximation to the length of the matching detail coefficients
+        approximation = pywt.idwt(approximation[:lengths[i]], None, wavelet, mode=mode)
+    return approximation
+
+
+def blockOverlap(wavelet, level=WAVELET_LEVEL):
+    # Number of samples on each side of a block that influence its reconstruction,
+    # rounded up to a multiple of 2**level so that every block keeps the decimation
+    # phase of the whole signal.
+    step = 2 ** level
+    support = (pywt.Wavelet(wavelet).dec_len - 1) * step
+    return -(-support // step) * step
+
+
+def filterBlock(data, out, start, stop, wavelet, level=WAVELET_LEVEL, mode=WAVELET_MODE, overlap=None, lean=True):
+    """Filters data[start:stop] into out[start:stop].
+
+    The block is padded by the overlap on both sides, which makes the result identical
+    to the whole-array filter away from the ends of the recording. At the ends the
+    padding wraps around like a periodic extension.
+    """
+    if overlap is None:
+        overlap = blockOverlap(wavelet, level)
+    if start - overlap >= 0 and stop + overlap <= len(data):
+        segment = data[start-overlap:stop+overlap]
+    else:
+        segment = np.take(data, np.arange(start - overlap, stop + overlap), mode="wrap")
+
+    if lean:
+        filtered = approximationReconstruction(segment, wavelet, level, mode)
+    else:
+        coefs = pywt.wavedec(segment, wavelet, level=level, mode=mode)
+        filtered = pywt.waverec([coefs[0]] + [0*d for d in coefs[1:]], wavelet, mode=mode)
+    out[start:stop] = filtered[overlap:overlap+stop-start]
+
+
+def filterChannels(channels, outputs, wavelet, level=WAVELET_LEVEL, mode=WAVELET_MODE, blockSize=DEFAULT_BLOCK_SIZE,
+                   workers=None, progressCallback=None, cancelEvent=None, lean=True):
+    """Low-pass wavelet filter of several channels in overlapping blocks on a thread pool.
+
+    channels and outputs are lists of equally long arrays; results are written straight
+    into outputs (pywt releases the GIL, so blocks of all channels run on all cores).
+    progressCallback(percent) is called as blocks finish. Setting cancelEvent stops the
+    remaining blocks and raises filterCancelled.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if cancelEvent is None:
+        cancelEvent = threading.Event()
+    overlap = blockOverlap(wavelet, level)
+    # Blocks start on multiples of 2**level
+    blockSize = max(blockSize // 2**level, 1) * 2**level
+
+    def work(task):
+        data, out, start, stop = task
+        if cancelEvent.is_set():
+            return
+        filterBlock(data, out, start, stop, wavelet, level, mode, overlap, lean)
+
+    tasks = [(data, out, start, min(start + blockSize, len(data)))
+             for data, out in zip(channels, outputs) for start in range(0, len(data), blockSize)]
+    with stage("wavelet filter", rows=sum(len(data) for data in channels), wavelet=wavelet, operation=True), \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, _ in enumerate(executor.map(work, tasks), 1):
+            if progressCallback is not None:
+                progressCallback(int(done / len(tasks) * 100))
+            if cancelEvent.is_set():
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise filterCancelled()
+
+
+def decompose(data, wavelet, level=WAVELET_LEVEL, mode=WAVELET_MODE):
+    # Coefficients (cA, cD_level, ..., cD1) and the approximation-only reconstruction of a window
+    coefs = pywt.wavedec(data, wavelet, level=level, mode=mode)
+    filtered = approximationReconstruction(data, wavelet, level, mode)
+    return coefs, filtered
+
+
+class decompositionCache:
+    """Memory capped LRU cache of window decompositions with background prefetch.
+
+    Keys are (channel, wavelet, level, mode, window start, window size). A single
+    worker thread computes prefetched windows; asking for a window which is being
+    prefetched waits for that result instead of computing it twice.
+    """
+    def __init__(self, maxBytes=256 * 1024**2):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.generation = 0
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    @staticmethod
+    def entrySize(value):
+        coefs, filtered = value
+        return sum(c.nbytes for c in coefs) + filtered.nbytes
+
+    def _store(self, key, value, generation):
+        with self.lock:
+            # Results computed for data loaded before the last clear() are dropped
+            if key in self.entries or generation != self.generation:
+                return
+            self.entries[key] = value
+            self.bytes += self.entrySize(value)
+            while self.bytes > self.maxBytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= self.entrySize(evicted)
+
+    def _compute(self, key, data, generation):
+        channel, wavelet, level, mode, start, size = key
+        value = decompose(data, wavelet, level, mode)
+        self._store(key, value, generation)
+        with self.lock:
+            self.pending.pop(key, None)
+        return value
+
+    def get(self, key, data):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            future = self.pending.get(key)
+        if future is not None:
+            self.hits += 1
+            return future.result()
+        self.misses += 1
+        return self._compute(key, data, self.generation)
+
+    def prefetch(self, key, data):
+        with self.lock:
+            if key in self.entries or key in self.pending:
+                return
+            self.pending[key] = self.executor.submit(self._compute, key, data, self.generation)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pending.clear()
+            self.bytes = 0
+            self.generation += 1
+
+    def __str__(self):
+        return (f"{self.hits} hits, {self.misses} misses, {len(self.entries)} windows, "
+                f"{self.bytes / 1024**2:0.1f}/{self.maxBytes / 1024**2:0.0f} MB")